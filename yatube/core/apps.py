@@ -1,5 +1,14 @@
 from django.apps import AppConfig
+from django.db.backends.signals import connection_created
 
 
 class CoreConfig(AppConfig):
     name = 'core'
+
+    def ready(self):
+        from .db import configure_sqlite
+        from .signals import connect_tracked_models
+        connect_tracked_models()
+        connection_created.connect(
+            configure_sqlite, dispatch_uid='core.configure_sqlite'
+        )
@@ -0,0 +1,218 @@
+"""Общий для всех процессов кэш на SQLite.
+
+LocMemCache у каждого воркера свой, поэтому сброс версии ленты в одном
+воркере не виден остальным. SQLiteCache хранит записи в одном файле
+(LOCATION), к которому обращаются все процессы на хосте; incr/decr и
+add атомарны за счёт BEGIN IMMEDIATE.
+
+    CACHES = {
+        'default': {
+            'BACKEND': 'core.cache_backends.SQLiteCache',
+            'LOCATION': '/var/tmp/yatube-cache.sqlite3',
+        }
+    }
+"""
+import os
+import pickle
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+
+# Ограничение SQLite на число параметров в одном запросе.
+MAX_QUERY_PARAMS = 900
+
+
+class SQLiteCache(BaseCache):
+    pickle_protocol = pickle.HIGHEST_PROTOCOL
+
+    def __init__(self, location, params):
+        super().__init__(params)
+        self._path = location
+        self._local = threading.local()
+        options = params.get('OPTIONS', {})
+        self._busy_timeout = options.get('BUSY_TIMEOUT', 5.0)
+        self._cull_probability = options.get('CULL_PROBABILITY', 0.01)
+
+    # Соединения
+
+    def _connection(self):
+        connection = getattr(self._local, 'connection', None)
+        # После fork() соединение родителя использовать нельзя.
+        if connection is None or self._local.pid != os.getpid():
+            connection = sqlite3.connect(
+                self._path,
+                timeout=self._busy_timeout,
+                isolation_level=None,
+                check_same_thread=False,
+            )
+            connection.execute('PRAGMA journal_mode=WAL')
+            connection.execute('PRAGMA synchronous=NORMAL')
+            connection.execute(
+                'CREATE TABLE IF NOT EXISTS cache ('
+                'key TEXT PRIMARY KEY, value BLOB NOT NULL, expires REAL'
+                ') WITHOUT ROWID'
+            )
+            connection.execute(
+                'CREATE INDEX IF NOT EXISTS cache_expires ON cache (expires)'
+            )
+            self._local.connection = connection
+            self._local.pid = os.getpid()
+        return connection
+
+    @contextmanager
+    def _write(self):
+        """Транзакция, сразу берущая блокировку записи."""
+        connection = self._connection()
+        connection.execute('BEGIN IMMEDIATE')
+        try:
+            yield connection
+        except BaseException:
+            connection.execute('ROLLBACK')
+            raise
+        connection.execute('COMMIT')
+
+    def close(self, **kwargs):
+        # Django вызывает close() после каждого запроса; соединение с
+        # файлом кэша дешевле держать открытым, как и LocMemCache.
+        pass
+
+    # Значения
+
+    def _encode(self, value):
+        # Целые числа храним как есть, чтобы incr не распаковывал pickle.
+        if type(value) is int and -2 ** 63 <= value < 2 ** 63:
+            return value
+        return pickle.dumps(value, self.pickle_protocol)
+
+    @staticmethod
+    def _decode(value):
+        if isinstance(value, int):
+            return value
+        return pickle.loads(value)
+
+    def _key(self, key, version):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        return key
+
+    # API кэша
+
+    def get(self, key, default=None, version=None):
+        key = self._key(key, version)
+        row = self._connection().execute(
+            'SELECT value FROM cache WHERE key = ? '
+            'AND (expires IS NULL OR expires > ?)',
+            (key, time.time()),
+        ).fetchone()
+        return default if row is None else self._decode(row[0])
+
+    def get_many(self, keys, version=None):
+        keys = {self._key(key, version): key for key in keys}
+        found = {}
+        names = list(keys)
+        now = time.time()
+        connection = self._connection()
+        for start in range(0, len(names), MAX_QUERY_PARAMS):
+            chunk = names[start:start + MAX_QUERY_PARAMS]
+            rows = connection.execute(
+                'SELECT key, value FROM cache WHERE key IN (%s) '
+                'AND (expires IS NULL OR expires > ?)'
+                % ', '.join('?' * len(chunk)),
+                (*chunk, now),
+            )
+            for name, value in rows:
+                found[keys[name]] = self._decode(value)
+        return found
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        self.set_many({key: value}, timeout, version)
+
+    def set_many(self, data, timeout=DEFAULT_TIMEOUT, version=None):
+        expires = self.get_backend_timeout(timeout)
+        rows = [
+            (self._key(key, version), self._encode(value), expires)
+            for key, value in data.items()
+        ]
+        with self._write() as connection:
+            connection.executemany(
+                'INSERT OR REPLACE INTO cache (key, value, expires) '
+                'VALUES (?, ?, ?)',
+                rows,
+            )
+            self._maybe_cull(connection)
+        return []
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self._key(key, version)
+        with self._write() as connection:
+            connection.execute(
+                'DELETE FROM cache WHERE key = ? AND expires <= ?',
+                (key, time.time()),
+            )
+            cursor = connection.execute(
+                'INSERT OR IGNORE INTO cache (key, value, expires) '
+                'VALUES (?, ?, ?)',
+                (key, self._encode(value), self.get_backend_timeout(timeout)),
+            )
+            return cursor.rowcount == 1
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self._key(key, version)
+        with self._write() as connection:
+            cursor = connection.execute(
+                'UPDATE cache SET expires = ? WHERE key = ? '
+                'AND (expires IS NULL OR expires > ?)',
+                (self.get_backend_timeout(timeout), key, time.time()),
+            )
+            return cursor.rowcount == 1
+
+    def incr(self, key, delta=1, version=None):
+        key = self._key(key, version)
+        with self._write() as connection:
+            row = connection.execute(
+                'SELECT value FROM cache WHERE key = ? '
+                'AND (expires IS NULL OR expires > ?)',
+                (key, time.time()),
+            ).fetchone()
+            if row is None:
+                raise ValueError("Key '%s' not found" % key)
+            value = self._decode(row[0]) + delta
+            connection.execute(
+                'UPDATE cache SET value = ? WHERE key = ?',
+                (self._encode(value), key),
+            )
+            return value
+
+    def delete(self, key, version=None):
+        self.delete_many([key], version)
+
+    def delete_many(self, keys, version=None):
+        names = [self._key(key, version) for key in keys]
+        with self._write() as connection:
+            for start in range(0, len(names), MAX_QUERY_PARAMS):
+                chunk = names[start:start + MAX_QUERY_PARAMS]
+                connection.execute(
+                    'DELETE FROM cache WHERE key IN (%s)'
+                    % ', '.join('?' * len(chunk)),
+                    chunk,
+                )
+
+    def has_key(self, key, version=None):
+        return self.get(key, version=version) is not None
+
+    def clear(self):
+        with self._write() as connection:
+            connection.execute('DELETE FROM cache')
+
+    def _maybe_cull(self, connection):
+        # Просроченные записи чистим изредка, чтобы не платить за это
+        # на каждой записи.
+        if int.from_bytes(os.urandom(2), 'big') < (
+            self._cull_probability * 65536
+        ):
+            connection.execute(
+                'DELETE FROM cache WHERE expires <= ?', (time.time(),)
+            )
@@ -0,0 +1,78 @@
+"""Версии кэш-тегов.
+
+У каждого тега (например, ``posts:group:3``) есть счётчик версии в
+кэше. Ключ закэшированных данных строится из версий всех тегов, от
+которых они зависят, поэтому запись, поднявшая версию тега, делает
+устаревшими сразу все такие ключи без их перебора.
+"""
+import hashlib
+import time
+
+from django.core.cache import cache
+from django.db import transaction
+
+VERSION_PREFIX = 'tag-version:'
+
+
+def _initial_version():
+    # Версия пропавшего из кэша тега не должна совпасть с прежней:
+    # иначе снова станут видны данные, собранные до вытеснения.
+    return time.time_ns() // 1000
+
+
+def tag_versions(tags):
+    """Текущие версии тегов одним get_many."""
+    keys = {tag: VERSION_PREFIX + tag for tag in tags}
+    found = cache.get_many(keys.values())
+    versions = {}
+    missing = {}
+    for tag, key in keys.items():
+        if key in found:
+            versions[tag] = found[key]
+        else:
+            versions[tag] = missing[key] = _initial_version()
+    if missing:
+        cache.set_many(missing, None)
+    return versions
+
+
+def versions_key(tags):
+    """Короткий отпечаток версий набора тегов."""
+    versions = tag_versions(tags)
+    raw = ';'.join(f'{tag}={versions[tag]}' for tag in sorted(versions))
+    return hashlib.md5(raw.encode()).hexdigest()
+
+
+def _bump(tags):
+    for tag in tags:
+        key = VERSION_PREFIX + tag
+        try:
+            cache.incr(key)
+        except ValueError:
+            cache.set(key, _initial_version(), None)
+
+
+def bump_tags(*tags):
+    """Поднять версии тегов сейчас и ещё раз после коммита транзакции.
+
+    Между записью и коммитом параллельный читатель видит новую версию,
+    но старые строки, и может сохранить их под этой версией. Повторное
+    поднятие после коммита делает такую запись недостижимой. Первое
+    нужно коду, который читает внутри той же транзакции (и тестам,
+    чья транзакция не коммитится).
+    """
+    tags = set(tags)
+    _bump(tags)
+    transaction.on_commit(lambda: _bump(tags))
+
+
+def request_tags(request, tags_func, *args, **kwargs):
+    """Теги страницы, посчитанные не больше одного раза за запрос.
+
+    Их спрашивают и condition(), и кэш страниц; поиск группы или автора
+    по базе не должен повторяться.
+    """
+    memo = request.__dict__.setdefault('_cache_tags', {})
+    if tags_func not in memo:
+        memo[tags_func] = tags_func(request, *args, **kwargs)
+    return memo[tags_func]
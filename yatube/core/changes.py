@@ -0,0 +1,48 @@
+"""Журнал изменений TrackedModel.
+
+Каждое сохранение получает следующий номер change_seq, удаление
+оставляет Tombstone с таким же номером. Клиент, запомнивший последний
+увиденный номер, забирает только более поздние изменения: по одному
+запросу по индексу change_seq на таблицу.
+"""
+from .models import Tombstone
+
+
+def changes_since(sources, since, limit):
+    """Не больше limit изменений с номером больше since, по возрастанию.
+
+    sources — {тип: (QuerySet модели, поля для values())}. Каждое
+    изменение — словарь с ключами seq, type, id, deleted и data.
+    Повторно изменённый объект попадает в журнал только с последним
+    номером: промежуточные состояния не хранятся.
+    """
+    changes = []
+    labels = {}
+    for kind, (queryset, fields) in sources.items():
+        labels[queryset.model._meta.label_lower] = kind
+        rows = queryset.filter(change_seq__gt=since).order_by(
+            'change_seq'
+        ).values('pk', 'change_seq', *fields)[:limit]
+        for row in rows:
+            changes.append({
+                'seq': row.pop('change_seq'),
+                'type': kind,
+                'id': row.pop('pk'),
+                'deleted': False,
+                'data': row,
+            })
+    tombstones = Tombstone.objects.filter(
+        change_seq__gt=since, model__in=labels
+    ).order_by('change_seq').values_list(
+        'change_seq', 'model', 'object_id'
+    )[:limit]
+    for seq, model, object_id in tombstones:
+        changes.append({
+            'seq': seq,
+            'type': labels[model],
+            'id': object_id,
+            'deleted': True,
+            'data': None,
+        })
+    changes.sort(key=lambda change: change['seq'])
+    return changes[:limit]
@@ -0,0 +1,68 @@
+"""ETag страниц по версиям кэш-тегов.
+
+Страница зависит от набора тегов (см. core.cache_tags); пока ни один
+из них не поднят, разметка не меняется, и condition() отвечает
+304 Not Modified, не выполняя view и не трогая шаблоны.
+"""
+import hashlib
+from functools import wraps
+
+from django.conf import settings
+from django.utils import timezone
+from django.views.decorators.http import condition
+
+from .cache_tags import request_tags, versions_key
+from .db_router import read_replica
+from .page_cache import skipped
+
+
+def viewer_key(request):
+    """Всё, что кроме данных меняет разметку для этого посетителя."""
+    user = getattr(request, 'user', None)
+    return ':'.join(str(part) for part in (
+        user.pk if user is not None and user.is_authenticated else '',
+        # В формах выводится CSRF-токен; он привязан к cookie.
+        request.COOKIES.get(settings.CSRF_COOKIE_NAME, ''),
+        # Контекстный процессор year.
+        timezone.now().year,
+        settings.RELEASE,
+    ))
+
+
+def tagged_etag(tags_func):
+    """etag_func для condition() из функции, возвращающей теги страницы.
+
+    tags_func(request, *args, **kwargs) возвращает список тегов или
+    None, если ETag посчитать нельзя (например, объекта нет) — тогда
+    view выполняется как обычно.
+    """
+    def etag_func(request, *args, **kwargs):
+        tags = request_tags(request, tags_func, *args, **kwargs)
+        if tags is None:
+            return None
+        raw = f'{versions_key(tags)}:{viewer_key(request)}'
+        return hashlib.md5(raw.encode()).hexdigest()
+    return etag_func
+
+
+def tagged_condition(etag_func):
+    """condition(etag_func=...), не выдающий ETag устаревшей странице.
+
+    ETag считается по текущим версиям тегов до выполнения view. Если
+    view отдал прежние данные (page_cache.skip — например, страницу
+    ленты, пока её пересобирает другой запрос, или заглушку вместо
+    ещё не готовых кадров картинки) или читал с отстающей реплики,
+    такой ETag подтвердил бы 304-ми устаревшее содержимое до
+    следующей записи.
+    """
+    def decorator(view):
+        conditional_view = condition(etag_func=etag_func)(view)
+
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            response = conditional_view(request, *args, **kwargs)
+            if skipped(request) or read_replica():
+                del response['ETag']
+            return response
+        return wrapper
+    return decorator
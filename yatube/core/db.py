@@ -0,0 +1,70 @@
+"""Настройка соединений с SQLite.
+
+Встроенный бэкенд открывает файл с настройками по умолчанию: журнал
+DELETE, при котором пишущая транзакция блокирует читателей, и
+холодный кэш страниц у каждого соединения. Обработчик
+connection_created выполняет PRAGMA из settings.SQLITE_PRAGMAS для
+каждого нового соединения с SQLite:
+
+    SQLITE_PRAGMAS = {
+        'journal_mode': 'wal',      # читатели не ждут писателя
+        'synchronous': 'normal',    # fsync только на checkpoint
+        'busy_timeout': 5000,       # мс ожидания блокировки
+        'cache_size': -64000,       # КиБ кэша страниц на соединение
+        'mmap_size': 268435456,     # байт файла, читаемых через mmap
+    }
+"""
+import re
+import sqlite3
+from contextlib import closing
+
+from django.conf import settings
+
+# Допустимые значения PRAGMA: число или слово. Значение подставляется
+# в SQL, параметры PRAGMA не поддерживает.
+PRAGMA_VALUE = re.compile(r'^(-?\d+|[A-Za-z_]+)$')
+
+
+def pragma_statements(pragmas):
+    statements = []
+    for name, value in pragmas.items():
+        value = str(value)
+        if not name.isidentifier() or not PRAGMA_VALUE.match(value):
+            raise ValueError(f'Недопустимая PRAGMA {name}={value}')
+        statements.append(f'PRAGMA {name} = {value}')
+    return statements
+
+
+def apply_pragmas(cursor, pragmas):
+    """Выполнить PRAGMA на курсоре DB-API (Django или sqlite3)."""
+    for statement in pragma_statements(pragmas):
+        cursor.execute(statement)
+
+
+def configure_sqlite(sender, connection, **kwargs):
+    """Обработчик connection_created."""
+    if connection.vendor != 'sqlite':
+        return
+    pragmas = getattr(settings, 'SQLITE_PRAGMAS', {})
+    if not pragmas:
+        return
+    # Журнал WAL хранится в файле базы; для базы в памяти (тесты) он
+    # не применим.
+    if connection.is_in_memory_db():
+        pragmas = {
+            name: value for name, value in pragmas.items()
+            if name not in ('journal_mode', 'mmap_size')
+        }
+    with connection.cursor() as cursor:
+        apply_pragmas(cursor, pragmas)
+
+
+def replicate_sqlite(source, target):
+    """Скопировать базу source в target через backup API SQLite.
+
+    Замена настоящей репликации для локальной проверки маршрутизатора
+    реплик: копия согласована, даже если в source идёт запись.
+    """
+    with closing(sqlite3.connect(source)) as src:
+        with closing(sqlite3.connect(target)) as dst:
+            src.backup(dst)
@@ -0,0 +1,167 @@
+"""Нагрузочная проверка SQLite: смешанные чтение и запись.
+
+Несколько процессов-писателей вставляют строки короткими транзакциями
+(как post_create и add_comment: сначала запись, потом коммит),
+процессы-обновляющие сначала читают, потом пишут (как get_or_create и
+update_or_create), а процессы-читатели выбирают последние строки, как
+ленты. Считаются выполненные операции, ошибки «database is locked» и
+самое долгое ожидание одной операции.
+
+Транзакции открываются командой begin: BEGIN, как встроенный бэкенд
+Django, или BEGIN IMMEDIATE, как core.sqlite. С отложенным BEGIN
+транзакция «чтение, потом запись» в режиме WAL получает «database is
+locked» сразу, не дожидаясь busy_timeout.
+
+    python manage.py sqlite_benchmark --seconds 5
+"""
+import multiprocessing
+import os
+import sqlite3
+import tempfile
+import time
+
+from .db import apply_pragmas
+from .sqlite.base import BEGIN as IMMEDIATE_BEGIN
+
+# Профиль встроенного бэкенда Django: журнал DELETE, ожидание
+# блокировки — таймаут модуля sqlite3 по умолчанию, отложенный BEGIN.
+DEFAULT_PROFILE = {}
+DEFAULT_BEGIN = 'BEGIN'
+KINDS = ('write', 'update', 'read')
+SQLITE3_DEFAULT_TIMEOUT = 5.0
+
+
+def _connect(path, pragmas):
+    connection = sqlite3.connect(
+        path, timeout=SQLITE3_DEFAULT_TIMEOUT, isolation_level=None
+    )
+    apply_pragmas(connection.cursor(), pragmas)
+    return connection
+
+
+def _writer(path, pragmas, begin, deadline, results):
+    connection = _connect(path, pragmas)
+    done = locked = 0
+    slowest = 0.0
+    while time.time() < deadline:
+        started = time.perf_counter()
+        try:
+            connection.execute(begin)
+            connection.execute(
+                'INSERT INTO item (text, created) VALUES (?, ?)',
+                ('x' * 200, time.time()),
+            )
+            connection.execute(
+                'UPDATE counter SET value = value + 1 WHERE id = 1'
+            )
+            connection.execute('COMMIT')
+            done += 1
+        except sqlite3.OperationalError as error:
+            if 'locked' not in str(error):
+                raise
+            locked += 1
+            if connection.in_transaction:
+                connection.execute('ROLLBACK')
+        slowest = max(slowest, time.perf_counter() - started)
+    results.put(('write', done, locked, slowest))
+
+
+def _updater(path, pragmas, begin, deadline, results):
+    connection = _connect(path, pragmas)
+    done = locked = 0
+    slowest = 0.0
+    while time.time() < deadline:
+        started = time.perf_counter()
+        try:
+            connection.execute(begin)
+            value = connection.execute(
+                'SELECT value FROM counter WHERE id = 1'
+            ).fetchone()[0]
+            connection.execute(
+                'UPDATE counter SET value = ? WHERE id = 1', (value + 1,)
+            )
+            connection.execute('COMMIT')
+            done += 1
+        except sqlite3.OperationalError as error:
+            if 'locked' not in str(error):
+                raise
+            locked += 1
+            if connection.in_transaction:
+                connection.execute('ROLLBACK')
+        slowest = max(slowest, time.perf_counter() - started)
+    results.put(('update', done, locked, slowest))
+
+
+def _reader(path, pragmas, begin, deadline, results):
+    # Чтения идут вне транзакций, begin не нужен.
+    connection = _connect(path, pragmas)
+    done = locked = 0
+    slowest = 0.0
+    while time.time() < deadline:
+        started = time.perf_counter()
+        try:
+            connection.execute(
+                'SELECT id, text FROM item ORDER BY created DESC LIMIT 10'
+            ).fetchall()
+            connection.execute('SELECT value FROM counter').fetchone()
+            done += 1
+        except sqlite3.OperationalError as error:
+            if 'locked' not in str(error):
+                raise
+            locked += 1
+        slowest = max(slowest, time.perf_counter() - started)
+    results.put(('read', done, locked, slowest))
+
+
+def run_mixed_load(pragmas, writers=4, readers=8, seconds=2.0,
+                   updaters=2, begin=IMMEDIATE_BEGIN):
+    """Прогнать нагрузку на временной базе с PRAGMA pragmas.
+
+    Возвращает {'read'|'write'|'update': {'ops': ..., 'locked': ...,
+    'slowest': секунды}}.
+    """
+    directory = tempfile.mkdtemp()
+    path = os.path.join(directory, 'bench.sqlite3')
+    try:
+        setup = _connect(path, pragmas)
+        setup.execute(
+            'CREATE TABLE item (id INTEGER PRIMARY KEY, text TEXT, '
+            'created REAL)'
+        )
+        setup.execute('CREATE INDEX item_created ON item (created)')
+        setup.execute(
+            'CREATE TABLE counter (id INTEGER PRIMARY KEY, value INTEGER)'
+        )
+        setup.execute('INSERT INTO counter VALUES (1, 0)')
+        setup.close()
+        context = multiprocessing.get_context('fork')
+        results = context.Queue()
+        deadline = time.time() + seconds
+        processes = [
+            context.Process(
+                target=target,
+                args=(path, pragmas, begin, deadline, results),
+            )
+            for target, count in (
+                (_writer, writers), (_updater, updaters), (_reader, readers)
+            )
+            for _ in range(count)
+        ]
+        for process in processes:
+            process.start()
+        totals = {
+            kind: {'ops': 0, 'locked': 0, 'slowest': 0.0}
+            for kind in KINDS
+        }
+        for _ in processes:
+            kind, done, locked, slowest = results.get(timeout=seconds + 60)
+            totals[kind]['ops'] += done
+            totals[kind]['locked'] += locked
+            totals[kind]['slowest'] = max(totals[kind]['slowest'], slowest)
+        for process in processes:
+            process.join()
+        return totals
+    finally:
+        for name in os.listdir(directory):
+            os.remove(os.path.join(directory, name))
+        os.rmdir(directory)
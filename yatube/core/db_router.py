@@ -0,0 +1,122 @@
+"""Чтение с реплик, запись в основную базу.
+
+Реплики перечислены в settings.DATABASE_REPLICAS. С реплики читаются
+только запросы безопасных методов (GET, HEAD), которые ещё ничего не
+записали: ленты, профили, страницы постов. Всё остальное — формы,
+команды, миграции, код вне запроса — работает с default.
+
+Реплика отстаёт от основной базы, поэтому автор, только что
+написавший пост или комментарий, мог бы его не увидеть. После любой
+записи ответ ставит cookie REPLICA_STICKY_COOKIE со временем, до
+которого запросы этого браузера читают с default.
+
+Данные, которые попадают в общий кэш (страница ленты, страница для
+гостей), читаются с default (primary_reads): их ключи строятся из
+текущих версий тегов, и отставшая копия жила бы в кэше и после того,
+как реплика догонит. По той же причине ответ, при сборке которого
+читалась реплика, не получает ETag (core.conditional).
+"""
+import random
+import threading
+import time
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS
+
+_state = threading.local()
+
+
+def replicas():
+    return list(getattr(settings, 'DATABASE_REPLICAS', []))
+
+
+def use_replicas(enabled):
+    """Разрешить чтение с реплик в текущем потоке."""
+    _state.use_replicas = enabled
+    _state.wrote = False
+    _state.read_replica = False
+
+
+def wrote():
+    """Была ли в текущем запросе запись в базу."""
+    return getattr(_state, 'wrote', False)
+
+
+def read_replica():
+    """Читал ли текущий запрос с реплики."""
+    return getattr(_state, 'read_replica', False)
+
+
+@contextmanager
+def primary_reads():
+    """Читать внутри блока с default — для данных, идущих в кэш."""
+    enabled = getattr(_state, 'use_replicas', False)
+    _state.use_replicas = False
+    try:
+        yield
+    finally:
+        # Запись внутри блока закрепляет запрос за default.
+        _state.use_replicas = enabled and not wrote()
+
+
+class PrimaryReplicaRouter:
+    def db_for_read(self, model, **hints):
+        aliases = replicas()
+        if not aliases or not getattr(_state, 'use_replicas', False):
+            return DEFAULT_DB_ALIAS
+        _state.read_replica = True
+        return random.choice(aliases)
+
+    def db_for_write(self, model, **hints):
+        # Дальше в этом запросе читаем то, что только что записали.
+        _state.use_replicas = False
+        _state.wrote = True
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Реплики — копии default: объекты с любой из них совместимы.
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # Схема реплики приезжает вместе с данными.
+        return db not in replicas()
+
+
+class ReplicaStickinessMiddleware:
+    """Решает, можно ли запросу читать с реплики, и ставит cookie."""
+
+    SAFE_METHODS = ('GET', 'HEAD')
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        use_replicas(
+            bool(replicas())
+            and request.method in self.SAFE_METHODS
+            and not self.pinned(request)
+        )
+        try:
+            response = self.get_response(request)
+        finally:
+            written = wrote()
+            use_replicas(False)
+        if written:
+            seconds = settings.REPLICA_STICKY_SECONDS
+            response.set_cookie(
+                settings.REPLICA_STICKY_COOKIE,
+                str(int(time.time() + seconds)),
+                max_age=seconds,
+                httponly=True,
+                samesite='Lax',
+            )
+        return response
+
+    @staticmethod
+    def pinned(request):
+        raw = request.COOKIES.get(settings.REPLICA_STICKY_COOKIE, '')
+        try:
+            return int(raw) > time.time()
+        except ValueError:
+            return False
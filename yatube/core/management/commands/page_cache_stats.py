@@ -0,0 +1,27 @@
+from django.core.management.base import BaseCommand
+
+from core.page_cache import hit_ratios, reset_stats
+
+
+class Command(BaseCommand):
+    help = 'Показывает долю попаданий в кэш страниц для гостей.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--reset',
+            action='store_true',
+            help='Обнулить счётчики после вывода.',
+        )
+
+    def handle(self, *args, **options):
+        stats = hit_ratios()
+        if options['verbosity'] >= 1:
+            if not stats:
+                self.stdout.write('Обращений к кэшу страниц ещё не было.')
+            for view_name, (hits, misses, ratio) in stats.items():
+                self.stdout.write(
+                    f'{view_name}: попаданий {hits}, промахов {misses}, '
+                    f'доля попаданий {ratio:.1%}'
+                )
+        if options['reset']:
+            reset_stats()
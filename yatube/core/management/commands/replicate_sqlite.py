@@ -0,0 +1,35 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from core.db import replicate_sqlite
+
+
+class Command(BaseCommand):
+    help = (
+        'Копирует основную базу SQLite в реплики из DATABASE_REPLICAS: '
+        'один раз или каждые --interval секунд.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--interval', type=float, default=0)
+
+    def handle(self, *args, **options):
+        source = settings.DATABASES['default']
+        targets = [
+            settings.DATABASES[alias]['NAME']
+            for alias in settings.DATABASE_REPLICAS
+        ]
+        if source['ENGINE'] != 'django.db.backends.sqlite3' or not targets:
+            raise CommandError(
+                'Нужна база SQLite и хотя бы одна реплика в '
+                'DATABASE_REPLICAS (YATUBE_REPLICA=...).'
+            )
+        while True:
+            for target in targets:
+                replicate_sqlite(source['NAME'], target)
+            if not options['interval']:
+                break
+            time.sleep(options['interval'])
+        self.stdout.write(f'Реплик обновлено: {len(targets)}')
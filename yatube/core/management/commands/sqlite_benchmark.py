@@ -0,0 +1,44 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from core.db_benchmark import (DEFAULT_BEGIN, DEFAULT_PROFILE,
+                               IMMEDIATE_BEGIN, KINDS, run_mixed_load)
+
+
+class Command(BaseCommand):
+    help = (
+        'Сравнивает SQLite с настройками по умолчанию, с '
+        'SQLITE_PRAGMAS и с SQLITE_PRAGMAS плюс BEGIN IMMEDIATE '
+        '(core.sqlite) под смешанной нагрузкой.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--writers', type=int, default=4)
+        parser.add_argument('--updaters', type=int, default=2)
+        parser.add_argument('--readers', type=int, default=8)
+        parser.add_argument('--seconds', type=float, default=5.0)
+
+    def handle(self, *args, **options):
+        profiles = (
+            ('по умолчанию', DEFAULT_PROFILE, DEFAULT_BEGIN),
+            ('SQLITE_PRAGMAS', settings.SQLITE_PRAGMAS, DEFAULT_BEGIN),
+            ('SQLITE_PRAGMAS + core.sqlite', settings.SQLITE_PRAGMAS,
+             IMMEDIATE_BEGIN),
+        )
+        for title, pragmas, begin in profiles:
+            totals = run_mixed_load(
+                pragmas,
+                writers=options['writers'],
+                readers=options['readers'],
+                updaters=options['updaters'],
+                seconds=options['seconds'],
+                begin=begin,
+            )
+            self.stdout.write(f'{title}:')
+            for kind in KINDS:
+                ops = totals[kind]['ops']
+                self.stdout.write(
+                    f'  {kind}: {ops / options["seconds"]:.0f} оп/с, '
+                    f'database is locked: {totals[kind]["locked"]}, '
+                    f'дольше всего: {totals[kind]["slowest"] * 1000:.0f} мс'
+                )
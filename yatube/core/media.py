@@ -0,0 +1,162 @@
+"""Раздача файлов из MEDIA_ROOT.
+
+Путь проверяется (только каталоги MEDIA_SERVE_DIRS, без выхода за
+MEDIA_ROOT и скрытых файлов), затем отдача передаётся веб-серверу или
+идёт из Python:
+
+* MEDIA_SENDFILE = 'x-accel-redirect' — nginx отдаёт файл сам по
+  внутреннему адресу MEDIA_ACCEL_PREFIX + путь;
+* MEDIA_SENDFILE = 'x-sendfile' — Apache/lighttpd по абсолютному пути;
+* иначе FileResponse: WSGI-сервер с wsgi.file_wrapper (gunicorn, uWSGI)
+  передаёт файл через sendfile() без копирования в Python.
+
+Ответ несёт сильный ETag: у имён по содержимому (core.storage) это
+хэш, у остальных — размер и время изменения. Поддерживаются
+If-None-Match/If-Modified-Since и один диапазон Range. Файлы с хэшем
+в имени не меняются, поэтому кэшируются на год с immutable.
+"""
+import mimetypes
+import os
+import re
+import stat
+
+from django.conf import settings
+from django.http import (FileResponse, Http404, HttpResponse,
+                         StreamingHttpResponse)
+from django.utils._os import safe_join
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, parse_etags, quote_etag
+from django.views.decorators.http import require_safe
+
+from .storage import HASHED_NAME
+
+IMMUTABLE_CACHE_CONTROL = 'public, max-age=31536000, immutable'
+BLOCK_SIZE = 64 * 1024
+RANGE = re.compile(r'^bytes=(\d*)-(\d*)$')
+
+
+def _resolve(path):
+    """Абсолютный путь к файлу или Http404."""
+    parts = path.split('/')
+    if parts[0] not in settings.MEDIA_SERVE_DIRS or any(
+        not part or part.startswith('.') or part.endswith('.part')
+        for part in parts
+    ):
+        raise Http404('Файл не найден')
+    try:
+        full_path = safe_join(settings.MEDIA_ROOT, path)
+        stat_result = os.stat(full_path)
+    except (ValueError, OSError):
+        raise Http404('Файл не найден')
+    if not stat.S_ISREG(stat_result.st_mode):
+        raise Http404('Файл не найден')
+    return full_path, stat_result
+
+
+def _etag(path, stat_result):
+    match = HASHED_NAME.search(path)
+    if match:
+        return quote_etag(match.group('digest'))
+    return quote_etag(
+        f'{stat_result.st_size:x}-{stat_result.st_mtime_ns:x}'
+    )
+
+
+def byte_range(header, size):
+    """(start, end) включительно, None — отдать целиком, или ValueError.
+
+    Поддерживается один диапазон; несколько диапазонов отдаются
+    целым файлом, как разрешает RFC 7233.
+    """
+    match = RANGE.match(header.replace(' ', ''))
+    if not match:
+        return None
+    first, last = match.groups()
+    if not first and not last:
+        return None
+    if not first:
+        # bytes=-500: последние 500 байт.
+        length = int(last)
+        if not length:
+            raise ValueError(header)
+        return max(size - length, 0), size - 1
+    start = int(first)
+    end = min(int(last), size - 1) if last else size - 1
+    if start >= size or start > end:
+        raise ValueError(header)
+    return start, end
+
+
+def _read(file, start, length):
+    with file:
+        file.seek(start)
+        while length > 0:
+            chunk = file.read(min(BLOCK_SIZE, length))
+            if not chunk:
+                break
+            length -= len(chunk)
+            yield chunk
+
+
+def _offload(path, full_path):
+    mode = settings.MEDIA_SENDFILE
+    response = HttpResponse()
+    if mode == 'x-accel-redirect':
+        response['X-Accel-Redirect'] = settings.MEDIA_ACCEL_PREFIX + path
+    else:
+        response['X-Sendfile'] = full_path
+    # Тип, длину и Range проставит веб-сервер.
+    del response['Content-Type']
+    return response
+
+
+def _file_response(request, full_path, stat_result, etag):
+    size = stat_result.st_size
+    header = request.META.get('HTTP_RANGE')
+    if_range = request.META.get('HTTP_IF_RANGE')
+    if header and (not if_range or etag in parse_etags(if_range)):
+        try:
+            requested = byte_range(header, size)
+        except ValueError:
+            response = HttpResponse(status=416)
+            response['Content-Range'] = f'bytes */{size}'
+            return response
+        if requested is not None:
+            start, end = requested
+            response = StreamingHttpResponse(
+                _read(open(full_path, 'rb'), start, end - start + 1),
+                status=206,
+            )
+            response['Content-Range'] = f'bytes {start}-{end}/{size}'
+            response['Content-Length'] = str(end - start + 1)
+            return response
+    return FileResponse(open(full_path, 'rb'))
+
+
+@require_safe
+def serve(request, path):
+    full_path, stat_result = _resolve(path)
+    etag = _etag(path, stat_result)
+    last_modified = int(stat_result.st_mtime)
+    response = get_conditional_response(
+        request, etag=etag, last_modified=last_modified
+    )
+    if response is None:
+        if settings.MEDIA_SENDFILE:
+            response = _offload(path, full_path)
+        else:
+            response = _file_response(request, full_path, stat_result, etag)
+            content_type, encoding = mimetypes.guess_type(full_path)
+            response['Content-Type'] = (
+                content_type or 'application/octet-stream'
+            )
+            if encoding:
+                response['Content-Encoding'] = encoding
+            response['Accept-Ranges'] = 'bytes'
+    response['ETag'] = etag
+    response['Last-Modified'] = http_date(last_modified)
+    response['Cache-Control'] = (
+        IMMUTABLE_CACHE_CONTROL if HASHED_NAME.search(path)
+        else f'public, max-age={settings.MEDIA_CACHE_SECONDS}'
+    )
+    return response
@@ -0,0 +1,20 @@
+# Generated by Django 2.2.16 on 2026-10-17 06:36
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StoredFile',
+            fields=[
+                ('name', models.CharField(max_length=255, primary_key=True, serialize=False)),
+                ('refs', models.PositiveIntegerField(default=0)),
+            ],
+        ),
+    ]
@@ -1,4 +1,4 @@
-from django.db import models
+from django.db import models, transaction
 
 
 class CreatedModel(models.Model):
@@ -11,3 +11,120 @@ class CreatedModel(models.Model):
     class Meta:
         # Это абстрактная модель:
         abstract = True
+
+
+class SequenceManager(models.Manager):
+    def next_values(self, name, count=1):
+        """Выделить count подряд идущих значений последовательности name.
+
+        Возвращает range. Строка последовательности блокируется
+        UPDATE до конца транзакции, поэтому номера не повторяются.
+        """
+        with transaction.atomic(savepoint=False):
+            updated = self.filter(name=name).update(
+                value=models.F('value') + count
+            )
+            if not updated:
+                self.get_or_create(name=name)
+                self.filter(name=name).update(
+                    value=models.F('value') + count
+                )
+            last = self.filter(name=name).values_list(
+                'value', flat=True
+            ).get()
+        return range(last - count + 1, last + 1)
+
+
+class Sequence(models.Model):
+    """Именованный монотонный счётчик."""
+    name = models.CharField(max_length=50, primary_key=True)
+    value = models.BigIntegerField(default=0)
+
+    objects = SequenceManager()
+
+    def __str__(self):
+        return f'{self.name}={self.value}'
+
+
+CHANGES_SEQUENCE = 'changes'
+
+
+def next_change_seq(count=1):
+    """Номера следующих изменений для журнала change_seq."""
+    return Sequence.objects.next_values(CHANGES_SEQUENCE, count)
+
+
+class TrackedModel(models.Model):
+    """Абстрактная модель. Время и порядковый номер последнего изменения.
+
+    change_seq берётся из общей для всех таких моделей
+    последовательности, поэтому по нему можно забирать изменения
+    нескольких таблиц подряд (см. core.changes). bulk_create и
+    QuerySet.update() номер не выдают: его нужно назначить самим через
+    next_change_seq().
+    """
+    updated = models.DateTimeField(
+        'Дата изменения',
+        auto_now=True
+    )
+    change_seq = models.BigIntegerField(
+        'Номер изменения',
+        default=0,
+        editable=False,
+        db_index=True
+    )
+
+    def save(self, *args, **kwargs):
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None:
+            kwargs['update_fields'] = {
+                *update_fields, 'updated', 'change_seq'
+            }
+        with transaction.atomic(savepoint=False):
+            self.change_seq = next_change_seq()[0]
+            super().save(*args, **kwargs)
+
+    class Meta:
+        abstract = True
+
+
+class CountedModel(models.Model):
+    """Абстрактная модель. Не перезаписывает счётчики при сохранении.
+
+    Поля counter_fields меняются только атомарным UPDATE ... SET x = x + 1
+    (posts.counters). save() существующей строки их не пишет: иначе
+    загруженное ранее значение затёрло бы параллельное приращение.
+    """
+    counter_fields = ()
+
+    def save(self, *args, **kwargs):
+        if (not self._state.adding and not kwargs.get('force_insert')
+                and kwargs.get('update_fields') is None):
+            kwargs['update_fields'] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key
+                and field.name not in self.counter_fields
+            ]
+        super().save(*args, **kwargs)
+
+    class Meta:
+        abstract = True
+
+
+class Tombstone(models.Model):
+    """След удалённого объекта TrackedModel для журнала изменений."""
+    change_seq = models.BigIntegerField(db_index=True)
+    model = models.CharField(max_length=100)
+    object_id = models.BigIntegerField()
+
+    def __str__(self):
+        return f'{self.model}#{self.object_id}'
+
+
+class StoredFile(models.Model):
+    """Число ссылок на файл хранилища core.storage."""
+    name = models.CharField(max_length=255, primary_key=True)
+    refs = models.PositiveIntegerField(default=0)
+
+    def __str__(self):
+        return f'{self.name} ×{self.refs}'
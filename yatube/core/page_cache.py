@@ -0,0 +1,146 @@
+"""Кэш целых страниц для анонимных посетителей.
+
+Гости видят одинаковую разметку, поэтому ответ view можно сохранить
+целиком. Ключ строится из адреса с query string и версий тегов
+страницы (core.cache_tags): запись поста, комментария, группы или
+подписки поднимает версии ровно тех тегов, от которых зависит
+страница, и её следующий показ собирается заново.
+
+Попадания и промахи считаются в кэше по каждому view; отчёт выводит
+команда page_cache_stats.
+"""
+import hashlib
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import cache
+from django.utils import timezone
+
+from .cache_tags import request_tags, versions_key
+from .db_router import primary_reads
+
+STATS_PREFIX = 'page-cache-stats:'
+STATS_VIEWS_KEY = f'{STATS_PREFIX}views'
+
+
+def skip(request):
+    """Не кэшировать ответ на этот запрос.
+
+    Например, если view отдал заведомо устаревшие данные: сохранённые
+    под свежими версиями тегов, они жили бы до следующей записи.
+    """
+    request._page_cache_skip = True
+
+
+def skipped(request):
+    return getattr(request, '_page_cache_skip', False)
+
+
+def _cacheable_request(request):
+    return (
+        request.method in ('GET', 'HEAD')
+        and not request.user.is_authenticated
+    )
+
+
+def _cacheable_response(response):
+    # Ответ с cookie (например, CSRF) для другого посетителя не годится.
+    return (
+        response.status_code == 200
+        and not response.cookies
+        and not getattr(response, 'streaming', False)
+    )
+
+
+def _page_key(request, tags):
+    raw = ':'.join((
+        request.get_full_path(),
+        versions_key(tags),
+        # Контекстный процессор year и версия шаблонов.
+        str(timezone.now().year),
+        settings.RELEASE,
+    ))
+    return f'page:{hashlib.md5(raw.encode()).hexdigest()}'
+
+
+def _count(view_name, outcome):
+    key = f'{STATS_PREFIX}{view_name}:{outcome}'
+    # Обычно счётчик уже есть: одна запись в кэш на показ страницы.
+    try:
+        cache.incr(key)
+        return
+    except ValueError:
+        pass
+    if not cache.add(key, 1, None):
+        # Параллельный запрос успел создать счётчик.
+        try:
+            cache.incr(key)
+        except ValueError:
+            pass
+        return
+    views = cache.get(STATS_VIEWS_KEY, set())
+    if view_name not in views:
+        cache.set(STATS_VIEWS_KEY, views | {view_name}, None)
+
+
+def hit_ratios():
+    """{view: (попадания, промахи, доля попаданий)} по всем view."""
+    stats = {}
+    for view_name in sorted(cache.get(STATS_VIEWS_KEY, set())):
+        counts = cache.get_many([
+            f'{STATS_PREFIX}{view_name}:hit',
+            f'{STATS_PREFIX}{view_name}:miss',
+        ])
+        hits = counts.get(f'{STATS_PREFIX}{view_name}:hit', 0)
+        misses = counts.get(f'{STATS_PREFIX}{view_name}:miss', 0)
+        total = hits + misses
+        stats[view_name] = (hits, misses, hits / total if total else 0.0)
+    return stats
+
+
+def reset_stats():
+    views = cache.get(STATS_VIEWS_KEY, set())
+    cache.delete_many([
+        f'{STATS_PREFIX}{view_name}:{outcome}'
+        for view_name in views for outcome in ('hit', 'miss')
+    ] + [STATS_VIEWS_KEY])
+
+
+def cache_anonymous_page(tags_func, timeout=None):
+    """Декоратор view: кэширует страницу для гостей до смены тегов.
+
+    tags_func(request, *args, **kwargs) возвращает теги страницы или
+    None — тогда страница не кэшируется.
+    """
+    def decorator(view):
+        view_name = view.__name__
+
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            if not _cacheable_request(request):
+                return view(request, *args, **kwargs)
+            tags = request_tags(request, tags_func, *args, **kwargs)
+            if tags is None:
+                return view(request, *args, **kwargs)
+            key = _page_key(request, tags)
+            response = cache.get(key)
+            if response is not None:
+                _count(view_name, 'hit')
+                response['X-Page-Cache'] = 'hit'
+                return response
+            _count(view_name, 'miss')
+            # Страница уйдёт в кэш под текущими версиями тегов: читаем
+            # с основной базы, а не с отстающей реплики.
+            with primary_reads():
+                response = view(request, *args, **kwargs)
+            if _cacheable_response(response) and not skipped(request):
+                cache.set(
+                    key,
+                    response,
+                    settings.PAGE_CACHE_TIMEOUT if timeout is None
+                    else timeout
+                )
+            response['X-Page-Cache'] = 'miss'
+            return response
+        return wrapper
+    return decorator
@@ -0,0 +1,138 @@
+import base64
+import binascii
+import json
+
+from django.core.paginator import Page, Paginator
+from django.db.models import Q
+
+
+class InvalidCursor(Exception):
+    """Курсор повреждён или не относится к этой выборке."""
+
+
+class CursorPaginator(Paginator):
+    """Пагинатор по ключу (keyset) вместо OFFSET.
+
+    Страница выбирается условием на поля сортировки относительно
+    последней (или первой) записи соседней страницы, поэтому не нужен
+    ни COUNT(*), ни OFFSET. Номерные страницы (?page=N) по-прежнему
+    доступны через унаследованный get_page().
+    """
+
+    def __init__(self, object_list, per_page, ordering=('created', 'id'),
+                 **kwargs):
+        super().__init__(object_list, per_page, **kwargs)
+        self.ordering = tuple(ordering)
+
+    def _fields(self):
+        return [field.lstrip('-') for field in self.ordering]
+
+    def encode_cursor(self, obj, direction):
+        values = []
+        for name in self._fields():
+            # Строки .values() — словари, а не объекты моделей.
+            if isinstance(obj, dict):
+                value = obj[name]
+            else:
+                value = getattr(obj, name)
+            values.append(value.isoformat() if hasattr(value, 'isoformat')
+                          else value)
+        raw = json.dumps([direction, values], separators=(',', ':'))
+        return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+    def decode_cursor(self, cursor):
+        try:
+            padded = cursor + '=' * (-len(cursor) % 4)
+            direction, values = json.loads(base64.urlsafe_b64decode(padded))
+        except (TypeError, ValueError, binascii.Error):
+            raise InvalidCursor(cursor)
+        fields = self._fields()
+        # JSON приходит от клиента: форму проверяем до разбора значений.
+        if (
+            not isinstance(direction, str) or direction not in ('n', 'p')
+            or not isinstance(values, list) or len(values) != len(fields)
+        ):
+            raise InvalidCursor(cursor)
+        model = self.object_list.model
+        try:
+            values = [
+                model._meta.get_field(name).to_python(value)
+                for name, value in zip(fields, values)
+            ]
+        except Exception:
+            raise InvalidCursor(cursor)
+        if None in values:
+            raise InvalidCursor(cursor)
+        return direction, values
+
+    def _seek(self, values, forward, fields=None):
+        """Условие «строго после» (или «строго до») ключа values.
+
+        fields — имена колонок ключа, если они называются не так, как
+        поля ordering (например, в денормализованной таблице).
+        """
+        condition = Q()
+        equal = {}
+        for field, name, value in zip(
+            self.ordering, fields or self._fields(), values
+        ):
+            ascending = not field.startswith('-')
+            lookup = 'gt' if ascending == forward else 'lt'
+            condition |= Q(**equal, **{f'{name}__{lookup}': value})
+            equal[name] = value
+        return condition
+
+    def _order_by(self, forward, fields=None):
+        """Сортировка ordering (или обратная) по колонкам fields."""
+        return [
+            f'-{name}' if field.startswith('-') == forward else name
+            for field, name in zip(self.ordering, fields or self._fields())
+        ]
+
+    def fetch(self, values, forward, limit):
+        """До limit записей после (или до) ключа values по порядку обхода."""
+        queryset = self.object_list
+        if values is not None:
+            queryset = queryset.filter(self._seek(values, forward))
+        return list(queryset.order_by(*self._order_by(forward))[:limit])
+
+    def cursor_page(self, cursor=None):
+        """Страница после/до курсора; без курсора — первая страница."""
+        if cursor:
+            direction, values = self.decode_cursor(cursor)
+        else:
+            direction, values = 'n', None
+        forward = direction == 'n'
+        rows = self.fetch(values, forward, self.per_page + 1)
+        has_more = len(rows) > self.per_page
+        rows = rows[:self.per_page]
+        if not forward:
+            rows.reverse()
+        page = Page(rows, None, self)
+        page.is_cursor = True
+        page.cursor = cursor or ''
+        if forward:
+            has_next, has_previous = has_more, values is not None
+        else:
+            has_next, has_previous = True, has_more
+        page.next_cursor = (
+            self.encode_cursor(rows[-1], 'n') if rows and has_next else None
+        )
+        page.previous_cursor = (
+            self.encode_cursor(rows[0], 'p')
+            if rows and has_previous else None
+        )
+        return page
+
+
+def paginate(object_list, request, per_page,
+             paginator_class=CursorPaginator):
+    """Страница по ?cursor= или, для старых ссылок, по ?page=N."""
+    paginator = paginator_class(object_list, per_page)
+    page_number = request.GET.get('page')
+    if page_number is not None:
+        return paginator.get_page(page_number)
+    try:
+        return paginator.cursor_page(request.GET.get('cursor'))
+    except InvalidCursor:
+        return paginator.cursor_page()
@@ -0,0 +1,265 @@
+"""Профилирование запросов: время, SQL, шаблоны, кэш.
+
+Включается переменной YATUBE_PROFILING=1: тогда ProfilingMiddleware
+стоит первым в MIDDLEWARE. Для каждого запроса замеряются
+
+* общее время ответа;
+* число и время SQL-запросов (connection.execute_wrapper на всех
+  базах, включая реплики);
+* время рендера шаблонов верхнего уровня (include внутри шаблона
+  входит во время родителя);
+* попадания и промахи cache.get / cache.get_many.
+
+Замеры складываются по имени view (posts:index, posts:post_detail...)
+в гистограммы этого процесса и отдаются в текстовом формате
+Prometheus по адресу /metrics (только персоналу).
+"""
+import threading
+import time
+from bisect import bisect_left
+from contextlib import ExitStack
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import connections
+from django.template.backends.django import Template
+
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+QUERY_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100)
+UNRESOLVED = 'unresolved'
+
+_state = threading.local()
+_lock = threading.Lock()
+_views = {}
+
+
+class Profile:
+    """Замеры одного запроса."""
+
+    def __init__(self):
+        self.sql_queries = 0
+        self.sql_seconds = 0.0
+        self.template_seconds = 0.0
+        self.cache_hits = 0
+        self.cache_misses = 0
+        # Глубина вложенных вызовов: get_many через get, include через
+        # render учитываются один раз.
+        self.render_depth = 0
+        self.cache_depth = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        # execute_wrapper
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.sql_queries += 1
+            self.sql_seconds += time.perf_counter() - started
+
+
+def _current(depth):
+    profile = getattr(_state, 'profile', None)
+    if profile is None or getattr(profile, depth):
+        return None
+    return profile
+
+
+# Перехват рендера шаблонов и чтения кэша
+
+def _timed_render(render):
+    @wraps(render)
+    def wrapper(self, *args, **kwargs):
+        profile = _current('render_depth')
+        if profile is None:
+            return render(self, *args, **kwargs)
+        started = time.perf_counter()
+        profile.render_depth += 1
+        try:
+            return render(self, *args, **kwargs)
+        finally:
+            profile.render_depth -= 1
+            profile.template_seconds += time.perf_counter() - started
+    return wrapper
+
+
+_MISSING = object()
+
+
+def _counted_get(get):
+    @wraps(get)
+    def wrapper(self, key, default=None, version=None):
+        profile = _current('cache_depth')
+        if profile is None:
+            return get(self, key, default, version)
+        profile.cache_depth += 1
+        try:
+            value = get(self, key, _MISSING, version)
+        finally:
+            profile.cache_depth -= 1
+        if value is _MISSING:
+            profile.cache_misses += 1
+            return default
+        profile.cache_hits += 1
+        return value
+    return wrapper
+
+
+def _counted_get_many(get_many):
+    @wraps(get_many)
+    def wrapper(self, keys, version=None):
+        profile = _current('cache_depth')
+        if profile is None:
+            return get_many(self, keys, version)
+        keys = list(keys)
+        profile.cache_depth += 1
+        try:
+            found = get_many(self, keys, version)
+        finally:
+            profile.cache_depth -= 1
+        profile.cache_hits += len(found)
+        profile.cache_misses += len(set(keys)) - len(found)
+        return found
+    return wrapper
+
+
+def _patch(cls, name, decorator):
+    method = getattr(cls, name)
+    if not getattr(method, '_profiled', False):
+        patched = decorator(method)
+        patched._profiled = True
+        setattr(cls, name, patched)
+
+
+def instrument():
+    """Подменить методы рендера и кэша; повторный вызов ничего не делает."""
+    _patch(Template, 'render', _timed_render)
+    for alias in settings.CACHES:
+        backend = type(caches[alias])
+        _patch(backend, 'get', _counted_get)
+        _patch(backend, 'get_many', _counted_get_many)
+
+
+# Агрегаты
+
+class Histogram:
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+
+    def cumulative(self):
+        """[(граница, число наблюдений не больше неё)], включая +Inf."""
+        total = 0
+        result = []
+        for bound, count in zip(self.buckets + ('+Inf',), self.counts):
+            total += count
+            result.append((bound, total))
+        return result
+
+
+class ViewStats:
+    def __init__(self):
+        self.duration = Histogram(DURATION_BUCKETS)
+        self.queries = Histogram(QUERY_BUCKETS)
+        self.sql_seconds = 0.0
+        self.template_seconds = 0.0
+        self.cache_hits = 0
+        self.cache_misses = 0
+
+    def add(self, seconds, profile):
+        self.duration.observe(seconds)
+        self.queries.observe(profile.sql_queries)
+        self.sql_seconds += profile.sql_seconds
+        self.template_seconds += profile.template_seconds
+        self.cache_hits += profile.cache_hits
+        self.cache_misses += profile.cache_misses
+
+
+def record(view_name, seconds, profile):
+    with _lock:
+        stats = _views.get(view_name)
+        if stats is None:
+            stats = _views[view_name] = ViewStats()
+        stats.add(seconds, profile)
+
+
+def reset():
+    with _lock:
+        _views.clear()
+
+
+def _label(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"')
+
+
+def _histogram_lines(name, view, histogram):
+    labels = f'view="{_label(view)}"'
+    lines = [
+        f'{name}_bucket{{{labels},le="{bound}"}} {count}'
+        for bound, count in histogram.cumulative()
+    ]
+    lines.append(f'{name}_sum{{{labels}}} {histogram.sum}')
+    lines.append(f'{name}_count{{{labels}}} {histogram.cumulative()[-1][1]}')
+    return lines
+
+
+METRICS = (
+    ('yatube_request_duration_seconds', 'histogram',
+     'Время ответа.', lambda stats: stats.duration),
+    ('yatube_request_sql_queries', 'histogram',
+     'SQL-запросов на ответ.', lambda stats: stats.queries),
+    ('yatube_sql_seconds_total', 'counter',
+     'Время SQL-запросов.', lambda stats: stats.sql_seconds),
+    ('yatube_template_seconds_total', 'counter',
+     'Время рендера шаблонов.', lambda stats: stats.template_seconds),
+    ('yatube_cache_hits_total', 'counter',
+     'Попадания cache.get/get_many.', lambda stats: stats.cache_hits),
+    ('yatube_cache_misses_total', 'counter',
+     'Промахи cache.get/get_many.', lambda stats: stats.cache_misses),
+)
+
+
+def prometheus_text():
+    """Все метрики в текстовом формате Prometheus 0.0.4."""
+    with _lock:
+        views = sorted(_views.items())
+        lines = []
+        for name, kind, help_text, value in METRICS:
+            lines.append(f'# HELP {name} {help_text}')
+            lines.append(f'# TYPE {name} {kind}')
+            for view, stats in views:
+                if kind == 'histogram':
+                    lines.extend(_histogram_lines(name, view, value(stats)))
+                else:
+                    lines.append(
+                        f'{name}{{view="{_label(view)}"}} {value(stats)}'
+                    )
+    return '\n'.join(lines) + '\n'
+
+
+class ProfilingMiddleware:
+    def __init__(self, get_response):
+        self.get_response = get_response
+        instrument()
+
+    def __call__(self, request):
+        profile = _state.profile = Profile()
+        started = time.perf_counter()
+        try:
+            with ExitStack() as stack:
+                for connection in connections.all():
+                    stack.enter_context(connection.execute_wrapper(profile))
+                return self.get_response(request)
+        finally:
+            _state.profile = None
+            match = getattr(request, 'resolver_match', None)
+            record(
+                match.view_name if match else UNRESOLVED,
+                time.perf_counter() - started,
+                profile,
+            )
@@ -0,0 +1,25 @@
+from django.apps import apps
+from django.db.models.signals import post_delete
+
+from .models import Tombstone, TrackedModel, next_change_seq
+
+
+def tracked_deleted(sender, instance, **kwargs):
+    # Удаление тоже изменение: зеркала должны узнать, что объекта нет.
+    Tombstone.objects.create(
+        change_seq=next_change_seq()[0],
+        model=sender._meta.label_lower,
+        object_id=instance.pk,
+    )
+
+
+def connect_tracked_models():
+    # Подписываемся только на TrackedModel: обработчик post_delete без
+    # sender лишил бы все прочие модели быстрого каскадного удаления.
+    for model in apps.get_models():
+        if issubclass(model, TrackedModel):
+            post_delete.connect(
+                tracked_deleted,
+                sender=model,
+                dispatch_uid=f'tracked_deleted:{model._meta.label_lower}',
+            )
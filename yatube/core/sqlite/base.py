@@ -0,0 +1,20 @@
+"""Бэкенд SQLite, открывающий транзакции через BEGIN IMMEDIATE.
+
+Встроенный бэкенд начинает atomic() с отложенного BEGIN: блокировка
+на запись берётся только на первой записи. Транзакция, которая
+сначала читает, а потом пишет (get_or_create, update_or_create,
+правка в админке), в режиме WAL при чужой записи сразу получает
+«database is locked» — busy_timeout тут не помогает, ведь её снимок
+уже устарел. BEGIN IMMEDIATE берёт блокировку в начале транзакции, и
+конкурирующие транзакции ждут друг друга в пределах busy_timeout.
+
+    DATABASES = {'default': {'ENGINE': 'core.sqlite', ...}}
+"""
+from django.db.backends.sqlite3 import base
+
+BEGIN = 'BEGIN IMMEDIATE'
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    def _start_transaction_under_autocommit(self):
+        self.cursor().execute(BEGIN)
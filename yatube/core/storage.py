@@ -0,0 +1,178 @@
+"""Хранилище файлов с адресацией по содержимому.
+
+Файл получает имя по SHA-256 своего содержимого и кладётся в
+двухуровневую раскладку внутри каталога upload_to:
+
+    posts/small.gif -> posts/3f/a1/3fa1…9c.gif
+
+Так в одном каталоге не скапливаются миллионы файлов, а одинаковые
+картинки, загруженные разными авторами, хранятся один раз. Сколько
+объектов ссылается на файл, считает таблица StoredFile: save()
+прибавляет ссылку, release() убирает её и, когда ссылок не осталось,
+удаляет файл после коммита транзакции.
+
+Существующие файлы переносятся командой relocate_media.
+"""
+import hashlib
+import os
+import re
+import tempfile
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.files.storage import FileSystemStorage
+from django.db import IntegrityError, models, transaction
+from django.db.models import Count
+from django.utils.deconstruct import deconstructible
+
+from .models import StoredFile
+
+# Имя уже адресовано по содержимому: .../ab/cd/<sha256>[.ext]
+HASHED_NAME = re.compile(
+    r'(^|/)(?P<a>[0-9a-f]{2})/(?P<b>[0-9a-f]{2})/'
+    r'(?P<digest>(?P=a)(?P=b)[0-9a-f]{60})(\.[a-z0-9]+)?$'
+)
+
+
+def hashed_name(name, digest):
+    """Имя файла с содержимым digest для исходного имени name."""
+    directory = os.path.dirname(name)
+    ext = os.path.splitext(name)[1].lower()
+    return os.path.join(
+        directory, digest[:2], digest[2:4], f'{digest}{ext}'
+    ).replace('\\', '/')
+
+
+def is_hashed(name):
+    return bool(HASHED_NAME.search(name))
+
+
+@deconstructible
+class ContentAddressedStorage(FileSystemStorage):
+    def get_available_name(self, name, max_length=None):
+        # Окончательное имя зависит от содержимого и выбирается в
+        # _save; одинаковое содержимое и должно давать одно имя.
+        return name
+
+    def _save(self, name, content):
+        final = self.store(name, content)
+        add_reference(final)
+        return final
+
+    def store(self, name, content):
+        """Записать content под именем по содержимому, без учёта ссылок."""
+        # Пишем во временный файл рядом с целью, попутно считая хэш, и
+        # переименовываем: одна запись, и параллельная загрузка того же
+        # содержимого не увидит недописанный файл.
+        directory = os.path.join(self.location, os.path.dirname(name))
+        os.makedirs(directory, exist_ok=True)
+        digest = hashlib.sha256()
+        descriptor, temporary = tempfile.mkstemp(
+            dir=directory, suffix='.part'
+        )
+        try:
+            with os.fdopen(descriptor, 'wb') as file:
+                for chunk in content.chunks():
+                    digest.update(chunk)
+                    file.write(chunk)
+            final = hashed_name(name, digest.hexdigest())
+            path = self.path(final)
+            if os.path.exists(path):
+                os.remove(temporary)
+            else:
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                if self.file_permissions_mode is not None:
+                    os.chmod(temporary, self.file_permissions_mode)
+                os.replace(temporary, path)
+        except BaseException:
+            if os.path.exists(temporary):
+                os.remove(temporary)
+            raise
+        return final
+
+    def release(self, name):
+        """Убрать ссылку на файл; True, если файл будет удалён."""
+        if not name or not release_reference(name):
+            return False
+        transaction.on_commit(lambda: self._delete_unreferenced(name))
+        return True
+
+    def _delete_unreferenced(self, name):
+        # Пока транзакция шла, файл могли загрузить снова.
+        if not StoredFile.objects.filter(name=name, refs__gt=0).exists():
+            self.delete(name)
+
+
+def add_reference(name, count=1):
+    with transaction.atomic(savepoint=False):
+        updated = StoredFile.objects.filter(name=name).update(
+            refs=models.F('refs') + count
+        )
+        if updated:
+            return
+        try:
+            with transaction.atomic():
+                StoredFile.objects.create(name=name, refs=count)
+        except IntegrityError:
+            StoredFile.objects.filter(name=name).update(
+                refs=models.F('refs') + count
+            )
+
+
+def release_reference(name):
+    """Уменьшить счётчик ссылок; True, если ссылок не осталось."""
+    with transaction.atomic(savepoint=False):
+        StoredFile.objects.filter(name=name, refs__gt=0).update(
+            refs=models.F('refs') - 1
+        )
+        left = StoredFile.objects.filter(name=name).values_list(
+            'refs', flat=True
+        ).first()
+        if left == 0:
+            StoredFile.objects.filter(name=name, refs=0).delete()
+    # Файл без записи в таблице (например, ещё не перенесённый)
+    # не удаляется.
+    return left == 0
+
+
+def set_references(counts):
+    """Записать число ссылок {имя: число} как есть (после переноса)."""
+    with transaction.atomic():
+        StoredFile.objects.filter(name__in=list(counts)).delete()
+        StoredFile.objects.bulk_create(
+            StoredFile(name=name, refs=refs) for name, refs in counts.items()
+        )
+
+
+def count_references(queryset, field, names=None):
+    """Число ссылок {имя: число} из поля-файла field объектов queryset.
+
+    names ограничивает подсчёт этими именами; учитываются только
+    файлы в раскладке по содержимому.
+    """
+    rows = queryset.exclude(**{field: ''})
+    if names is not None:
+        rows = rows.filter(**{f'{field}__in': list(names)})
+    return Counter({
+        row[field]: row['refs']
+        for row in rows.values(field).annotate(refs=Count('pk')).order_by()
+        if is_hashed(row[field])
+    })
+
+
+def relocate_files(storage, names, workers=8):
+    """Скопировать файлы names в раскладку по содержимому.
+
+    Чтение, хэширование и запись идут в workers потоках. Генератор
+    пар (старое имя, новое имя или None, если файла нет); старые
+    файлы и ссылки на них в базе остаются вызывающему.
+    """
+    def move(name):
+        try:
+            with storage.open(name) as file:
+                return name, storage.store(name, file)
+        except FileNotFoundError:
+            return name, None
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        yield from pool.map(move, names)
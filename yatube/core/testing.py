@@ -0,0 +1,22 @@
+"""Помощники для тестов."""
+from contextlib import contextmanager
+
+from django.db import DEFAULT_DB_ALIAS, connections
+
+
+@contextmanager
+def run_commit_hooks(using=DEFAULT_DB_ALIAS):
+    """Выполнить колбэки on_commit, поставленные внутри блока.
+
+    TestCase не коммитит транзакцию теста, поэтому отложенные до
+    коммита действия (версии кэш-тегов, удаление файлов) сами не
+    выполняются. Аналог captureOnCommitCallbacks(execute=True) из
+    Django 3.2.
+    """
+    connection = connections[using]
+    start = len(connection.run_on_commit)
+    yield
+    # Колбэк может поставить новый — выполняем, пока список растёт.
+    while len(connection.run_on_commit) > start:
+        _, callback = connection.run_on_commit.pop(start)
+        callback()
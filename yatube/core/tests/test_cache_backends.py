@@ -0,0 +1,96 @@
+import multiprocessing
+import os
+import shutil
+import tempfile
+from unittest import skipUnless
+
+from django.test import SimpleTestCase
+
+from core.cache_backends import SQLiteCache
+
+WORKERS = 4
+INCREMENTS = 200
+
+
+def make_cache(path):
+    return SQLiteCache(path, {'TIMEOUT': None})
+
+
+def hammer(path):
+    """Рабочий процесс: увеличивает общий счётчик и пишет свои ключи."""
+    cache = make_cache(path)
+    for _ in range(INCREMENTS):
+        cache.incr('counter')
+    cache.set_many({f'worker:{os.getpid()}:{n}': n for n in range(50)})
+    cache.add('winner', os.getpid())
+
+
+class SQLiteCacheTests(SimpleTestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, 'cache.sqlite3')
+        self.cache = make_cache(self.path)
+
+    def tearDown(self):
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+    def test_basic_operations(self):
+        """get/set/add/delete и get_many/set_many."""
+        self.cache.set('key', {'value': [1, 2]})
+        self.assertEqual(self.cache.get('key'), {'value': [1, 2]})
+        self.assertFalse(self.cache.add('key', 'другое'))
+        self.assertTrue(self.cache.add('new', 'значение'))
+        self.cache.set_many({'a': 1, 'b': 'два'})
+        self.assertEqual(
+            self.cache.get_many(['a', 'b', 'нет']), {'a': 1, 'b': 'два'}
+        )
+        self.cache.delete_many(['a', 'b'])
+        self.assertEqual(self.cache.get_many(['a', 'b']), {})
+        self.assertIsNone(self.cache.get('missing'))
+
+    def test_expiry(self):
+        """Просроченные записи не возвращаются и не мешают add()."""
+        self.cache.set('gone', 1, timeout=-1)
+        self.assertIsNone(self.cache.get('gone'))
+        self.assertTrue(self.cache.add('gone', 2))
+        self.assertEqual(self.cache.get('gone'), 2)
+
+    def test_incr_and_versions(self):
+        """incr атомарен; версии ключей не пересекаются."""
+        self.cache.set('counter', 10)
+        self.assertEqual(self.cache.incr('counter', 5), 15)
+        self.assertEqual(self.cache.decr('counter'), 14)
+        with self.assertRaises(ValueError):
+            self.cache.incr('missing')
+        self.cache.set('key', 'v1', version=1)
+        self.cache.set('key', 'v2', version=2)
+        self.assertEqual(self.cache.get('key', version=1), 'v1')
+        self.assertEqual(self.cache.incr_version('key', version=2), 3)
+        self.assertEqual(self.cache.get('key', version=3), 'v2')
+
+    @skipUnless(
+        'fork' in multiprocessing.get_all_start_methods(), 'нужен fork()'
+    )
+    def test_consistent_across_processes(self):
+        """Несколько процессов видят общие данные и не теряют incr."""
+        self.cache.set('counter', 0)
+        context = multiprocessing.get_context('fork')
+        processes = [
+            context.Process(target=hammer, args=(self.path,))
+            for _ in range(WORKERS)
+        ]
+        for process in processes:
+            process.start()
+        for process in processes:
+            process.join(60)
+            self.assertEqual(process.exitcode, 0)
+        self.assertEqual(self.cache.get('counter'), WORKERS * INCREMENTS)
+        keys = [
+            f'worker:{process.pid}:{n}'
+            for process in processes for n in range(50)
+        ]
+        self.assertEqual(len(self.cache.get_many(keys)), WORKERS * 50)
+        self.assertIn(
+            self.cache.get('winner'),
+            [process.pid for process in processes]
+        )
@@ -0,0 +1,65 @@
+import multiprocessing
+from unittest import skipUnless
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.test import SimpleTestCase, TestCase, TransactionTestCase
+from django.test.utils import CaptureQueriesContext
+
+from core.db import pragma_statements
+from core.db_benchmark import KINDS, run_mixed_load
+from core.sqlite.base import BEGIN
+
+
+class SQLitePragmaTests(TestCase):
+    def pragma(self, name):
+        with connection.cursor() as cursor:
+            cursor.execute(f'PRAGMA {name}')
+            return cursor.fetchone()[0]
+
+    def test_pragmas_applied_to_connection(self):
+        """PRAGMA из настроек действуют на соединении Django."""
+        if connection.vendor != 'sqlite':
+            self.skipTest('Только для SQLite')
+        pragmas = settings.SQLITE_PRAGMAS
+        self.assertEqual(self.pragma('busy_timeout'), pragmas['busy_timeout'])
+        self.assertEqual(self.pragma('cache_size'), pragmas['cache_size'])
+        self.assertEqual(self.pragma('synchronous'), 1)
+
+    def test_values_are_validated(self):
+        self.assertEqual(
+            pragma_statements({'journal_mode': 'wal', 'cache_size': -10}),
+            ['PRAGMA journal_mode = wal', 'PRAGMA cache_size = -10']
+        )
+        with self.assertRaises(ValueError):
+            pragma_statements({'journal_mode': 'wal; DROP TABLE posts_post'})
+
+
+class ImmediateTransactionTests(TransactionTestCase):
+    def test_atomic_begins_immediate(self):
+        """atomic() сразу берёт блокировку на запись."""
+        if connection.vendor != 'sqlite':
+            self.skipTest('Только для SQLite')
+        with CaptureQueriesContext(connection) as queries:
+            with transaction.atomic():
+                pass
+        self.assertEqual(queries[0]['sql'], BEGIN)
+
+
+class MixedLoadTests(SimpleTestCase):
+    @skipUnless(
+        'fork' in multiprocessing.get_all_start_methods(), 'нужен fork()'
+    )
+    def test_tuned_profile_has_no_locked_errors(self):
+        """С SQLITE_PRAGMAS и BEGIN IMMEDIATE нет блокировок.
+
+        В том числе у транзакций, которые сначала читают, потом пишут.
+        """
+        totals = run_mixed_load(
+            settings.SQLITE_PRAGMAS, writers=4, readers=8, updaters=2,
+            seconds=1
+        )
+        for kind in KINDS:
+            with self.subTest(kind=kind):
+                self.assertGreater(totals[kind]['ops'], 0)
+                self.assertEqual(totals[kind]['locked'], 0)
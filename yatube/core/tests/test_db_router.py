@@ -0,0 +1,168 @@
+import os
+import sqlite3
+import tempfile
+import time
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import AnonymousUser
+from django.core.cache import cache
+from django.http import HttpResponse
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.test.client import RequestFactory
+from django.urls import reverse
+
+from core.cache_tags import bump_tags
+from core.conditional import tagged_condition, tagged_etag
+from core.db import replicate_sqlite
+from core.db_router import (PrimaryReplicaRouter, ReplicaStickinessMiddleware,
+                            use_replicas)
+from core.page_cache import cache_anonymous_page
+from posts.models import Post
+
+User = get_user_model()
+reads = []
+
+
+def page_tags(request):
+    return ['test:replica']
+
+
+@tagged_condition(tagged_etag(page_tags))
+@cache_anonymous_page(page_tags)
+def page(request):
+    reads.append(PrimaryReplicaRouter().db_for_read(Post))
+    return HttpResponse(f'read {len(reads)}')
+
+
+@override_settings(DATABASE_REPLICAS=['replica'])
+class PrimaryReplicaRouterTests(SimpleTestCase):
+    def setUp(self):
+        self.router = PrimaryReplicaRouter()
+        self.addCleanup(use_replicas, False)
+
+    def test_reads_outside_request_go_to_primary(self):
+        use_replicas(False)
+        self.assertEqual(self.router.db_for_read(User), 'default')
+
+    def test_write_pins_rest_of_request_to_primary(self):
+        use_replicas(True)
+        self.assertEqual(self.router.db_for_read(User), 'replica')
+        self.assertEqual(self.router.db_for_write(User), 'default')
+        self.assertEqual(self.router.db_for_read(User), 'default')
+
+    def test_replica_is_not_migrated(self):
+        self.assertFalse(self.router.allow_migrate('replica', 'posts'))
+        self.assertTrue(self.router.allow_migrate('default', 'posts'))
+
+
+@override_settings(DATABASE_REPLICAS=['replica'])
+class ReplicaStickinessMiddlewareTests(SimpleTestCase):
+    def setUp(self):
+        self.factory = RequestFactory()
+        self.router = PrimaryReplicaRouter()
+        self.seen = []
+
+    def view(self, write=False):
+        def get_response(request):
+            if write:
+                self.router.db_for_write(User)
+            self.seen.append(self.router.db_for_read(User))
+            return HttpResponse()
+        return ReplicaStickinessMiddleware(get_response)
+
+    def test_get_reads_from_replica(self):
+        response = self.view()(self.factory.get('/'))
+        self.assertEqual(self.seen, ['replica'])
+        self.assertNotIn('read_primary_until', response.cookies)
+
+    def test_post_reads_from_primary_and_sets_cookie(self):
+        response = self.view(write=True)(self.factory.post('/'))
+        self.assertEqual(self.seen, ['default'])
+        until = int(response.cookies['read_primary_until'].value)
+        self.assertGreater(until, time.time())
+
+    def test_fresh_cookie_pins_reads(self):
+        request = self.factory.get('/')
+        request.COOKIES['read_primary_until'] = str(int(time.time()) + 60)
+        self.view()(request)
+        request = self.factory.get('/')
+        request.COOKIES['read_primary_until'] = str(int(time.time()) - 1)
+        self.view()(request)
+        self.assertEqual(self.seen, ['default', 'replica'])
+
+
+class StickinessThroughViewsTests(TestCase):
+    @override_settings(DATABASE_REPLICAS=['replica'])
+    def test_comment_sets_cookie(self):
+        user = User.objects.create_user(username='writer')
+        post = Post.objects.create(author=user, text='Текст')
+        self.client.force_login(user)
+        response = self.client.post(
+            f'/posts/{post.pk}/comment/', {'text': 'Ответ'}
+        )
+        self.assertIn('read_primary_until', response.cookies)
+
+
+@override_settings(DATABASE_REPLICAS=['replica'])
+class ReplicaAndCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        reads.clear()
+        self.factory = RequestFactory()
+        self.middleware = ReplicaStickinessMiddleware(page)
+
+    def get(self, user=None):
+        request = self.factory.get('/')
+        request.user = user or AnonymousUser()
+        return self.middleware(request)
+
+    def test_cached_page_is_built_from_primary_after_bump(self):
+        """Страница для кэша после смены версии читается не с реплики."""
+        self.get()
+        bump_tags('test:replica')
+        response = self.get()
+        self.assertEqual(response['X-Page-Cache'], 'miss')
+        self.assertEqual(reads, ['default', 'default'])
+        self.assertTrue(response.has_header('ETag'))
+
+    def test_replica_read_drops_etag(self):
+        """Ответ, собранный с реплики, не получает ETag."""
+        bump_tags('test:replica')
+        response = self.get(user=User(pk=1, username='member'))
+        self.assertEqual(reads, ['replica'])
+        self.assertFalse(response.has_header('ETag'))
+
+
+class ReplicaAPITests(TestCase):
+    def test_api_read_from_replica_has_no_etag(self):
+        """JSON API, прочитанный с реплики, тоже не получает ETag."""
+        url = reverse('posts:api_index')
+        self.assertTrue(self.client.get(url).has_header('ETag'))
+        # «Реплика» — та же база default: важно лишь, что роутер
+        # отправил чтение на реплику.
+        with mock.patch('core.db_router.replicas', return_value=['default']):
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(response.has_header('ETag'))
+
+
+class ReplicateSQLiteTests(SimpleTestCase):
+    def test_copies_database(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        source = os.path.join(directory.name, 'primary.sqlite3')
+        target = os.path.join(directory.name, 'replica.sqlite3')
+        connection = sqlite3.connect(source)
+        connection.execute('CREATE TABLE item (value TEXT)')
+        connection.execute("INSERT INTO item VALUES ('a')")
+        connection.commit()
+        replicate_sqlite(source, target)
+        connection.execute("INSERT INTO item VALUES ('b')")
+        connection.commit()
+        connection.close()
+        replicate_sqlite(source, target)
+        replica = sqlite3.connect(target)
+        self.addCleanup(replica.close)
+        rows = replica.execute('SELECT value FROM item ORDER BY value')
+        self.assertEqual(rows.fetchall(), [('a',), ('b',)])
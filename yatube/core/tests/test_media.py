@@ -0,0 +1,104 @@
+import hashlib
+import os
+import shutil
+import tempfile
+
+from django.conf import settings
+from django.test import SimpleTestCase, override_settings
+
+from core.media import byte_range
+from core.storage import hashed_name
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+CONTENT = bytes(range(256)) * 4
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT, MEDIA_SENDFILE='')
+class MediaServeTests(SimpleTestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.hashed = hashed_name(
+            'posts/a.png', hashlib.sha256(CONTENT).hexdigest()
+        )
+        for name in (cls.hashed, 'posts/plain.png', 'posts/.secret'):
+            path = os.path.join(TEMP_MEDIA_ROOT, name)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(path, 'wb') as file:
+                file.write(CONTENT)
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+        super().tearDownClass()
+
+    def get(self, name, **headers):
+        return self.client.get(f'/media/{name}', **headers)
+
+    def body(self, response):
+        return b''.join(response.streaming_content)
+
+    def test_hashed_file_is_immutable(self):
+        response = self.get(self.hashed)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.body(response), CONTENT)
+        self.assertEqual(response['Content-Type'], 'image/png')
+        self.assertEqual(response['Accept-Ranges'], 'bytes')
+        self.assertIn('immutable', response['Cache-Control'])
+        digest = hashlib.sha256(CONTENT).hexdigest()
+        self.assertEqual(response['ETag'], f'"{digest}"')
+
+    def test_plain_file_short_cache(self):
+        response = self.get('posts/plain.png')
+        self.assertNotIn('immutable', response['Cache-Control'])
+        self.assertFalse(response['ETag'].startswith('W/'))
+
+    def test_if_none_match(self):
+        etag = self.get(self.hashed)['ETag']
+        response = self.get(self.hashed, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+    def test_range(self):
+        response = self.get(self.hashed, HTTP_RANGE='bytes=10-19')
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(response['Content-Range'], 'bytes 10-19/1024')
+        self.assertEqual(response['Content-Length'], '10')
+        self.assertEqual(self.body(response), CONTENT[10:20])
+
+    def test_range_with_stale_if_range_sends_whole_file(self):
+        response = self.get(
+            self.hashed, HTTP_RANGE='bytes=10-19', HTTP_IF_RANGE='"old"'
+        )
+        self.assertEqual(response.status_code, 200)
+
+    def test_unsatisfiable_range(self):
+        response = self.get(self.hashed, HTTP_RANGE='bytes=5000-')
+        self.assertEqual(response.status_code, 416)
+        self.assertEqual(response['Content-Range'], 'bytes */1024')
+
+    def test_access_checks(self):
+        for name in ('posts/.secret', 'posts/missing.png', 'other/x.png',
+                     'posts/../posts/plain.png', 'posts'):
+            with self.subTest(name=name):
+                self.assertEqual(self.get(name).status_code, 404)
+        response = self.client.post(f'/media/{self.hashed}')
+        self.assertEqual(response.status_code, 405)
+
+    @override_settings(MEDIA_SENDFILE='x-accel-redirect')
+    def test_accel_redirect(self):
+        response = self.get(self.hashed)
+        self.assertEqual(
+            response['X-Accel-Redirect'], f'/protected-media/{self.hashed}'
+        )
+        self.assertEqual(response.content, b'')
+        self.assertIn('ETag', response)
+
+
+class ByteRangeTests(SimpleTestCase):
+    def test_parse(self):
+        self.assertEqual(byte_range('bytes=0-', 100), (0, 99))
+        self.assertEqual(byte_range('bytes=-10', 100), (90, 99))
+        self.assertEqual(byte_range('bytes=90-200', 100), (90, 99))
+        self.assertIsNone(byte_range('bytes=0-1,5-6', 100))
+        with self.assertRaises(ValueError):
+            byte_range('bytes=100-', 100)
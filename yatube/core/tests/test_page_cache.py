@@ -0,0 +1,95 @@
+from io import StringIO
+from unittest import mock
+
+from django.contrib.auth.models import AnonymousUser, User
+from django.core.cache import cache
+from django.core.management import call_command
+from django.http import HttpResponse
+from django.test import RequestFactory, TestCase
+
+from core.cache_tags import bump_tags
+from core import page_cache
+from core.page_cache import cache_anonymous_page, hit_ratios, skip
+from core.testing import run_commit_hooks
+
+calls = []
+
+
+@cache_anonymous_page(lambda request, slug: [f'test:{slug}'])
+def page(request, slug):
+    calls.append(slug)
+    if request.GET.get('stale'):
+        skip(request)
+    return HttpResponse(f'{slug}:{len(calls)}')
+
+
+class PageCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        calls.clear()
+        self.factory = RequestFactory()
+
+    def get(self, path='/page/', user=None, **params):
+        request = self.factory.get(path, params)
+        request.user = user or AnonymousUser()
+        return page(request, 'a')
+
+    def test_anonymous_hit_and_tag_purge(self):
+        """Гость получает сохранённую страницу до смены версии тега."""
+        first = self.get()
+        second = self.get()
+        self.assertEqual(first.content, second.content)
+        self.assertEqual(second['X-Page-Cache'], 'hit')
+        self.assertEqual(len(calls), 1)
+        bump_tags('test:b')
+        self.assertEqual(self.get()['X-Page-Cache'], 'hit')
+        bump_tags('test:a')
+        self.assertEqual(self.get()['X-Page-Cache'], 'miss')
+        self.assertEqual(len(calls), 2)
+
+    def test_tags_bumped_again_after_commit(self):
+        """Страница, собранная до коммита записи, после него не отдаётся."""
+        self.get()
+        with run_commit_hooks():
+            bump_tags('test:a')
+            # Параллельный читатель до коммита видит старые строки.
+            self.assertEqual(self.get()['X-Page-Cache'], 'miss')
+            self.assertEqual(self.get()['X-Page-Cache'], 'hit')
+        self.assertEqual(self.get()['X-Page-Cache'], 'miss')
+
+    def test_query_string_is_part_of_key(self):
+        self.get(page=1)
+        self.assertEqual(self.get(page=2)['X-Page-Cache'], 'miss')
+
+    def test_authenticated_and_skipped_requests_bypass_cache(self):
+        """Авторизованные и помеченные skip() запросы не кэшируются."""
+        user = User.objects.create(username='member')
+        self.get(user=user)
+        self.get(user=user)
+        self.get(stale=1)
+        self.get(stale=1)
+        self.assertEqual(len(calls), 4)
+
+    def test_hit_ratios(self):
+        """Статистика попаданий по view и команда отчёта."""
+        for _ in range(4):
+            self.get()
+        self.assertEqual(hit_ratios(), {'page': (3, 1, 0.75)})
+        out = StringIO()
+        call_command('page_cache_stats', stdout=out)
+        self.assertIn('page: попаданий 3, промахов 1', out.getvalue())
+        quiet = StringIO()
+        call_command('page_cache_stats', '--reset', verbosity=0, stdout=quiet)
+        self.assertEqual(quiet.getvalue(), '')
+        self.assertEqual(hit_ratios(), {})
+
+    def test_counting_a_hit_is_one_write(self):
+        """Известный счётчик только увеличивается, без cache.add."""
+        self.get()
+        self.get()
+        with mock.patch.object(
+            page_cache.cache, 'add', wraps=page_cache.cache.add
+        ) as add:
+            self.get()
+        add.assert_not_called()
+        self.assertEqual(hit_ratios(), {'page': (2, 1, 2 / 3)})
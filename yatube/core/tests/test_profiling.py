@@ -0,0 +1,60 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import TestCase, modify_settings
+
+from core import profiling
+from posts.models import Post
+
+User = get_user_model()
+
+
+@modify_settings(MIDDLEWARE={'prepend': 'core.profiling.ProfilingMiddleware'})
+class ProfilingTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.staff = User.objects.create_user(username='staff', is_staff=True)
+        cls.author = User.objects.create_user(username='author')
+        Post.objects.create(author=cls.author, text='Текст')
+
+    def setUp(self):
+        cache.clear()
+        profiling.reset()
+        self.addCleanup(profiling.reset)
+
+    def test_request_is_recorded_per_view(self):
+        self.client.get('/')
+        self.client.get('/')
+        stats = profiling._views['posts:index']
+        self.assertEqual(stats.duration.cumulative()[-1], ('+Inf', 2))
+        self.assertGreater(stats.queries.sum, 0)
+        self.assertGreater(stats.sql_seconds, 0)
+        self.assertGreater(stats.template_seconds, 0)
+        self.assertGreater(stats.cache_hits, 0)
+        self.assertGreater(stats.cache_misses, 0)
+
+    def test_unresolved_path(self):
+        self.client.get('/no/such/page/')
+        self.assertIn(profiling.UNRESOLVED, profiling._views)
+
+    def test_metrics_in_prometheus_format(self):
+        self.client.get('/')
+        self.client.force_login(self.staff)
+        response = self.client.get('/metrics')
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response['Content-Type'].startswith('text/plain'))
+        text = response.content.decode()
+        self.assertIn('# TYPE yatube_request_duration_seconds histogram', text)
+        self.assertIn(
+            'yatube_request_duration_seconds_count{view="posts:index"} 1',
+            text
+        )
+        self.assertIn(
+            'yatube_request_duration_seconds_bucket'
+            '{view="posts:index",le="+Inf"} 1',
+            text
+        )
+
+    def test_metrics_are_staff_only(self):
+        self.client.force_login(self.author)
+        response = self.client.get('/metrics')
+        self.assertEqual(response.status_code, 302)
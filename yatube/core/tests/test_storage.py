@@ -0,0 +1,126 @@
+import hashlib
+import os
+import shutil
+import tempfile
+from io import StringIO
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.test import TestCase, TransactionTestCase, override_settings
+
+from core.models import StoredFile
+from core.storage import ContentAddressedStorage, hashed_name, is_hashed
+from posts.models import Post, User
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+CONTENT = b'GIF89a' + b'\x00' * 20
+
+
+def expected_name(content=CONTENT, name='posts/a.gif'):
+    return hashed_name(name, hashlib.sha256(content).hexdigest())
+
+
+class MediaRootMixin:
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+        super().tearDownClass()
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class ContentAddressedStorageTests(MediaRootMixin, TestCase):
+    def setUp(self):
+        self.storage = ContentAddressedStorage()
+
+    def test_sharded_name_and_dedup(self):
+        first = self.storage.save('posts/a.gif', ContentFile(CONTENT))
+        second = self.storage.save('posts/B.GIF', ContentFile(CONTENT))
+        self.assertEqual(first, expected_name())
+        self.assertEqual(second, first)
+        self.assertTrue(is_hashed(first))
+        self.assertFalse(is_hashed('posts/a.gif'))
+        self.assertRegex(first, r'^posts/[0-9a-f]{2}/[0-9a-f]{2}/')
+        self.assertEqual(StoredFile.objects.get(name=first).refs, 2)
+        leftovers = [
+            name for name in os.listdir(self.storage.path('posts'))
+            if name.endswith('.part')
+        ]
+        self.assertEqual(leftovers, [])
+
+    def test_release_counts_references(self):
+        name = self.storage.save('posts/a.gif', ContentFile(CONTENT))
+        self.storage.save('posts/a.gif', ContentFile(CONTENT))
+        self.assertFalse(self.storage.release(name))
+        self.assertTrue(self.storage.release(name))
+        self.assertFalse(StoredFile.objects.filter(name=name).exists())
+        # Файл без учёта ссылок не трогаем.
+        self.assertFalse(self.storage.release('posts/legacy.gif'))
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class PostImageReferenceTests(MediaRootMixin, TransactionTestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='author')
+
+    def create(self, content=CONTENT):
+        return Post.objects.create(
+            author=self.user, text='Пост',
+            image=SimpleUploadedFile('a.gif', content),
+        )
+
+    def test_shared_file_deleted_with_last_post(self):
+        first, second = self.create(), self.create()
+        storage = Post.image.field.storage
+        name = first.image.name
+        self.assertEqual(second.image.name, name)
+        Post.objects.get(pk=first.pk).delete()
+        self.assertTrue(storage.exists(name))
+        Post.objects.get(pk=second.pk).delete()
+        self.assertFalse(storage.exists(name))
+
+    def test_replaced_image_released(self):
+        post = self.create()
+        old = post.image.name
+        post = Post.objects.get(pk=post.pk)
+        post.image = SimpleUploadedFile('b.gif', CONTENT + b'\x01')
+        post.save()
+        self.assertFalse(Post.image.field.storage.exists(old))
+
+    def test_same_image_uploaded_again(self):
+        """Повторная загрузка той же картинки не добавляет ссылку."""
+        post = self.create()
+        name = post.image.name
+        post = Post.objects.get(pk=post.pk)
+        post.image = SimpleUploadedFile('copy.gif', CONTENT)
+        post.save()
+        self.assertEqual(post.image.name, name)
+        self.assertEqual(StoredFile.objects.get(name=name).refs, 1)
+        post.delete()
+        self.assertFalse(Post.image.field.storage.exists(name))
+
+    def test_relocate_media(self):
+        legacy = []
+        for number in range(3):
+            name = f'posts/legacy{number}.gif'
+            path = os.path.join(TEMP_MEDIA_ROOT, name)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(path, 'wb') as file:
+                file.write(CONTENT if number < 2 else CONTENT + b'\x02')
+            legacy.append(name)
+        for name in legacy + ['posts/missing.gif']:
+            Post.objects.create(author=self.user, text='Старый', image=name)
+        call_command('relocate_media', workers=2, stdout=StringIO())
+        names = list(Post.objects.order_by('pk').values_list(
+            'image', flat=True
+        ))
+        self.assertEqual(names[0], expected_name(name='posts/legacy0.gif'))
+        self.assertEqual(names[0], names[1])
+        self.assertNotEqual(names[1], names[2])
+        self.assertEqual(names[3], 'posts/missing.gif')
+        self.assertEqual(StoredFile.objects.get(name=names[0]).refs, 2)
+        for name in legacy:
+            self.assertFalse(os.path.exists(
+                os.path.join(TEMP_MEDIA_ROOT, name)
+            ))
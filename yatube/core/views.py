@@ -1,5 +1,9 @@
+from django.contrib.admin.views.decorators import staff_member_required
+from django.http import HttpResponse
 from django.shortcuts import render
 
+from . import profiling
+
 
 def page_not_found(request, exception):
     # Переменная exception содержит отладочную информацию;
@@ -9,3 +13,11 @@ def page_not_found(request, exception):
 
 def csrf_failure(request, reason=''):
     return render(request, 'core/403csrf.html')
+
+
+@staff_member_required
+def metrics(request):
+    return HttpResponse(
+        profiling.prometheus_text(),
+        content_type='text/plain; version=0.0.4; charset=utf-8',
+    )
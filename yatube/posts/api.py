@@ -0,0 +1,123 @@
+"""JSON API v1 для лент: главная, группа, профиль.
+
+Ответ собирается из строк .values() без создания объектов моделей и
+без шаблонов. Пагинация — курсорная (?cursor=), поля можно
+ограничить параметром ?fields=id,text. JSON пишется без пробелов и
+сжимается gzip, если клиент его принимает.
+
+ETag выдаёт core.conditional.tagged_condition, как и HTML-страницам:
+ответ, прочитанный с отстающей реплики, его не получает.
+"""
+from django.core.files.storage import default_storage
+from django.http import Http404, JsonResponse
+from django.views.decorators.gzip import gzip_page
+from django.views.decorators.http import require_GET
+
+from core.cache_tags import request_tags
+from core.conditional import tagged_condition
+from core.paginator import CursorPaginator, InvalidCursor
+
+from . import etags
+from .models import Post
+
+API_PAGE_SIZE = 20
+# Поле ответа -> колонка .values().
+POST_FIELDS = {
+    'id': 'id',
+    'text': 'text',
+    'created': 'created',
+    'updated': 'updated',
+    'author': 'author__username',
+    'group': 'group__slug',
+    'image': 'image',
+    'comments_count': 'comments_count',
+}
+# Колонки, без которых не построить курсор.
+CURSOR_COLUMNS = ('created', 'id')
+JSON_PARAMS = {'separators': (',', ':'), 'ensure_ascii': False}
+
+
+def _error(message, status=400):
+    return JsonResponse(
+        {'error': message}, status=status, json_dumps_params=JSON_PARAMS
+    )
+
+
+def requested_fields(request):
+    """Поля из ?fields= по порядку POST_FIELDS; ValueError на незнакомые."""
+    raw = request.GET.get('fields')
+    if not raw:
+        return list(POST_FIELDS)
+    names = {name.strip() for name in raw.split(',') if name.strip()}
+    unknown = names - set(POST_FIELDS)
+    if unknown:
+        raise ValueError(', '.join(sorted(unknown)))
+    return [name for name in POST_FIELDS if name in names]
+
+
+def _serialize(row, fields):
+    item = {name: row[POST_FIELDS[name]] for name in fields}
+    if item.get('image'):
+        item['image'] = default_storage.url(item['image'])
+    elif 'image' in item:
+        item['image'] = None
+    return item
+
+
+def posts_response(request, queryset):
+    """Страница постов queryset в JSON."""
+    try:
+        fields = requested_fields(request)
+    except ValueError as error:
+        return _error(f'Неизвестные поля: {error}')
+    columns = {POST_FIELDS[name] for name in fields} | set(CURSOR_COLUMNS)
+    rows = queryset.values(*columns)
+    paginator = CursorPaginator(rows, API_PAGE_SIZE)
+    try:
+        page = paginator.cursor_page(request.GET.get('cursor'))
+    except InvalidCursor:
+        return _error('Некорректный курсор')
+    params = request.GET.copy()
+
+    def link(cursor):
+        if cursor is None:
+            return None
+        params['cursor'] = cursor
+        return f'{request.path}?{params.urlencode()}'
+
+    return JsonResponse(
+        {
+            'results': [_serialize(row, fields) for row in page],
+            'next': link(page.next_cursor),
+            'previous': link(page.previous_cursor),
+        },
+        json_dumps_params=JSON_PARAMS,
+    )
+
+
+@require_GET
+@gzip_page
+@tagged_condition(etags.index_etag)
+def index(request):
+    return posts_response(request, Post.objects.all())
+
+
+@require_GET
+@gzip_page
+@tagged_condition(etags.group_etag)
+def group_posts(request, slug):
+    # Существование группы уже проверено при расчёте ETag.
+    if request_tags(request, etags.group_page_tags, slug) is None:
+        raise Http404('Группа не найдена')
+    return posts_response(request, Post.objects.filter(group__slug=slug))
+
+
+@require_GET
+@gzip_page
+@tagged_condition(etags.profile_etag)
+def profile(request, username):
+    if request_tags(request, etags.profile_page_tags, username) is None:
+        raise Http404('Автор не найден')
+    return posts_response(
+        request, Post.objects.filter(author__username=username)
+    )
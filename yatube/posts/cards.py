@@ -0,0 +1,76 @@
+"""Кэш карточек постов, общий для всех лент.
+
+Карточка (posts/includes/post_card.html) одинакова на главной, в
+группе, профиле, ленте подписок и поиске, поэтому её HTML хранится
+под ключом поста и его версии. Версия складывается из того, что
+выводится в карточке:
+
+* change_seq поста — растёт при каждом сохранении;
+* change_seq группы — растёт при переименовании;
+* имя и username автора — приходят в ленту тем же JOIN;
+* готовые ширины кадров картинки (заглушка сменится на <picture>);
+* settings.RELEASE — новая разметка после выкладки.
+
+Все карточки страницы читаются одним get_many; рендерятся и
+записываются одним set_many только промахи.
+
+Страница, где вместо картинки вышла заглушка, устареет, как только
+кадры будут готовы, а тегов кадры не поднимают: prepare_cards()
+сообщает о заглушках, и view не отдаёт такую страницу в кэш и без
+ETag (page_cache.skip).
+"""
+import hashlib
+
+from django.conf import settings
+from django.core.cache import cache
+from django.template.loader import render_to_string
+from django.utils.safestring import mark_safe
+
+from .renditions import (has_placeholder, prefetch_renditions,
+                         schedule_renditions)
+
+CARD_TEMPLATE = 'posts/includes/post_card.html'
+CARD_TIMEOUT = 60 * 60 * 24
+
+
+def card_version(post):
+    author = post.author
+    group = post.group
+    renditions = getattr(post, 'renditions', None)
+    raw = ':'.join(map(str, (
+        post.change_seq,
+        group.change_seq if group else '',
+        author.username, author.first_name, author.last_name,
+        ','.join(map(str, renditions.widths)) if renditions else '',
+        settings.RELEASE,
+    )))
+    return hashlib.md5(raw.encode()).hexdigest()
+
+
+def card_key(post):
+    return f'post-card:{post.pk}:{card_version(post)}'
+
+
+def prepare_cards(posts):
+    """Положить в post.card готовый HTML карточки каждого поста.
+
+    Возвращает True, если хотя бы у одной карточки заглушка вместо
+    картинки.
+    """
+    posts = prefetch_renditions(posts)
+    keys = {post.pk: card_key(post) for post in posts}
+    found = cache.get_many(keys.values())
+    rendered = {}
+    for post in posts:
+        key = keys[post.pk]
+        if key not in found:
+            found[key] = rendered[key] = render_to_string(
+                CARD_TEMPLATE, {'post': post}
+            )
+        elif post.image and post.renditions is None:
+            # Карточка с заглушкой взята из кэша: кадры всё равно нужны.
+            schedule_renditions(post.image)
+        post.card = mark_safe(found[key])
+    if rendered:
+        cache.set_many(rendered, CARD_TIMEOUT)
+    return has_placeholder(posts)
@@ -0,0 +1,97 @@
+"""Денормализованные счётчики постов, комментариев и подписок.
+
+Счётчики меняются атомарным UPDATE ... SET x = x + 1 из сигналов,
+поэтому остаются верными и при записи в обход представлений.
+rebuild_counters() пересчитывает их целиком (manage.py rebuild_counters).
+"""
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+from .models import Comment, Follow, Group, Post, User, UserStats
+
+
+def stats_for(user):
+    """Счётчики пользователя; до первой записи — нули."""
+    try:
+        return user.stats
+    except UserStats.DoesNotExist:
+        return UserStats(user=user)
+
+
+def _bump(queryset, field, delta):
+    """Сдвинуть счётчик, не уходя ниже нуля; вернуть число строк."""
+    if delta < 0:
+        queryset = queryset.filter(**{f'{field}__gte': -delta})
+    return queryset.update(**{field: F(field) + delta})
+
+
+def bump_user(user_id, field, delta):
+    rows = UserStats.objects.filter(user_id=user_id)
+    if _bump(rows, field, delta) or delta < 0:
+        return
+    try:
+        with transaction.atomic():
+            UserStats.objects.create(user_id=user_id, **{field: delta})
+    except IntegrityError:
+        # Строку успел создать параллельный запрос.
+        _bump(rows, field, delta)
+
+
+def bump_group(group_id, delta):
+    if group_id is not None:
+        _bump(Group.objects.filter(pk=group_id), 'posts_count', delta)
+
+
+def bump_post(post_id, delta):
+    _bump(Post.objects.filter(pk=post_id), 'comments_count', delta)
+
+
+def _count(model, field, outer='pk'):
+    rows = model.objects.filter(
+        **{field: OuterRef(outer)}
+    ).order_by().values(field).annotate(total=Count('pk')).values('total')
+    return Coalesce(Subquery(rows), 0)
+
+
+def expected_counters():
+    """Наборы (модель, поле, выражение) с честно посчитанными значениями."""
+    return (
+        (UserStats, 'posts_count', _count(Post, 'author', 'user')),
+        (UserStats, 'followers_count', _count(Follow, 'author', 'user')),
+        (UserStats, 'following_count', _count(Follow, 'user', 'user')),
+        (Group, 'posts_count', _count(Post, 'group')),
+        (Post, 'comments_count', _count(Comment, 'post')),
+    )
+
+
+def find_drift():
+    """Количество строк, где сохранённый счётчик расходится с данными."""
+    drift = {}
+    for model, field, expression in expected_counters():
+        wrong = model.objects.annotate(
+            _expected=expression
+        ).exclude(**{field: F('_expected')}).count()
+        if wrong:
+            drift[f'{model.__name__}.{field}'] = wrong
+    missing = User.objects.filter(stats__isnull=True).count()
+    if missing:
+        drift['UserStats (нет строки)'] = missing
+    return drift
+
+
+@transaction.atomic
+def rebuild_counters():
+    """Пересчитать все счётчики одним UPDATE на поле."""
+    UserStats.objects.bulk_create(
+        [
+            UserStats(user_id=user_id)
+            for user_id in User.objects.filter(
+                stats__isnull=True
+            ).values_list('pk', flat=True).iterator()
+        ],
+        batch_size=500,
+        ignore_conflicts=True
+    )
+    for model, field, expression in expected_counters():
+        model.objects.update(**{field: expression})
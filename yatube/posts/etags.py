@@ -0,0 +1,67 @@
+"""Теги страниц постов и ETag для condition().
+
+По тем же тегам core.page_cache сбрасывает закэшированные страницы.
+Теги страницы находятся без запросов к таблицам постов: группа и
+автор ищутся по slug и username, а автор поста берётся из кэша —
+у поста он не меняется.
+"""
+from django.core.cache import cache
+
+from core.conditional import tagged_etag
+
+from . import feed_cache
+from .models import Group, Post, User
+
+POST_AUTHOR_TIMEOUT = 24 * 60 * 60
+
+
+def post_author_id(post_id):
+    """id автора поста; None, если поста нет."""
+    key = f'post-author:{post_id}'
+    author_id = cache.get(key)
+    if author_id is None:
+        author_id = Post.objects.filter(pk=post_id).values_list(
+            'author_id', flat=True
+        ).first()
+        if author_id is not None:
+            cache.set(key, author_id, POST_AUTHOR_TIMEOUT)
+    return author_id
+
+
+def _viewer_tags(request):
+    # Кнопка «Подписаться» и ссылки в шапке зависят от подписок
+    # текущего пользователя.
+    if request.user.is_authenticated:
+        return [f'posts:follow:{request.user.pk}']
+    return []
+
+
+def index_page_tags(request):
+    return feed_cache.index_tags()
+
+
+def group_page_tags(request, slug):
+    group = Group.objects.filter(slug=slug).only('pk').first()
+    if group is None:
+        return None
+    return feed_cache.group_tags(group)
+
+
+def profile_page_tags(request, username):
+    author = User.objects.filter(username=username).only('pk').first()
+    if author is None:
+        return None
+    return [*feed_cache.profile_tags(author), *_viewer_tags(request)]
+
+
+def post_page_tags(request, post_id):
+    author_id = post_author_id(post_id)
+    if author_id is None:
+        return None
+    return feed_cache.post_tags(post_id, author_id)
+
+
+index_etag = tagged_etag(index_page_tags)
+group_etag = tagged_etag(group_page_tags)
+profile_etag = tagged_etag(profile_page_tags)
+post_etag = tagged_etag(post_page_tags)
@@ -0,0 +1,188 @@
+"""Кэш страниц лент.
+
+Кэшируется содержимое страницы ленты (посты и состояние пагинации),
+а не HTML. Запись зависит от версий тегов ленты (core.cache_tags):
+сигналы поднимают их при записи постов, групп, подписок и смене имени
+автора. Устаревшая запись какое-то время ещё хранится: пока один
+запрос пересобирает страницу, остальные получают прежнюю версию
+(stale-while-revalidate).
+"""
+import hashlib
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.paginator import Page
+
+from core import page_cache
+from core.cache_tags import bump_tags, versions_key
+from core.db_router import primary_reads
+from core.paginator import CursorPaginator, paginate
+
+from .models import Follow
+
+POSTS_PER_PAGE = 10
+# Теги, от которых зависят все ленты: в карточках поста выводятся
+# названия групп и имена авторов.
+SHARED_TAGS = ('posts:groups', 'posts:users')
+REBUILD_LOCK_TIMEOUT = 10
+
+
+def index_tags():
+    return ['posts:index', *SHARED_TAGS]
+
+
+def group_tags(group):
+    return [f'posts:group:{group.pk}', *SHARED_TAGS]
+
+
+def author_tags(author):
+    return [f'posts:author:{author.pk}', *SHARED_TAGS]
+
+
+def follow_tags(user):
+    # Материализованную часть ленты сбрасывает тег подписчика: его
+    # поднимают раскладка, правка и удаление постов (posts.timeline).
+    # Посты крупных авторов читаются при чтении — от их тегов лента
+    # зависит напрямую; таких авторов немного.
+    pulled = Follow.objects.filter(
+        user=user, fanout_on_read=True
+    ).values_list('author_id', flat=True)
+    return [
+        f'posts:follow:{user.pk}',
+        *SHARED_TAGS,
+        *(f'posts:author:{author_id}' for author_id in pulled),
+    ]
+
+
+def profile_tags(author):
+    # На странице профиля ещё и счётчики подписок.
+    return [*author_tags(author), f'posts:profile:{author.pk}']
+
+
+def post_tags(post_id, author_id):
+    # «Всего постов автора» на странице поста зависит от тега автора.
+    return [
+        f'posts:post:{post_id}',
+        f'posts:author:{author_id}',
+        *SHARED_TAGS,
+    ]
+
+
+def _page_token(request):
+    page_number = request.GET.get('page')
+    if page_number is not None:
+        return f'page:{page_number}'
+    return f'cursor:{request.GET.get("cursor", "")}'
+
+
+def _page_state(page):
+    state = {
+        'posts': list(page.object_list),
+        'number': page.number,
+        'is_cursor': getattr(page, 'is_cursor', False),
+    }
+    if state['is_cursor']:
+        state.update(
+            cursor=page.cursor,
+            next_cursor=page.next_cursor,
+            previous_cursor=page.previous_cursor,
+        )
+    else:
+        state['count'] = page.paginator.count
+    return state
+
+
+def _restore_page(state, post_list, paginator_class):
+    paginator = paginator_class(post_list, POSTS_PER_PAGE)
+    page = Page(state['posts'], state['number'], paginator)
+    if state['is_cursor']:
+        page.is_cursor = True
+        page.cursor = state['cursor']
+        page.next_cursor = state['next_cursor']
+        page.previous_cursor = state['previous_cursor']
+    else:
+        # Paginator.count — cached_property: подставляем готовое значение,
+        # чтобы шаблон не делал COUNT(*).
+        paginator.__dict__['count'] = state['count']
+    return page
+
+
+def feed_page(request, feed, tags, post_list,
+              paginator_class=CursorPaginator):
+    """Страница ленты feed из кэша или, при промахе, из базы."""
+    token = hashlib.md5(_page_token(request).encode()).hexdigest()
+    key = f'feed:{feed}:{token}'
+    lock_key = f'{key}:lock'
+    version = versions_key(tags)
+    entry = cache.get(key)
+    if (entry is not None and entry['version'] == version
+            and entry['fresh_until'] > time.time()):
+        return _restore_page(entry['page'], post_list, paginator_class)
+    locked = cache.add(lock_key, 1, REBUILD_LOCK_TIMEOUT)
+    if entry is not None and not locked:
+        # Страницу уже пересобирает другой запрос.
+        page_cache.skip(request)
+        return _restore_page(entry['page'], post_list, paginator_class)
+    try:
+        # Страница уйдёт в кэш под текущей версией: не с реплики.
+        with primary_reads():
+            page = paginate(
+                post_list, request, POSTS_PER_PAGE, paginator_class
+            )
+            # Номерная страница держит срез QuerySet; фиксируем список,
+            # чтобы шаблон не выполнил запрос повторно.
+            page.object_list = list(page.object_list)
+        cache.set(
+            key,
+            {
+                'version': version,
+                'fresh_until': time.time() + settings.FEED_CACHE_TIMEOUT,
+                'page': _page_state(page),
+            },
+            settings.FEED_CACHE_TIMEOUT + settings.FEED_CACHE_STALE_TIMEOUT
+        )
+    finally:
+        if locked:
+            cache.delete(lock_key)
+    return page
+
+
+def invalidate_all():
+    # От общих тегов зависят все ленты и страницы постов.
+    bump_tags('posts:index', *SHARED_TAGS)
+
+
+def invalidate_post(post, previous_group_id=None):
+    tags = [
+        'posts:index',
+        f'posts:author:{post.author_id}',
+        f'posts:post:{post.pk}',
+    ]
+    for group_id in {post.group_id, previous_group_id} - {None}:
+        tags.append(f'posts:group:{group_id}')
+    bump_tags(*tags)
+
+
+def invalidate_group(group):
+    bump_tags(f'posts:group:{group.pk}', 'posts:groups')
+
+
+def invalidate_comment(comment):
+    bump_tags(f'posts:post:{comment.post_id}')
+
+
+def invalidate_follow(follow):
+    bump_tags(
+        f'posts:follow:{follow.user_id}',
+        f'posts:profile:{follow.user_id}',
+        f'posts:profile:{follow.author_id}',
+    )
+
+
+def invalidate_follow_feeds(user_ids):
+    bump_tags(*(f'posts:follow:{user_id}' for user_id in user_ids))
+
+
+def invalidate_user(user):
+    bump_tags(f'posts:author:{user.pk}', 'posts:users')
@@ -1,5 +1,8 @@
 from django import forms
+from django.core.files.uploadedfile import UploadedFile
 from django.forms import ModelForm
+
+from .images import normalize_image
 from .models import Comment, Follow, Post
 
 
@@ -13,6 +16,25 @@ class PostForm(forms.ModelForm):
             'group': 'Группа, к которой будет относиться пост'
         }
 
+    def clean_image(self):
+        image = self.cleaned_data.get('image')
+        # Обрабатываем только новый файл, а не уже сохранённый.
+        if not isinstance(image, UploadedFile):
+            return image
+        normalized = normalize_image(image)
+        self.image_size = (normalized.width, normalized.height)
+        return normalized.file
+
+    def save(self, commit=True):
+        post = super().save(commit=False)
+        if hasattr(self, 'image_size'):
+            post.image_width, post.image_height = self.image_size
+        elif not post.image:
+            post.image_width = post.image_height = None
+        if commit:
+            post.save()
+        return post
+
 
 class CommentForm(forms.ModelForm):
     class Meta:
@@ -0,0 +1,40 @@
+"""SQL таблицы FTS5 и её триггеров.
+
+Единственное место с этим SQL: его выполняют миграция
+0014_post_search и posts.search.ensure_triggers(). Модуль не
+импортирует модели, чтобы миграция не зависела от их текущего вида.
+"""
+SEARCH_TABLE = 'posts_post_fts'
+
+CREATE_TABLE = (
+    f'CREATE VIRTUAL TABLE {SEARCH_TABLE} USING fts5('
+    "text, content='posts_post', content_rowid='id', "
+    "tokenize='unicode61 remove_diacritics 2')"
+)
+
+TRIGGERS = {
+    'posts_post_fts_insert': (
+        'AFTER INSERT ON posts_post BEGIN '
+        'INSERT INTO posts_post_fts(rowid, text) VALUES (new.id, new.text); '
+        'END'
+    ),
+    'posts_post_fts_delete': (
+        'AFTER DELETE ON posts_post BEGIN '
+        'INSERT INTO posts_post_fts(posts_post_fts, rowid, text) '
+        "VALUES ('delete', old.id, old.text); "
+        'END'
+    ),
+    'posts_post_fts_update': (
+        'AFTER UPDATE OF text ON posts_post BEGIN '
+        'INSERT INTO posts_post_fts(posts_post_fts, rowid, text) '
+        "VALUES ('delete', old.id, old.text); "
+        'INSERT INTO posts_post_fts(rowid, text) VALUES (new.id, new.text); '
+        'END'
+    ),
+}
+
+REBUILD = f"INSERT INTO {SEARCH_TABLE}({SEARCH_TABLE}) VALUES ('rebuild')"
+
+
+def create_trigger(name):
+    return f'CREATE TRIGGER {name} {TRIGGERS[name]}'
@@ -0,0 +1,123 @@
+"""Обработка картинок постов при загрузке.
+
+PostForm пропускает каждый новый файл через normalize_image():
+
+* размер в пикселях проверяется по заголовку до декодирования —
+  картинка-«бомба» (крошечный файл на сотни мегапикселей) отклоняется,
+  не заняв памяти;
+* фото поворачивается по EXIF Orientation, у анимации остаётся
+  первый кадр;
+* длинная сторона уменьшается до IMAGE_MAX_DIMENSION;
+* картинка перекодируется: без прозрачности — в прогрессивный JPEG,
+  с прозрачностью — в PNG; EXIF, ICC и прочие метаданные не
+  сохраняются.
+
+Если исходник уже в пределах и перекодирование его не уменьшает,
+файл сохраняется как есть. Размеры результата записываются в
+Post.image_width/image_height, чтобы шаблонам не открывать оригинал.
+"""
+import os
+from io import BytesIO
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from PIL import Image, ImageOps
+
+# Форматы, которые браузеры показывают без перекодирования.
+WEB_FORMATS = {'JPEG': 'jpg', 'PNG': 'png', 'GIF': 'gif', 'WEBP': 'webp'}
+CONTENT_TYPES = {'JPEG': 'image/jpeg', 'PNG': 'image/png'}
+# Метаданные, которые Pillow кладёт в image.info.
+METADATA_KEYS = (
+    'exif', 'icc_profile', 'xmp', 'XML:com.adobe.xmp', 'comment',
+)
+
+
+class NormalizedImage:
+    """Файл для сохранения в Post.image и его размеры."""
+
+    def __init__(self, file, width, height):
+        self.file = file
+        self.width = width
+        self.height = height
+
+
+def _open(upload):
+    upload.seek(0)
+    try:
+        image = Image.open(upload)
+    except Exception:
+        raise ValidationError(
+            'Загрузите правильное изображение.', code='invalid_image'
+        )
+    # Image.open читает только заголовок: проверяем до декодирования.
+    if image.width * image.height > settings.IMAGE_MAX_PIXELS:
+        raise ValidationError(
+            'Слишком большое изображение: %(width)s×%(height)s.',
+            code='image_too_large',
+            params={'width': image.width, 'height': image.height},
+        )
+    return image
+
+
+def _needs_rewrite(image):
+    limit = settings.IMAGE_MAX_DIMENSION
+    return (
+        image.format not in WEB_FORMATS
+        or getattr(image, 'is_animated', False)
+        or max(image.size) > limit
+        or any(key in image.info for key in METADATA_KEYS)
+    )
+
+
+def _has_alpha(image):
+    return image.mode in ('RGBA', 'LA', 'PA') or (
+        image.mode == 'P' and 'transparency' in image.info
+    )
+
+
+def _encode(image):
+    """Уменьшить и перекодировать; вернуть (байты, формат, картинка)."""
+    image.seek(0)
+    image = ImageOps.exif_transpose(image)
+    limit = settings.IMAGE_MAX_DIMENSION
+    image.thumbnail((limit, limit), Image.LANCZOS)
+    buffer = BytesIO()
+    if _has_alpha(image):
+        image = image.convert('RGBA')
+        image.save(buffer, 'PNG', optimize=True)
+        fmt = 'PNG'
+    else:
+        image = image.convert('RGB')
+        image.save(
+            buffer, 'JPEG', quality=settings.IMAGE_JPEG_QUALITY,
+            optimize=True, progressive=True,
+        )
+        fmt = 'JPEG'
+    return buffer.getvalue(), fmt, image
+
+
+def normalize_image(upload):
+    """Проверить и ужать загруженный файл; ValidationError при ошибке."""
+    with _open(upload) as image:
+        rewrite = _needs_rewrite(image)
+        original_size = image.size
+        data, fmt, result = _encode(image)
+    if not rewrite and len(data) >= upload.size:
+        upload.seek(0)
+        return NormalizedImage(upload, *original_size)
+    stem = os.path.splitext(os.path.basename(upload.name))[0] or 'image'
+    name = f'{stem}.{WEB_FORMATS[fmt]}'
+    return NormalizedImage(
+        SimpleUploadedFile(name, data, CONTENT_TYPES[fmt]), *result.size
+    )
+
+
+def image_size(name):
+    """Размеры сохранённой картинки по заголовку или (None, None)."""
+    try:
+        with default_storage.open(name) as file, Image.open(file) as image:
+            return image.size
+    except (OSError, ValueError):
+        return None, None
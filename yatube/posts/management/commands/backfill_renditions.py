@@ -0,0 +1,33 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from posts.models import Post, Rendition
+from posts.renditions import render_many
+
+
+class Command(BaseCommand):
+    help = 'Готовит кадры srcset для картинок уже опубликованных постов.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=4,
+            help='Сколько картинок обрабатывать параллельно.',
+        )
+
+    def handle(self, *args, **options):
+        pending = list(
+            Post.objects.exclude(image='').exclude(
+                image__in=Rendition.objects.values('source')
+            ).values_list('image', flat=True).distinct()
+        )
+        succeeded, failed = render_many(pending, options['workers'])
+        if failed:
+            # Причины ошибок — в логе posts.renditions.
+            raise CommandError(
+                f'Подготовлено картинок: {succeeded}; '
+                f'не удалось: {failed}.'
+            )
+        self.stdout.write(self.style.SUCCESS(
+            f'Подготовлено картинок: {succeeded}.'
+        ))
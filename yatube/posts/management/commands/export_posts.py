@@ -0,0 +1,46 @@
+from django.core.management.base import BaseCommand
+
+from posts.transfer import (
+    FORMATS, export_records, guess_format, write_records
+)
+
+TYPES = ('post', 'comment', 'follow')
+
+
+class Command(BaseCommand):
+    help = 'Выгружает посты, комментарии и подписки в NDJSON или CSV.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'path', nargs='?', default='-',
+            help='Куда писать; «-» (по умолчанию) — стандартный вывод.',
+        )
+        parser.add_argument(
+            '--format', choices=FORMATS,
+            help='Формат дампа; по умолчанию — по расширению файла.',
+        )
+        parser.add_argument(
+            '--types', default=','.join(TYPES),
+            help='Что выгружать, через запятую: post, comment, follow.',
+        )
+
+    def handle(self, *args, **options):
+        path = options['path']
+        fmt = options['format'] or guess_format(path)
+        types = tuple(
+            kind for kind in TYPES
+            if kind in options['types'].split(',')
+        )
+        stream = (
+            self.stdout if path == '-'
+            else open(path, 'w', encoding='utf-8', newline='')
+        )
+        try:
+            written = write_records(stream, export_records(types), fmt)
+        finally:
+            if stream is not self.stdout:
+                stream.close()
+        if stream is not self.stdout:
+            self.stdout.write(self.style.SUCCESS(
+                f'Выгружено записей: {written}.'
+            ))
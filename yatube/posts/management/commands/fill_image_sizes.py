@@ -0,0 +1,29 @@
+from django.core.management.base import BaseCommand
+
+from posts.images import image_size
+from posts.models import Post
+
+
+class Command(BaseCommand):
+    help = (
+        'Записывает размеры картинок постов, загруженных до появления '
+        'image_width/image_height.'
+    )
+
+    def handle(self, *args, **options):
+        names = Post.objects.filter(image_width__isnull=True).exclude(
+            image=''
+        ).values_list('image', flat=True).distinct()
+        filled = missing = 0
+        for name in names.iterator():
+            width, height = image_size(name)
+            if width is None:
+                missing += 1
+                continue
+            filled += Post.objects.filter(image=name).update(
+                image_width=width, image_height=height
+            )
+        self.stdout.write(self.style.SUCCESS(
+            f'Размеры записаны у постов: {filled}; '
+            f'не удалось прочитать файлов: {missing}.'
+        ))
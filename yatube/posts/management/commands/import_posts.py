@@ -0,0 +1,47 @@
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+from posts.transfer import (
+    CHUNK_SIZE, FORMATS, DumpError, Importer, guess_format, read_records
+)
+
+
+class Command(BaseCommand):
+    help = 'Загружает посты, комментарии и подписки из NDJSON или CSV.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'path', help='Файл дампа; «-» — стандартный ввод.'
+        )
+        parser.add_argument(
+            '--format', choices=FORMATS,
+            help='Формат дампа; по умолчанию — по расширению файла.',
+        )
+        parser.add_argument(
+            '--chunk-size', type=int, default=CHUNK_SIZE,
+            help='Сколько записей вставлять в одной транзакции.',
+        )
+
+    def handle(self, *args, **options):
+        path = options['path']
+        fmt = options['format'] or guess_format(path)
+        stream = (
+            sys.stdin if path == '-'
+            else open(path, encoding='utf-8', newline='')
+        )
+        try:
+            stats = Importer(options['chunk_size']).run(
+                read_records(stream, fmt)
+            )
+        except (DumpError, KeyError, ValueError) as error:
+            raise CommandError(f'Импорт прерван: {error}')
+        finally:
+            if stream is not sys.stdin:
+                stream.close()
+        summary = ', '.join(
+            f'{kind}: {count}' for kind, count in sorted(stats.items())
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f'Импортировано — {summary or "ничего"}.'
+        ))
@@ -0,0 +1,26 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from posts.counters import find_drift, rebuild_counters
+
+
+class Command(BaseCommand):
+    help = 'Пересчитывает счётчики постов, комментариев и подписок.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--check',
+            action='store_true',
+            help='Только проверить счётчики, ничего не меняя.',
+        )
+
+    def handle(self, *args, **options):
+        drift = find_drift()
+        for counter, rows in drift.items():
+            self.stdout.write(f'{counter}: расходится в {rows} строках')
+        if options['check']:
+            if drift:
+                raise CommandError('Счётчики расходятся с данными.')
+            self.stdout.write(self.style.SUCCESS('Счётчики в порядке.'))
+            return
+        rebuild_counters()
+        self.stdout.write(self.style.SUCCESS('Счётчики пересчитаны.'))
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from posts.search import rebuild_index
+
+
+class Command(BaseCommand):
+    help = 'Перестраивает полнотекстовый индекс постов.'
+
+    def handle(self, *args, **options):
+        rebuild_index()
+        if options['verbosity'] >= 1:
+            self.stdout.write(
+                self.style.SUCCESS('Поисковый индекс перестроен.')
+            )
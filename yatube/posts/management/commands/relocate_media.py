@@ -0,0 +1,63 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from core.storage import (count_references, is_hashed, relocate_files,
+                          set_references)
+from posts import feed_cache
+from posts.models import Post
+
+BATCH_SIZE = 500
+
+
+class Command(BaseCommand):
+    help = (
+        'Переносит картинки постов из плоского каталога в раскладку по '
+        'хэшу содержимого и пересчитывает ссылки на файлы. Кадры srcset '
+        'для новых имён затем готовит backfill_renditions.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=8,
+            help='Сколько файлов переносить параллельно.',
+        )
+
+    def handle(self, *args, **options):
+        storage = Post.image.field.storage
+        names = [
+            name for name in Post.objects.exclude(image='').values_list(
+                'image', flat=True
+            ).distinct()
+            if not is_hashed(name)
+        ]
+        moved = missing = 0
+        batch = []
+        for old, new in relocate_files(storage, names, options['workers']):
+            if new is None:
+                missing += 1
+                continue
+            batch.append((old, new))
+            if len(batch) >= BATCH_SIZE:
+                moved += self.switch(storage, batch)
+                batch = []
+        moved += self.switch(storage, batch)
+        counts = count_references(Post.objects.all(), 'image')
+        set_references(counts)
+        feed_cache.invalidate_all()
+        self.stdout.write(self.style.SUCCESS(
+            f'Перенесено файлов: {moved}; не найдено: {missing}; '
+            f'файлов в хранилище: {len(counts)}.'
+        ))
+
+    @staticmethod
+    def switch(storage, batch):
+        """Переписать имена в базе и удалить старые файлы."""
+        with transaction.atomic():
+            for old, new in batch:
+                Post.objects.filter(image=old).update(image=new)
+        for old, new in batch:
+            if old != new:
+                storage.delete(old)
+        return len(batch)
@@ -0,0 +1,38 @@
+from django.db import migrations
+
+from posts.fts import CREATE_TABLE, REBUILD, TRIGGERS, create_trigger
+
+CREATE_SQL = [
+    CREATE_TABLE,
+    *(create_trigger(name) for name in TRIGGERS),
+    REBUILD,
+]
+
+DROP_SQL = [
+    'DROP TRIGGER IF EXISTS posts_post_fts_update',
+    'DROP TRIGGER IF EXISTS posts_post_fts_delete',
+    'DROP TRIGGER IF EXISTS posts_post_fts_insert',
+    'DROP TABLE IF EXISTS posts_post_fts',
+]
+
+
+def run_sql(statements):
+    def operation(apps, schema_editor):
+        # FTS5 есть только в SQLite; на других СУБД поиск работает
+        # через icontains (см. posts.search).
+        if schema_editor.connection.vendor != 'sqlite':
+            return
+        for statement in statements:
+            schema_editor.execute(statement)
+    return operation
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0013_counters'),
+    ]
+
+    operations = [
+        migrations.RunPython(run_sql(CREATE_SQL), run_sql(DROP_SQL)),
+    ]
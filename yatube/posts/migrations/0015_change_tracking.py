@@ -0,0 +1,63 @@
+# Generated by Django 2.2.16 on 2026-10-17 06:14
+
+from django.db import migrations, models
+from django.db.models import F, Max
+
+
+def number_existing_rows(apps, schema_editor):
+    # Уже существующим строкам раздаём номера одним UPDATE на таблицу:
+    # change_seq = id + смещение, чтобы номера разных таблиц не
+    # пересекались.
+    Sequence = apps.get_model('core', 'Sequence')
+    offset = 0
+    for name in ('Group', 'Post', 'Comment'):
+        model = apps.get_model('posts', name)
+        model.objects.update(change_seq=F('id') + offset)
+        offset += model.objects.aggregate(top=Max('id'))['top'] or 0
+    for name in ('Post', 'Comment'):
+        apps.get_model('posts', name).objects.update(updated=F('created'))
+    Sequence.objects.update_or_create(
+        name='changes', defaults={'value': offset}
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0001_initial'),
+        ('posts', '0014_post_search'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='comment',
+            name='change_seq',
+            field=models.BigIntegerField(db_index=True, default=0, editable=False, verbose_name='Номер изменения'),
+        ),
+        migrations.AddField(
+            model_name='comment',
+            name='updated',
+            field=models.DateTimeField(auto_now=True, verbose_name='Дата изменения'),
+        ),
+        migrations.AddField(
+            model_name='group',
+            name='change_seq',
+            field=models.BigIntegerField(db_index=True, default=0, editable=False, verbose_name='Номер изменения'),
+        ),
+        migrations.AddField(
+            model_name='group',
+            name='updated',
+            field=models.DateTimeField(auto_now=True, verbose_name='Дата изменения'),
+        ),
+        migrations.AddField(
+            model_name='post',
+            name='change_seq',
+            field=models.BigIntegerField(db_index=True, default=0, editable=False, verbose_name='Номер изменения'),
+        ),
+        migrations.AddField(
+            model_name='post',
+            name='updated',
+            field=models.DateTimeField(auto_now=True, verbose_name='Дата изменения'),
+        ),
+        migrations.RunPython(number_existing_rows, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 2.2.16 on 2026-10-17 06:36
+
+import core.storage
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0017_rendition'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='post',
+            name='image',
+            field=models.ImageField(blank=True, help_text='Картинка', storage=core.storage.ContentAddressedStorage(), upload_to='posts/'),
+        ),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 2.2.16 on 2026-10-17 09:12
+
+from django.db import migrations, models
+import django.utils.timezone
+from django.db.models import OuterRef, Subquery
+
+
+def fill_created(apps, schema_editor):
+    Post = apps.get_model('posts', 'Post')
+    TimelineEntry = apps.get_model('posts', 'TimelineEntry')
+    TimelineEntry.objects.update(created=Subquery(
+        Post.objects.filter(pk=OuterRef('post_id')).values('created')[:1]
+    ))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0018_post_image_storage'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='timelineentry',
+            name='created',
+            field=models.DateTimeField(default=django.utils.timezone.now),
+            preserve_default=False,
+        ),
+        migrations.RunPython(fill_created, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='timelineentry',
+            index=models.Index(fields=['user', 'created', 'post'], name='timeline_user_created_idx'),
+        ),
+    ]
@@ -0,0 +1,50 @@
+from django.conf import settings
+from django.db import migrations
+from django.db.models import Count
+
+BATCH_SIZE = 500
+
+
+def backfill_timeline(apps, schema_editor):
+    """Разложить посты по лентам подписок, появившихся до 0011.
+
+    Повторяет posts.timeline.follow_added для каждой подписки: у
+    авторов больше чем с TIMELINE_FANOUT_LIMIT подписчиков подписки
+    помечаются fanout_on_read, остальным записываются TimelineEntry.
+    """
+    Follow = apps.get_model('posts', 'Follow')
+    Post = apps.get_model('posts', 'Post')
+    TimelineEntry = apps.get_model('posts', 'TimelineEntry')
+    authors = Follow.objects.values('author_id').annotate(
+        followers=Count('id')
+    ).order_by()
+    for row in authors.iterator():
+        follows = Follow.objects.filter(author_id=row['author_id'])
+        if row['followers'] > settings.TIMELINE_FANOUT_LIMIT:
+            follows.update(fanout_on_read=True)
+            continue
+        posts = list(Post.objects.filter(
+            author_id=row['author_id']
+        ).values_list('id', 'created'))
+        for user_id in follows.values_list('user_id', flat=True):
+            TimelineEntry.objects.bulk_create(
+                [
+                    TimelineEntry(
+                        user_id=user_id, post_id=post_id, created=created
+                    )
+                    for post_id, created in posts
+                ],
+                batch_size=BATCH_SIZE,
+                ignore_conflicts=True
+            )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0019_timelineentry_created'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_timeline, migrations.RunPython.noop),
+    ]
@@ -1,4 +1,5 @@
-from core.models import CreatedModel
+from core.models import CountedModel, CreatedModel, TrackedModel
+from core.storage import ContentAddressedStorage
 from django.contrib.auth import get_user_model
 from django.db import models
 
@@ -14,7 +15,32 @@ class Contact(models.Model):
     is_answered = models.BooleanField(default=False)
 
 
-class Post(CreatedModel):
+class PostQuerySet(models.QuerySet):
+    # Колонки, которые выводятся в карточке поста в лентах.
+    FEED_FIELDS = (
+        'id', 'text', 'created', 'image', 'author', 'group', 'change_seq',
+        'author__username', 'author__first_name', 'author__last_name',
+        'group__title', 'group__slug', 'group__change_seq',
+    )
+
+    def for_feed(self):
+        """Посты для лент: автор и группа одним JOIN, без лишних колонок."""
+        return self.select_related('author', 'group').only(*self.FEED_FIELDS)
+
+    def for_detail(self):
+        """Пост для отдельной страницы со счётчиками автора."""
+        return self.select_related('author__stats', 'group')
+
+
+class CommentQuerySet(models.QuerySet):
+    def for_thread(self):
+        """Комментарии для ленты обсуждения: автор одним JOIN."""
+        return self.select_related('author').only(
+            'id', 'text', 'created', 'post', 'author', 'author__username'
+        )
+
+
+class Post(CountedModel, CreatedModel, TrackedModel):
     text = models.TextField(
         'text',
         help_text='Текст нового поста'
@@ -35,26 +61,56 @@ class Post(CreatedModel):
     image = models.ImageField(
         help_text='Картинка',
         upload_to='posts/',
+        storage=ContentAddressedStorage(),
         blank=True
     )
+    # Заполняются при загрузке (PostForm); не width_field, чтобы
+    # ImageField не открывал файл при создании объекта.
+    image_width = models.PositiveIntegerField(
+        null=True, blank=True, editable=False
+    )
+    image_height = models.PositiveIntegerField(
+        null=True, blank=True, editable=False
+    )
+    comments_count = models.PositiveIntegerField(default=0, editable=False)
+
+    counter_fields = ('comments_count',)
+    objects = PostQuerySet.as_manager()
 
     def __str__(self):
         return self.text[:15]
 
     class Meta:
         ordering = ('created',)
+        # Индексы повторяют сортировку лент: главная, группа, автор.
+        indexes = [
+            models.Index(
+                fields=['created', 'id'], name='post_created_id_idx'
+            ),
+            models.Index(
+                fields=['group', 'created', 'id'],
+                name='post_group_created_idx'
+            ),
+            models.Index(
+                fields=['author', 'created', 'id'],
+                name='post_author_created_idx'
+            ),
+        ]
 
 
-class Group(models.Model):
+class Group(CountedModel, TrackedModel):
     title = models.CharField(max_length=200)
     slug = models.SlugField(unique=True)
     description = models.TextField()
+    posts_count = models.PositiveIntegerField(default=0, editable=False)
+
+    counter_fields = ('posts_count',)
 
     def __str__(self):
         return self.title
 
 
-class Comment(CreatedModel):
+class Comment(CreatedModel, TrackedModel):
     post = models.ForeignKey(
         Post,
         on_delete=models.CASCADE,
@@ -70,6 +126,17 @@ class Comment(CreatedModel):
         help_text='Введите текст комментария'
     )
 
+    objects = CommentQuerySet.as_manager()
+
+    class Meta:
+        ordering = ('created',)
+        indexes = [
+            models.Index(
+                fields=['post', 'created', 'id'],
+                name='comment_post_created_idx'
+            ),
+        ]
+
 
 class Follow(models.Model):
     user = models.ForeignKey(
@@ -82,6 +149,9 @@ class Follow(models.Model):
         on_delete=models.CASCADE,
         related_name="following"
     )
+    # Посты «крупного» автора не раскладываются по лентам подписчиков,
+    # а подтягиваются при чтении ленты (fan-out-on-read).
+    fanout_on_read = models.BooleanField(default=False)
 
     class Meta:
         constraints = [
@@ -89,3 +159,63 @@ class Follow(models.Model):
                 fields=['author', 'user'], name='unique_following'
             )
         ]
+        indexes = [
+            models.Index(
+                fields=['user', 'author'], name='follow_user_author_idx'
+            ),
+        ]
+
+
+class TimelineEntry(models.Model):
+    """Запись материализованной ленты подписок пользователя."""
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='timeline_entries'
+    )
+    post = models.ForeignKey(
+        Post,
+        on_delete=models.CASCADE,
+        related_name='timeline_entries'
+    )
+    # Копия post.created: ключ сортировки ленты лежит в самом индексе.
+    created = models.DateTimeField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'post'], name='unique_timeline_entry'
+            )
+        ]
+        indexes = [
+            models.Index(
+                fields=['user', 'created', 'post'],
+                name='timeline_user_created_idx'
+            ),
+        ]
+
+
+class UserStats(models.Model):
+    """Счётчики пользователя, поддерживаемые при записи."""
+    user = models.OneToOneField(
+        User,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='stats'
+    )
+    posts_count = models.PositiveIntegerField(default=0)
+    followers_count = models.PositiveIntegerField(default=0)
+    following_count = models.PositiveIntegerField(default=0)
+
+    def __str__(self):
+        return f'Счётчики {self.user}'
+
+
+class Rendition(models.Model):
+    """Ширины готовых кадров картинки (см. posts.renditions)."""
+    source = models.CharField(max_length=255, unique=True)
+    # Через запятую по возрастанию: '320,640,960'.
+    widths = models.CharField(max_length=64)
+
+    def __str__(self):
+        return f'{self.source}: {self.widths}'
@@ -0,0 +1,250 @@
+"""Картинки постов в нескольких ширинах: srcset и WebP.
+
+Для каждой картинки один раз готовится кадр ленты (пропорции
+960×339, обрезка по центру) в ширинах RENDITION_WIDTHS, не шире
+исходника, и в двух форматах: WebP для браузеров, которые его
+понимают, и JPEG для остальных. Файлы лежат по предсказуемым путям
+(rendition_name), поэтому в таблице Rendition хранится только
+строка ширин на исходник.
+
+Рендеринг идёт в пуле потоков: post_create и post_edit ставят задачу
+после коммита, а шаблон, пока кадров нет, выводит заглушку и ставит
+картинку в очередь при первом показе. Ширины всех постов страницы
+читаются одним get_many к кэшу и одним запросом для промахов.
+"""
+import hashlib
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import connection, transaction
+from PIL import Image, ImageOps
+
+from .models import Rendition
+
+logger = logging.getLogger(__name__)
+
+RENDITION_WIDTHS = (320, 640, 960, 1440)
+# Пропорции кадра ленты.
+RENDITION_RATIO = (960, 339)
+# Порядок важен: браузер берёт первый подходящий <source>.
+RENDITION_FORMATS = (
+    ('webp', 'image/webp', {'quality': 80, 'method': 4}),
+    ('jpg', 'image/jpeg', {'quality': 82, 'optimize': True,
+                           'progressive': True}),
+)
+PIL_FORMATS = {'webp': 'WEBP', 'jpg': 'JPEG'}
+CACHE_PREFIX = 'rendition:'
+CACHE_TIMEOUT = 60 * 60 * 24
+PENDING_TIMEOUT = 300
+# В кэше отмечается, что кадров ещё нет, чтобы не спрашивать базу на
+# каждом показе. Отметка живёт недолго: запрос, прочитавший базу до
+# записи Rendition, может положить её уже после render_renditions.
+MISSING = ''
+MISSING_TIMEOUT = 60
+
+_executor = None
+
+
+def _pool():
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(
+            max_workers=settings.THUMBNAIL_WORKERS,
+            thread_name_prefix='renditions',
+        )
+    return _executor
+
+
+def _digest(source):
+    return hashlib.md5(source.encode()).hexdigest()
+
+
+def rendition_name(source, width, ext):
+    digest = _digest(source)
+    return f'renditions/{digest[:2]}/{digest}-{width}.{ext}'
+
+
+def rendition_height(width):
+    return round(width * RENDITION_RATIO[1] / RENDITION_RATIO[0])
+
+
+def _cache_key(source):
+    return f'{CACHE_PREFIX}{_digest(source)}'
+
+
+class Renditions:
+    """Готовые кадры одной картинки."""
+
+    def __init__(self, source, widths):
+        self.source = source
+        self.widths = widths
+
+    @property
+    def largest(self):
+        return self.widths[-1]
+
+    def url(self, width, ext):
+        return default_storage.url(rendition_name(self.source, width, ext))
+
+    def srcset(self, ext):
+        return ', '.join(
+            f'{self.url(width, ext)} {width}w' for width in self.widths
+        )
+
+
+def _parse(source, widths):
+    if not widths:
+        return None
+    return Renditions(source, [int(width) for width in widths.split(',')])
+
+
+def render_renditions(source):
+    """Подготовить все кадры картинки source и записать их ширины."""
+    with default_storage.open(source) as file, Image.open(file) as image:
+        image.seek(0)
+        image = ImageOps.exif_transpose(image).convert('RGB')
+    widths = [
+        width for width in RENDITION_WIDTHS if width <= image.width
+    ] or [RENDITION_WIDTHS[0]]
+    frame = ImageOps.fit(
+        image, (widths[-1], rendition_height(widths[-1])), Image.LANCZOS
+    )
+    for width in widths:
+        resized = frame.resize(
+            (width, rendition_height(width)), Image.LANCZOS
+        )
+        for ext, _, params in RENDITION_FORMATS:
+            buffer = BytesIO()
+            resized.save(buffer, PIL_FORMATS[ext], **params)
+            name = rendition_name(source, width, ext)
+            default_storage.delete(name)
+            default_storage.save(name, ContentFile(buffer.getvalue()))
+    value = ','.join(str(width) for width in widths)
+    Rendition.objects.update_or_create(
+        source=source, defaults={'widths': value}
+    )
+    cache.set(_cache_key(source), value, CACHE_TIMEOUT)
+    return Renditions(source, widths)
+
+
+def _render_logged(source):
+    """Подготовить кадры; True, если получилось (ошибка — в лог)."""
+    try:
+        render_renditions(source)
+    except Exception:
+        logger.exception('Не удалось подготовить кадры %s', source)
+        return False
+    finally:
+        cache.delete(f'rendition-pending:{source}')
+    return True
+
+
+def rendition_task(source):
+    """Задача пула потоков: кадры плюс уборка за собой."""
+    try:
+        return _render_logged(source)
+    finally:
+        # У потока пула своё соединение с базой.
+        connection.close()
+
+
+def _same_thread_only():
+    # Базу SQLite в памяти (тесты) потоки делят через shared cache, где
+    # второй пишущий сразу получает «database table is locked», а не
+    # ждёт. С такой базой кадры готовятся в том же потоке.
+    return connection.vendor == 'sqlite' and connection.is_in_memory_db()
+
+
+def _submit(source):
+    if _same_thread_only():
+        _render_logged(source)
+    else:
+        _pool().submit(rendition_task, source)
+
+
+def render_many(sources, workers):
+    """Подготовить кадры картинок sources в workers потоках.
+
+    Возвращает (готово, с ошибкой).
+    """
+    if _same_thread_only():
+        results = [_render_logged(source) for source in sources]
+    else:
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            results = list(pool.map(rendition_task, sources))
+    succeeded = sum(results)
+    return succeeded, len(results) - succeeded
+
+
+def schedule_renditions(image):
+    """Поставить кадры в очередь после коммита текущей транзакции."""
+    if not image:
+        return
+    source = image.name if hasattr(image, 'name') else image
+    # Одна и та же картинка не ставится в очередь повторно, пока
+    # задача не выполнена.
+    if not cache.add(f'rendition-pending:{source}', 1, PENDING_TIMEOUT):
+        return
+    transaction.on_commit(lambda: _submit(source))
+
+
+def delete_renditions(source):
+    """Удалить кадры картинки после коммита текущей транзакции."""
+    def delete():
+        stored = Rendition.objects.filter(source=source).first()
+        if stored is None:
+            return
+        for width in _parse(source, stored.widths).widths:
+            for ext, _, _ in RENDITION_FORMATS:
+                default_storage.delete(rendition_name(source, width, ext))
+        stored.delete()
+        cache.delete(_cache_key(source))
+
+    transaction.on_commit(delete)
+
+
+def get_renditions(sources):
+    """{source: Renditions или None} — get_many и один запрос."""
+    keys = {source: _cache_key(source) for source in set(sources)}
+    if not keys:
+        return {}
+    found = cache.get_many(keys.values())
+    missing = [source for source, key in keys.items() if key not in found]
+    if missing:
+        stored = dict(Rendition.objects.filter(
+            source__in=missing
+        ).values_list('source', 'widths'))
+        ready = {keys[source]: widths for source, widths in stored.items()}
+        absent = {
+            keys[source]: MISSING for source in missing
+            if source not in stored
+        }
+        if ready:
+            cache.set_many(ready, CACHE_TIMEOUT)
+        if absent:
+            cache.set_many(absent, MISSING_TIMEOUT)
+        found.update(ready)
+        found.update(absent)
+    return {
+        source: _parse(source, found[key]) for source, key in keys.items()
+    }
+
+
+def prefetch_renditions(posts):
+    """Положить в post.renditions кадры всех постов страницы."""
+    renditions = get_renditions(
+        post.image.name for post in posts if post.image
+    )
+    for post in posts:
+        post.renditions = renditions.get(post.image.name)
+    return posts
+
+
+def has_placeholder(posts):
+    """Есть ли среди постов картинка без готовых кадров (заглушка)."""
+    return any(post.image and post.renditions is None for post in posts)
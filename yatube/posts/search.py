@@ -0,0 +1,117 @@
+"""Полнотекстовый поиск по постам.
+
+На SQLite используется внешняя (content=) таблица FTS5 posts_post_fts
+поверх posts_post. Её синхронизируют триггеры (SQL — в posts.fts,
+создаёт их миграция 0014_post_search), поэтому индекс обновляется при
+любой записи поста, в том числе через bulk_create и
+QuerySet.update(). Совпадения
+ранжируются по bm25. На других СУБД поиск откатывается к icontains.
+
+Когда миграция меняет posts_post, SQLite пересоздаёт таблицу и теряет
+её триггеры; ensure_triggers() после каждого migrate возвращает их и
+перестраивает индекс.
+"""
+import re
+
+from django.db import connection, connections
+
+from .fts import REBUILD, SEARCH_TABLE, TRIGGERS, create_trigger
+from .models import Post
+
+RESULTS_PER_PAGE = 10
+MAX_TERMS = 8
+
+
+def search_terms(query):
+    """Слова запроса без синтаксиса FTS5: кавычек, операторов и т. п."""
+    return re.findall(r'\w+', query.lower())[:MAX_TERMS]
+
+
+def match_expression(terms):
+    # Каждое слово — отдельная строка с поиском по префиксу; пробел
+    # между ними в FTS5 означает AND.
+    return ' '.join(f'"{term}"*' for term in terms)
+
+
+def _matching_ids(terms, group_id, author_id, offset, limit):
+    conditions = [f'{SEARCH_TABLE} MATCH %s']
+    params = [match_expression(terms)]
+    if group_id is not None:
+        conditions.append('post.group_id = %s')
+        params.append(group_id)
+    if author_id is not None:
+        conditions.append('post.author_id = %s')
+        params.append(author_id)
+    sql = (
+        f'SELECT post.id FROM {SEARCH_TABLE} '
+        f'JOIN posts_post AS post ON post.id = {SEARCH_TABLE}.rowid '
+        f'WHERE {" AND ".join(conditions)} '
+        f'ORDER BY {SEARCH_TABLE}.rank, post.id DESC LIMIT %s OFFSET %s'
+    )
+    with connection.cursor() as cursor:
+        cursor.execute(sql, [*params, limit, offset])
+        return [row[0] for row in cursor.fetchall()]
+
+
+def _fallback_ids(terms, group_id, author_id, offset, limit):
+    posts = Post.objects.all()
+    for term in terms:
+        posts = posts.filter(text__icontains=term)
+    if group_id is not None:
+        posts = posts.filter(group_id=group_id)
+    if author_id is not None:
+        posts = posts.filter(author_id=author_id)
+    return list(
+        posts.order_by('-created', '-id').values_list(
+            'id', flat=True
+        )[offset:offset + limit]
+    )
+
+
+def search_posts(query, group_id=None, author_id=None, page=1,
+                 per_page=RESULTS_PER_PAGE):
+    """Страница результатов поиска: (посты, есть ли следующая страница).
+
+    Общее число совпадений не считается: для частых слов это был бы
+    проход по всему индексу.
+    """
+    terms = search_terms(query)
+    if not terms:
+        return [], False
+    offset = (page - 1) * per_page
+    find = _matching_ids if connection.vendor == 'sqlite' else _fallback_ids
+    ids = find(terms, group_id, author_id, offset, per_page + 1)
+    has_next = len(ids) > per_page
+    ids = ids[:per_page]
+    posts = Post.objects.for_feed().in_bulk(ids)
+    return [posts[pk] for pk in ids if pk in posts], has_next
+
+
+def rebuild_index():
+    """Перестроить индекс FTS5 по содержимому posts_post."""
+    if connection.vendor != 'sqlite':
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(REBUILD)
+
+
+def ensure_triggers(using='default'):
+    """Вернуть потерянные триггеры индекса; True, если их не хватало."""
+    target = connections[using]
+    if target.vendor != 'sqlite':
+        return False
+    with target.cursor() as cursor:
+        cursor.execute(
+            "SELECT type, name FROM sqlite_master "
+            "WHERE name = %s OR type = 'trigger'",
+            [SEARCH_TABLE]
+        )
+        existing = {name for kind, name in cursor.fetchall()}
+        if SEARCH_TABLE not in existing:
+            return False
+        missing = [name for name in TRIGGERS if name not in existing]
+        for name in missing:
+            cursor.execute(create_trigger(name))
+        if missing:
+            cursor.execute(REBUILD)
+    return bool(missing)
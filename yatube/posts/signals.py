@@ -0,0 +1,118 @@
+from django.db.models.signals import (
+    post_delete, post_migrate, post_save, pre_save
+)
+from django.dispatch import receiver
+
+from core.storage import release_reference
+
+from . import counters, feed_cache, renditions, search, timeline
+from .models import Comment, Follow, Group, Post, User, UserStats
+
+
+@receiver(post_save, sender=User)
+def user_saved(sender, instance, created, raw=False, update_fields=None,
+               **kwargs):
+    if raw:
+        return
+    if created:
+        UserStats.objects.get_or_create(user=instance)
+    elif update_fields is None or set(update_fields) != {'last_login'}:
+        # Имя автора выводится в лентах; вход в систему его не меняет.
+        feed_cache.invalidate_user(instance)
+
+
+@receiver(pre_save, sender=Post)
+def post_presave(sender, instance, raw=False, **kwargs):
+    # Запоминаем прежние группу и картинку: при редактировании пост
+    # может переехать в другую группу или сменить картинку.
+    instance._previous_group_id = instance._previous_image = None
+    # Новый файл ещё не записан: его сохранит FileField.pre_save.
+    instance._image_uploaded = bool(instance.image) and not getattr(
+        instance.image, '_committed', True
+    )
+    if instance.pk and not raw:
+        previous = Post.objects.filter(pk=instance.pk).values_list(
+            'group_id', 'image'
+        ).first()
+        if previous:
+            instance._previous_group_id, instance._previous_image = previous
+
+
+@receiver(post_save, sender=Post)
+def post_saved(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    feed_cache.invalidate_post(instance, instance._previous_group_id)
+    if created:
+        counters.bump_user(instance.author_id, 'posts_count', 1)
+        counters.bump_group(instance.group_id, 1)
+        timeline.fan_out_post(instance)
+    else:
+        timeline.post_changed(instance)
+        if instance._previous_group_id != instance.group_id:
+            counters.bump_group(instance._previous_group_id, -1)
+            counters.bump_group(instance.group_id, 1)
+    if instance._previous_image != instance.image.name:
+        release_image(instance._previous_image)
+    elif instance._image_uploaded:
+        # Загружена та же картинка: storage уже прибавил ссылку, а пост
+        # по-прежнему ссылается на файл один раз.
+        release_reference(instance.image.name)
+
+
+def release_image(name):
+    """Снять ссылку поста на файл картинки (см. core.storage)."""
+    if name and Post.image.field.storage.release(name):
+        renditions.delete_renditions(name)
+
+
+@receiver(post_delete, sender=Post)
+def post_deleted(sender, instance, **kwargs):
+    release_image(instance.image.name)
+    feed_cache.invalidate_post(instance)
+    timeline.post_changed(instance)
+    counters.bump_user(instance.author_id, 'posts_count', -1)
+    counters.bump_group(instance.group_id, -1)
+
+
+@receiver(post_save, sender=Comment)
+def comment_saved(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        feed_cache.invalidate_comment(instance)
+        counters.bump_post(instance.post_id, 1)
+
+
+@receiver(post_delete, sender=Comment)
+def comment_deleted(sender, instance, **kwargs):
+    feed_cache.invalidate_comment(instance)
+    counters.bump_post(instance.post_id, -1)
+
+
+@receiver(post_save, sender=Follow)
+def follow_saved(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        feed_cache.invalidate_follow(instance)
+        counters.bump_user(instance.author_id, 'followers_count', 1)
+        counters.bump_user(instance.user_id, 'following_count', 1)
+        timeline.follow_added(instance)
+
+
+@receiver(post_delete, sender=Follow)
+def follow_deleted(sender, instance, **kwargs):
+    feed_cache.invalidate_follow(instance)
+    counters.bump_user(instance.author_id, 'followers_count', -1)
+    counters.bump_user(instance.user_id, 'following_count', -1)
+    timeline.follow_removed(instance)
+
+
+@receiver(post_save, sender=Group)
+@receiver(post_delete, sender=Group)
+def group_changed(sender, instance, raw=False, **kwargs):
+    if not raw:
+        feed_cache.invalidate_group(instance)
+
+
+@receiver(post_migrate)
+def restore_search_triggers(sender, app_config, using='default', **kwargs):
+    if app_config.name == 'posts':
+        search.ensure_triggers(using)
@@ -0,0 +1,44 @@
+from django import template
+from django.utils.html import format_html
+
+from posts.renditions import (RENDITION_FORMATS, RENDITION_RATIO,
+                              get_renditions, rendition_height,
+                              schedule_renditions)
+
+register = template.Library()
+
+# Ширина колонки ленты: во всю ширину экрана на телефоне, 960px на
+# широком.
+FEED_SIZES = '(max-width: 992px) 100vw, 960px'
+
+
+@register.simple_tag
+def post_picture(post, sizes=FEED_SIZES, css_class='card-img my-2'):
+    """<picture> с srcset в WebP и JPEG; заглушка, пока кадров нет.
+
+    Для постов, прошедших prefetch_renditions, хранилище не опрашивается.
+    """
+    if not post.image:
+        return ''
+    if hasattr(post, 'renditions'):
+        renditions = post.renditions
+    else:
+        renditions = get_renditions([post.image.name])[post.image.name]
+    if renditions is None:
+        schedule_renditions(post.image)
+        return format_html(
+            '<div class="{} bg-light" style="aspect-ratio: {} / {}"></div>',
+            css_class, *RENDITION_RATIO,
+        )
+    largest = renditions.largest
+    (webp, webp_type, _), (jpeg, _, _) = RENDITION_FORMATS
+    return format_html(
+        '<picture>'
+        '<source type="{}" srcset="{}" sizes="{}">'
+        '<img class="{}" src="{}" srcset="{}" sizes="{}" '
+        'width="{}" height="{}" loading="lazy" alt="">'
+        '</picture>',
+        webp_type, renditions.srcset(webp), sizes,
+        css_class, renditions.url(largest, jpeg), renditions.srcset(jpeg),
+        sizes, largest, rendition_height(largest),
+    )
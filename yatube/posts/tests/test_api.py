@@ -0,0 +1,84 @@
+import gzip
+
+from django.core.cache import cache
+from django.db import connection
+from django.test import Client, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from posts.models import Group, Post, User
+
+
+class PostsApiTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create(username='api_author')
+        cls.group = Group.objects.create(
+            title='Группа', slug='api-group', description='Описание'
+        )
+        for number in range(25):
+            Post.objects.create(
+                text=f'Пост {number}',
+                author=cls.author,
+                group=cls.group if number % 2 else None,
+            )
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+
+    def test_cursor_pagination_covers_feed(self):
+        """Курсоры next ведут по всей ленте без пропусков."""
+        url = reverse('posts:api_index')
+        first = self.client.get(url).json()
+        self.assertEqual(len(first['results']), 20)
+        self.assertIsNone(first['previous'])
+        second = self.client.get(first['next']).json()
+        self.assertEqual(len(second['results']), 5)
+        self.assertIsNone(second['next'])
+        self.assertEqual(
+            [post['id'] for post in first['results'] + second['results']],
+            list(Post.objects.values_list('id', flat=True))
+        )
+        post = first['results'][0]
+        self.assertEqual(post['author'], 'api_author')
+        self.assertIsNone(post['image'])
+
+    def test_sparse_fields(self):
+        """?fields= оставляет в ответе только перечисленные поля."""
+        response = self.client.get(
+            reverse('posts:api_group_posts', kwargs={'slug': 'api-group'}),
+            {'fields': 'id,text'}
+        )
+        results = response.json()['results']
+        self.assertEqual(len(results), 12)
+        self.assertEqual(set(results[0]), {'id', 'text'})
+        bad = self.client.get(
+            reverse('posts:api_index'), {'fields': 'id,password'}
+        )
+        self.assertEqual(bad.status_code, 400)
+
+    def test_profile_and_missing_objects(self):
+        response = self.client.get(
+            reverse('posts:api_profile', kwargs={'username': 'api_author'})
+        )
+        self.assertEqual(len(response.json()['results']), 20)
+        missing = self.client.get(
+            reverse('posts:api_profile', kwargs={'username': 'nobody'})
+        )
+        self.assertEqual(missing.status_code, 404)
+        broken = self.client.get(
+            reverse('posts:api_index'), {'cursor': 'мусор'}
+        )
+        self.assertEqual(broken.status_code, 400)
+
+    def test_no_templates_and_gzip(self):
+        """Ответ без шаблонов, одним запросом к постам и сжатый gzip."""
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(
+                reverse('posts:api_index'), HTTP_ACCEPT_ENCODING='gzip'
+            )
+        self.assertEqual(response.templates, [])
+        self.assertEqual(len(queries), 1)
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertIn(b'"results":[', gzip.decompress(response.content))
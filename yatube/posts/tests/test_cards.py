@@ -0,0 +1,74 @@
+from unittest import mock
+
+from django.core.cache import cache
+from django.test import Client, TestCase
+from django.urls import reverse
+from posts import cards
+from posts.models import Group, Post, User
+
+
+class PostCardCacheTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(
+            username='writer', first_name='Лев', last_name='Толстой'
+        )
+        cls.group = Group.objects.create(
+            title='Классика', slug='classics', description='Описание'
+        )
+        cls.post = Post.objects.create(
+            author=cls.user, group=cls.group, text='Карточка поста'
+        )
+
+    def setUp(self):
+        cache.clear()
+        self.guest_client = Client()
+
+    def renders(self, url):
+        with mock.patch.object(
+            cards, 'render_to_string', wraps=cards.render_to_string
+        ) as render:
+            response = self.guest_client.get(url)
+        return response, render.call_count
+
+    def test_card_shared_between_feeds(self):
+        """Карточка, собранная для главной, берётся из кэша в группе."""
+        response, rendered = self.renders(reverse('posts:index'))
+        self.assertEqual(rendered, 1)
+        self.assertContains(response, 'Карточка поста')
+        response, rendered = self.renders(
+            reverse('posts:group_list', args=[self.group.slug])
+        )
+        self.assertEqual(rendered, 0)
+        self.assertContains(response, 'Карточка поста')
+
+    def test_cards_fetched_with_one_get_many(self):
+        self.guest_client.get(reverse('posts:index'))
+        post = Post.objects.for_feed().get(pk=self.post.pk)
+        with mock.patch.object(
+            cards.cache, 'get_many', wraps=cards.cache.get_many
+        ) as get_many:
+            cards.prepare_cards([post])
+        get_many.assert_called_once()
+        self.assertIn('Карточка поста', post.card)
+
+    def test_version_changes(self):
+        """Правка поста, группы и имени автора дают новую карточку."""
+        def key():
+            return cards.card_key(Post.objects.for_feed().get(pk=post.pk))
+
+        post = Post.objects.get(pk=self.post.pk)
+        keys = [key()]
+        post.text = 'Новый текст'
+        post.save()
+        keys.append(key())
+        self.group.title = 'Новое название'
+        self.group.save()
+        keys.append(key())
+        self.user.first_name = 'Лёва'
+        self.user.save()
+        keys.append(key())
+        self.assertEqual(len(set(keys)), 4)
+        response = self.guest_client.get(reverse('posts:index'))
+        self.assertContains(response, 'Лёва')
+        self.assertContains(response, 'Новое название')
@@ -0,0 +1,75 @@
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from core.models import next_change_seq
+from posts.models import Group, Post, User
+
+
+class ChangeFeedTests(TestCase):
+    def setUp(self):
+        self.client = Client()
+        self.user = User.objects.create(username='mirror')
+        self.group = Group.objects.create(
+            title='Группа', slug='mirror-group', description='Описание'
+        )
+        self.post = Post.objects.create(
+            text='Первая версия', author=self.user, group=self.group
+        )
+
+    def fetch(self, **params):
+        response = self.client.get(reverse('posts:changes'), params)
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def test_saves_get_increasing_seq_and_updated(self):
+        """Каждое сохранение получает новый номер и время изменения."""
+        seq, updated = self.post.change_seq, self.post.updated
+        self.assertGreater(seq, self.group.change_seq)
+        self.post.text = 'Вторая версия'
+        self.post.save()
+        self.assertGreater(self.post.change_seq, seq)
+        self.assertGreaterEqual(self.post.updated, updated)
+        comment = self.post.comments.create(author=self.user, text='Ответ')
+        self.assertGreater(comment.change_seq, self.post.change_seq)
+
+    def test_feed_returns_changes_after_since(self):
+        """Журнал отдаёт изменения по порядку и страницами."""
+        data = self.fetch(since=0, limit=1)
+        self.assertEqual(
+            [(c['type'], c['id']) for c in data['changes']],
+            [('group', self.group.pk)]
+        )
+        self.assertIsNotNone(data['next'])
+        data = self.fetch(since=data['last_seq'])
+        self.assertEqual(
+            [(c['type'], c['id']) for c in data['changes']],
+            [('post', self.post.pk)]
+        )
+        self.assertEqual(data['changes'][0]['data']['text'], 'Первая версия')
+        self.assertIsNone(data['next'])
+        self.assertEqual(self.fetch(since=data['last_seq'])['changes'], [])
+
+    def test_edit_and_delete_are_reported(self):
+        """Правка и удаление видны тому, кто уже синхронизировался."""
+        since = self.fetch()['last_seq']
+        self.post.text = 'Исправлено'
+        self.post.save()
+        post_id, group_id = self.post.pk, self.group.pk
+        self.group.delete()
+        Post.objects.get(pk=post_id).delete()
+        changes = self.fetch(since=since)['changes']
+        self.assertEqual(
+            [(c['type'], c['id'], c['deleted']) for c in changes],
+            [('group', group_id, True), ('post', post_id, True)]
+        )
+
+    def test_bulk_numbering(self):
+        """next_change_seq выдаёт непрерывный диапазон номеров."""
+        first = next_change_seq(3)
+        second = next_change_seq()
+        self.assertEqual(len(first), 3)
+        self.assertEqual(second[0], first[-1] + 1)
+
+    def test_bad_since(self):
+        response = self.client.get(reverse('posts:changes'), {'since': 'x'})
+        self.assertEqual(response.status_code, 400)
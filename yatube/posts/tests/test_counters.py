@@ -0,0 +1,108 @@
+from io import StringIO
+
+from django.core.management import CommandError, call_command
+from django.test import Client, TestCase
+from django.urls import reverse
+from posts.forms import PostForm
+from posts.models import Comment, Follow, Group, Post, User, UserStats
+
+
+class CountersTests(TestCase):
+    def setUp(self):
+        self.author = User.objects.create(username='author')
+        self.reader = User.objects.create(username='reader')
+        self.group = Group.objects.create(
+            title='Группа', slug='group', description='Описание'
+        )
+        self.other_group = Group.objects.create(
+            title='Другая', slug='other', description='Описание'
+        )
+        self.reader_client = Client()
+        self.reader_client.force_login(self.reader)
+
+    def refresh(self):
+        for obj in (self.group, self.other_group):
+            obj.refresh_from_db()
+        return (
+            UserStats.objects.get(user=self.author),
+            UserStats.objects.get(user=self.reader),
+        )
+
+    def test_post_counters(self):
+        """Счётчики постов автора и группы следуют за записями."""
+        post = Post.objects.create(
+            author=self.author, text='Пост', group=self.group
+        )
+        author_stats, _ = self.refresh()
+        self.assertEqual(author_stats.posts_count, 1)
+        self.assertEqual(self.group.posts_count, 1)
+        post.group = self.other_group
+        post.save()
+        self.refresh()
+        self.assertEqual(self.group.posts_count, 0)
+        self.assertEqual(self.other_group.posts_count, 1)
+        post.delete()
+        author_stats, _ = self.refresh()
+        self.assertEqual(author_stats.posts_count, 0)
+        self.assertEqual(self.other_group.posts_count, 0)
+
+    def test_edit_keeps_concurrent_comment_count(self):
+        """Правка поста и группы не затирает параллельные счётчики."""
+        post = Post.objects.create(author=self.author, text='Пост')
+        # Пост загружен (post_edit), затем добавлен комментарий.
+        loaded = Post.objects.get(pk=post.pk)
+        Comment.objects.create(post=post, author=self.reader, text='Ответ')
+        form = PostForm({'text': 'Правка'}, instance=loaded)
+        self.assertTrue(form.is_valid())
+        form.save()
+        post.refresh_from_db()
+        self.assertEqual(post.text, 'Правка')
+        self.assertEqual(post.comments_count, 1)
+        loaded_group = Group.objects.get(pk=self.group.pk)
+        Post.objects.create(author=self.author, text='Ещё', group=self.group)
+        loaded_group.title = 'Новое название'
+        loaded_group.save()
+        self.refresh()
+        self.assertEqual(self.group.posts_count, 1)
+
+    def test_comment_and_follow_counters(self):
+        """Комментарии и подписки из представлений меняют счётчики."""
+        post = Post.objects.create(author=self.author, text='Пост')
+        self.reader_client.post(
+            reverse('posts:add_comment', kwargs={'post_id': post.pk}),
+            {'text': 'Комментарий'}
+        )
+        post.refresh_from_db()
+        self.assertEqual(post.comments_count, 1)
+        self.reader_client.get(
+            reverse('posts:profile_follow', kwargs={'username': 'author'})
+        )
+        author_stats, reader_stats = self.refresh()
+        self.assertEqual(author_stats.followers_count, 1)
+        self.assertEqual(reader_stats.following_count, 1)
+        self.reader_client.get(
+            reverse('posts:profile_unfollow', kwargs={'username': 'author'})
+        )
+        author_stats, reader_stats = self.refresh()
+        self.assertEqual(author_stats.followers_count, 0)
+        self.assertEqual(reader_stats.following_count, 0)
+
+    def test_rebuild_command_fixes_drift(self):
+        """Команда находит и исправляет расхождения счётчиков."""
+        post = Post.objects.create(
+            author=self.author, text='Пост', group=self.group
+        )
+        Comment.objects.create(post=post, author=self.reader, text='Текст')
+        Follow.objects.create(user=self.reader, author=self.author)
+        Post.objects.update(comments_count=7)
+        UserStats.objects.update(posts_count=0)
+        out = StringIO()
+        with self.assertRaises(CommandError):
+            call_command('rebuild_counters', '--check', stdout=out)
+        self.assertIn('Post.comments_count', out.getvalue())
+        call_command('rebuild_counters', stdout=out)
+        call_command('rebuild_counters', '--check', stdout=out)
+        post.refresh_from_db()
+        author_stats, _ = self.refresh()
+        self.assertEqual(post.comments_count, 1)
+        self.assertEqual(author_stats.posts_count, 1)
@@ -0,0 +1,107 @@
+import hashlib
+import shutil
+import tempfile
+from io import BytesIO
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from PIL import Image
+from core.storage import hashed_name
+from posts.forms import PostForm
+from posts.models import Post, User
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+SMALL_GIF = (
+    b'\x47\x49\x46\x38\x39\x61\x02\x00'
+    b'\x01\x00\x80\x00\x00\x00\x00\x00'
+    b'\xFF\xFF\xFF\x21\xF9\x04\x00\x00'
+    b'\x00\x00\x00\x2C\x00\x00\x00\x00'
+    b'\x02\x00\x01\x00\x00\x02\x02\x0C'
+    b'\x0A\x00\x3B'
+)
+
+
+def upload(name, fmt, size=(64, 32), mode='RGB', **params):
+    buffer = BytesIO()
+    Image.new(mode, size, color='red').save(buffer, fmt, **params)
+    return SimpleUploadedFile(name, buffer.getvalue())
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT, IMAGE_MAX_DIMENSION=400)
+class ImageNormalizationTests(TestCase):
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+        super().tearDownClass()
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='photographer')
+
+    def clean(self, image):
+        form = PostForm(data={'text': 'Пост'}, files={'image': image})
+        self.assertTrue(form.is_valid(), form.errors)
+        return form
+
+    def opened(self, file):
+        file.seek(0)
+        return Image.open(BytesIO(file.read()))
+
+    def test_large_png_is_resized_to_jpeg(self):
+        form = self.clean(upload('big.png', 'PNG', size=(1200, 600)))
+        image = form.cleaned_data['image']
+        self.assertEqual(image.name, 'big.jpg')
+        self.assertEqual(form.image_size, (400, 200))
+        with self.opened(image) as result:
+            self.assertEqual(result.format, 'JPEG')
+            self.assertEqual(result.size, (400, 200))
+
+    def test_exif_is_applied_and_stripped(self):
+        exif = Image.Exif()
+        exif[0x0112] = 6  # повёрнуто на 90°
+        form = self.clean(upload('photo.jpg', 'JPEG', exif=exif.tobytes()))
+        self.assertEqual(form.image_size, (32, 64))
+        with self.opened(form.cleaned_data['image']) as result:
+            self.assertNotIn('exif', result.info)
+
+    def test_animation_keeps_first_frame(self):
+        buffer = BytesIO()
+        frames = [Image.new('P', (20, 20), color) for color in (1, 2, 3)]
+        frames[0].save(
+            buffer, 'GIF', save_all=True, append_images=frames[1:]
+        )
+        form = self.clean(SimpleUploadedFile('anim.gif', buffer.getvalue()))
+        with self.opened(form.cleaned_data['image']) as result:
+            self.assertFalse(getattr(result, 'is_animated', False))
+
+    def test_transparency_is_kept(self):
+        form = self.clean(upload('logo.png', 'PNG', size=(800, 80),
+                                 mode='RGBA'))
+        with self.opened(form.cleaned_data['image']) as result:
+            self.assertEqual((result.format, result.mode), ('PNG', 'RGBA'))
+
+    @override_settings(IMAGE_MAX_PIXELS=1000)
+    def test_decompression_bomb_is_rejected(self):
+        form = PostForm(
+            data={'text': 'Пост'},
+            files={'image': upload('bomb.png', 'PNG', size=(100, 100))},
+        )
+        self.assertFalse(form.is_valid())
+        self.assertIn('image', form.errors)
+
+    def test_small_original_is_kept_and_size_stored(self):
+        self.client.force_login(self.user)
+        self.client.post(reverse('posts:post_create'), {
+            'text': 'Маленькая картинка',
+            'image': SimpleUploadedFile('small.gif', SMALL_GIF, 'image/gif'),
+        })
+        post = Post.objects.get(text='Маленькая картинка')
+        self.assertEqual(post.image.name, hashed_name(
+            'posts/small.gif', hashlib.sha256(SMALL_GIF).hexdigest()
+        ))
+        self.assertEqual((post.image_width, post.image_height), (2, 1))
+        with post.image.open('rb') as file:
+            self.assertEqual(file.read(), SMALL_GIF)
@@ -0,0 +1,113 @@
+from unittest import skipUnless
+
+from django.core.cache import cache
+from django.db import connection
+from django.test import Client, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from posts.models import Comment, Follow, Group, Post, User
+
+
+@skipUnless(connection.vendor == 'sqlite', 'EXPLAIN QUERY PLAN из SQLite')
+class FeedIndexTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.guest_client = Client()
+        cls.user = User.objects.create(username='Indexed')
+        cls.group = Group.objects.create(
+            title='Группа',
+            slug='indexed',
+            description='Описание группы',
+        )
+        for number in range(12):
+            cls.post = Post.objects.create(
+                text=f'Пост {number}', author=cls.user, group=cls.group
+            )
+            Comment.objects.create(
+                post=cls.post, author=cls.user, text='Комментарий'
+            )
+
+    def setUp(self):
+        cache.clear()
+
+    def plans_for(self, url, table, client=None):
+        """Планы всех SELECT-ов страницы url к таблице table."""
+        # Страница читается из базы, а не из кэша лент.
+        cache.clear()
+        with CaptureQueriesContext(connection) as queries:
+            (client or self.guest_client).get(url)
+        plans = []
+        with connection.cursor() as cursor:
+            for query in queries.captured_queries:
+                sql = query['sql']
+                if not sql.startswith('SELECT') or 'ORDER BY' not in sql:
+                    continue
+                if f'FROM "{table}"' not in sql:
+                    continue
+                cursor.execute(f'EXPLAIN QUERY PLAN {sql}')
+                plans.append(' '.join(row[-1] for row in cursor.fetchall()))
+        return plans
+
+    def assert_uses_index(self, url, table, index, client=None):
+        plans = self.plans_for(url, table, client)
+        self.assertTrue(plans, f'{url} не выбирает записи из {table}')
+        for plan in plans:
+            with self.subTest(url=url, plan=plan):
+                self.assertIn(index, plan)
+                self.assertNotIn('TEMP B-TREE', plan)
+
+    def test_feeds_use_composite_indexes(self):
+        """Ленты читаются по составным индексам без сортировки."""
+        feeds = (
+            (reverse('posts:index'), 'post_created_id_idx'),
+            (
+                reverse('posts:group_list', kwargs={'slug': 'indexed'}),
+                'post_group_created_idx'
+            ),
+            (
+                reverse('posts:profile', kwargs={'username': 'Indexed'}),
+                'post_author_created_idx'
+            ),
+        )
+        for url, index in feeds:
+            self.assert_uses_index(url, 'posts_post', index)
+
+    def test_follow_feed_uses_timeline_index(self):
+        """Лента подписок идёт по индексам ленты и автора без сортировки."""
+        reader = User.objects.create(username='Reader')
+        large = User.objects.create(username='Large')
+        Follow.objects.create(user=reader, author=self.user)
+        Follow.objects.create(user=reader, author=large, fanout_on_read=True)
+        Post.objects.create(text='Пост крупного автора', author=large)
+        client = Client()
+        client.force_login(reader)
+        url = reverse('posts:follow_index')
+        cursor = client.get(url).context['page_obj'].next_cursor
+        for page in (url, f'{url}?cursor={cursor}'):
+            # Отрезок TimelineEntry подзапросом и посты крупного автора.
+            plans = self.plans_for(page, 'posts_post', client)
+            self.assertEqual(len(plans), 2, plans)
+            self.assertIn('timeline_user_created_idx', plans[0])
+            self.assertIn('post_author_created_idx', plans[1])
+            for plan in plans:
+                with self.subTest(url=page, plan=plan):
+                    self.assertNotIn('TEMP B-TREE', plan)
+
+    def test_comments_use_composite_index(self):
+        """Комментарии поста читаются по индексу (post, created)."""
+        self.assert_uses_index(
+            reverse('posts:post_detail', kwargs={'post_id': self.post.pk}),
+            'posts_comment',
+            'comment_post_created_idx'
+        )
+
+    def test_cursor_page_uses_index(self):
+        """Курсорная страница тоже идёт по индексу."""
+        first = self.guest_client.get(reverse('posts:index'))
+        cursor = first.context['page_obj'].next_cursor
+        self.assert_uses_index(
+            reverse('posts:index') + f'?cursor={cursor}',
+            'posts_post',
+            'post_created_id_idx'
+        )
@@ -0,0 +1,237 @@
+"""Бюджеты запросов и времени ответа для всех страниц posts.
+
+Для каждого адреса из posts.urls задан предельный бюджет
+SQL-запросов на холодном кэше; эта проверка детерминирована и входит в
+обычный прогон.
+
+Время ответа (p50/p95) сравнивается с benchmarks/baseline.json только
+по запросу: оно зависит от машины и требует данных в объёме, близком к
+боевому (100 000 постов, см. YATUBE_BENCH_POSTS):
+
+    YATUBE_BENCHMARK=1 python manage.py test posts.tests.test_performance
+
+Обновить эталон — то же с YATUBE_BENCH_UPDATE=1.
+"""
+import json
+import os
+import statistics
+import time
+from unittest import skipUnless
+
+from django.core.cache import cache
+from django.db import connection
+from django.test import Client, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from core.models import next_change_seq
+from posts import urls as posts_urls
+from posts.counters import rebuild_counters
+from posts.models import Comment, Follow, Group, Post, User
+
+BENCHMARK = bool(
+    os.environ.get('YATUBE_BENCHMARK') or os.environ.get('YATUBE_BENCH_UPDATE')
+)
+# Число запросов от объёма данных не зависит: без замера времени
+# хватает небольшой базы.
+BENCH_POSTS = int(
+    os.environ.get('YATUBE_BENCH_POSTS', 100000 if BENCHMARK else 2000)
+)
+BENCH_USERS = 200
+BENCH_GROUPS = 20
+BENCH_COMMENTS = 300
+BENCH_FOLLOWS = 10
+BENCH_RUNS = 15
+BASELINE_PATH = os.path.join(
+    os.path.dirname(__file__), 'benchmarks', 'baseline.json'
+)
+# p95 может вырасти в LATENCY_TOLERANCE раз плюс LATENCY_SLACK секунд,
+# прежде чем это сочтётся регрессией: запуски на разных машинах шумят.
+LATENCY_TOLERANCE = 3.0
+LATENCY_SLACK = 0.05
+
+# Предельное число SQL-запросов на адрес (холодный кэш, пользователь
+# авторизован). group_list, profile и post_detail тратят один запрос на
+# ETag (см. posts.etags), сохранение комментария — два на номер
+# изменения (core.models.next_change_seq), follow_index — один на
+# список авторов, которые читаются при чтении (posts.timeline).
+QUERY_BUDGETS = {
+    'posts:index': 3,
+    'posts:group_list': 5,
+    'posts:profile': 6,
+    'posts:post_detail': 5,
+    'posts:post_create': 3,
+    'posts:post_edit': 4,
+    'posts:add_comment': 9,
+    'posts:comments': 2,
+    'posts:search': 4,
+    'posts:changes': 6,
+    'posts:api_index': 3,
+    'posts:api_group_posts': 4,
+    'posts:api_profile': 4,
+    'posts:follow_index': 5,
+    'posts:profile_follow': 12,
+    'posts:profile_unfollow': 11,
+}
+
+
+class PerformanceBudgetTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        User.objects.bulk_create(
+            User(username=f'bench{number}') for number in range(BENCH_USERS)
+        )
+        Group.objects.bulk_create(
+            Group(
+                title=f'Группа {number}',
+                slug=f'bench-{number}',
+                description='Описание группы',
+            )
+            for number in range(BENCH_GROUPS)
+        )
+        users = list(User.objects.order_by('pk'))
+        groups = list(Group.objects.order_by('pk'))
+        seqs = next_change_seq(BENCH_POSTS)
+        Post.objects.bulk_create(
+            Post(
+                text=f'Пост номер {number}. ' * 10,
+                author=users[number % BENCH_USERS],
+                group=groups[number % BENCH_GROUPS] if number % 3 else None,
+                change_seq=seqs[number],
+            )
+            for number in range(BENCH_POSTS)
+        )
+        cls.author = users[1]
+        cls.group = groups[0]
+        cls.post = Post.objects.filter(author=cls.author).first()
+        Comment.objects.bulk_create(
+            Comment(
+                post=cls.post,
+                author=users[number % BENCH_USERS],
+                text='Комментарий',
+            )
+            for number in range(BENCH_COMMENTS)
+        )
+        for author in users[2:BENCH_FOLLOWS + 2]:
+            Follow.objects.create(user=cls.author, author=author)
+        rebuild_counters()
+
+    def setUp(self):
+        self.client = Client()
+        self.client.force_login(self.author)
+        self.unfollowed = User.objects.get(username='bench150')
+
+    def requests(self):
+        """Запрос к каждому адресу posts.urls: имя -> (метод, url, данные)."""
+        post_kwargs = {'post_id': self.post.pk}
+        return {
+            'posts:index': ('get', reverse('posts:index'), None),
+            'posts:group_list': ('get', reverse(
+                'posts:group_list', kwargs={'slug': self.group.slug}
+            ), None),
+            'posts:profile': ('get', reverse(
+                'posts:profile', kwargs={'username': self.author.username}
+            ), None),
+            'posts:post_detail': ('get', reverse(
+                'posts:post_detail', kwargs=post_kwargs
+            ), None),
+            'posts:post_create': ('get', reverse('posts:post_create'), None),
+            'posts:post_edit': ('get', reverse(
+                'posts:post_edit', kwargs=post_kwargs
+            ), None),
+            'posts:add_comment': ('post', reverse(
+                'posts:add_comment', kwargs=post_kwargs
+            ), {'text': 'Новый комментарий'}),
+            'posts:comments': ('get', reverse(
+                'posts:comments', kwargs=post_kwargs
+            ), None),
+            'posts:search': ('get', reverse('posts:search'), {
+                'q': 'пост номер 4242'
+            }),
+            'posts:changes': ('get', reverse('posts:changes'), {
+                'since': BENCH_POSTS // 2
+            }),
+            'posts:api_index': ('get', reverse('posts:api_index'), None),
+            'posts:api_group_posts': ('get', reverse(
+                'posts:api_group_posts', kwargs={'slug': self.group.slug}
+            ), None),
+            'posts:api_profile': ('get', reverse(
+                'posts:api_profile', kwargs={'username': self.author.username}
+            ), {'fields': 'id,text,created'}),
+            'posts:follow_index': ('get', reverse('posts:follow_index'), None),
+            'posts:profile_follow': ('get', reverse(
+                'posts:profile_follow',
+                kwargs={'username': self.unfollowed.username}
+            ), None),
+            'posts:profile_unfollow': ('get', reverse(
+                'posts:profile_unfollow',
+                kwargs={'username': self.unfollowed.username}
+            ), None),
+        }
+
+    def fetch(self, method, url, data):
+        response = getattr(self.client, method)(url, data or {})
+        self.assertLess(response.status_code, 400, url)
+        return response
+
+    def test_every_url_has_budget(self):
+        """Для каждого адреса posts.urls задан бюджет запросов."""
+        names = {
+            f'{posts_urls.app_name}:{pattern.name}'
+            for pattern in posts_urls.urlpatterns
+        }
+        self.assertEqual(names, set(QUERY_BUDGETS))
+        self.assertEqual(names, set(self.requests()))
+
+    def test_query_budgets(self):
+        """Ни одна страница не выходит за бюджет SQL-запросов."""
+        for name, (method, url, data) in self.requests().items():
+            with self.subTest(view=name):
+                cache.clear()
+                with CaptureQueriesContext(connection) as queries:
+                    self.fetch(method, url, data)
+                self.assertLessEqual(
+                    len(queries), QUERY_BUDGETS[name],
+                    '\n'.join(query['sql'] for query in queries)
+                )
+
+    @skipUnless(BENCHMARK, 'Замер времени: запустите с YATUBE_BENCHMARK=1')
+    def test_latency_against_baseline(self):
+        """p50/p95 времени ответа не хуже эталона."""
+        results = {}
+        for name, (method, url, data) in self.requests().items():
+            timings = []
+            for _ in range(BENCH_RUNS):
+                cache.clear()
+                started = time.perf_counter()
+                self.fetch(method, url, data)
+                timings.append(time.perf_counter() - started)
+            timings.sort()
+            results[name] = {
+                'p50': round(statistics.median(timings), 5),
+                'p95': round(timings[int(len(timings) * 0.95) - 1], 5),
+            }
+        if os.environ.get('YATUBE_BENCH_UPDATE'):
+            os.makedirs(os.path.dirname(BASELINE_PATH), exist_ok=True)
+            with open(BASELINE_PATH, 'w') as baseline_file:
+                json.dump(
+                    {'posts': BENCH_POSTS, 'views': results},
+                    baseline_file, indent=2, sort_keys=True,
+                    ensure_ascii=False
+                )
+                baseline_file.write('\n')
+            return
+        if not os.path.exists(BASELINE_PATH):
+            self.skipTest('Нет эталона: запустите с YATUBE_BENCH_UPDATE=1')
+        with open(BASELINE_PATH) as baseline_file:
+            baseline = json.load(baseline_file)
+        if baseline['posts'] != BENCH_POSTS:
+            self.skipTest('Эталон снят на другом объёме данных')
+        for name, measured in results.items():
+            with self.subTest(view=name):
+                expected = baseline['views'][name]
+                self.assertLessEqual(
+                    measured['p95'],
+                    expected['p95'] * LATENCY_TOLERANCE + LATENCY_SLACK,
+                    f'{name}: p95 {measured["p95"]} при эталоне '
+                    f'{expected["p95"]}'
+                )
@@ -0,0 +1,180 @@
+import shutil
+import tempfile
+from io import BytesIO, StringIO
+from unittest import mock
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import CommandError, call_command
+from django.db import connection
+from django.test import Client, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from PIL import Image
+from posts.models import Post, Rendition, User
+from posts import renditions
+from posts.renditions import (get_renditions, render_renditions,
+                              rendition_name)
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+
+def make_image(name='photo.png', size=(1200, 800)):
+    buffer = BytesIO()
+    Image.new('RGB', size, color=(40, 120, 200)).save(buffer, 'PNG')
+    return SimpleUploadedFile(name, buffer.getvalue(), 'image/png')
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class RenditionTests(TestCase):
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+        super().tearDownClass()
+
+    def setUp(self):
+        cache.clear()
+        self.guest_client = Client()
+        self.user = User.objects.create(username='Photographer')
+        self.post = Post.objects.create(
+            author=self.user, text='Пост с картинкой', image=make_image()
+        )
+
+    def test_widths_and_formats(self):
+        """Кадры не шире исходника, в WebP и JPEG, в пропорциях ленты."""
+        renditions = render_renditions(self.post.image.name)
+        self.assertEqual(renditions.widths, [320, 640, 960])
+        self.assertEqual(
+            Rendition.objects.get(source=self.post.image.name).widths,
+            '320,640,960'
+        )
+        for ext, fmt in (('webp', 'WEBP'), ('jpg', 'JPEG')):
+            name = rendition_name(self.post.image.name, 960, ext)
+            with default_storage.open(name) as file:
+                with Image.open(file) as image:
+                    self.assertEqual(image.format, fmt)
+                    self.assertEqual(image.size, (960, 339))
+
+    def test_small_image_gets_smallest_width(self):
+        post = Post.objects.create(
+            author=self.user, text='Крошка', image=make_image(size=(40, 20))
+        )
+        self.assertEqual(render_renditions(post.image.name).widths, [320])
+
+    def test_placeholder_until_renditions_ready(self):
+        """Без готовых кадров выводится заглушка и задача в очереди."""
+        response = self.guest_client.get(reverse('posts:index'))
+        self.assertContains(response, 'bg-light')
+        self.assertNotContains(response, '<picture>')
+        self.assertIsNotNone(
+            cache.get(f'rendition-pending:{self.post.image.name}')
+        )
+
+    def test_placeholder_page_not_cached(self):
+        """Страница с заглушкой не попадает в кэш страниц для гостей."""
+        urls = [
+            reverse('posts:index'),
+            reverse('posts:post_detail', kwargs={'post_id': self.post.pk}),
+        ]
+        for url in urls:
+            with self.subTest(url=url):
+                self.guest_client.get(url)
+                response = self.guest_client.get(url)
+                self.assertEqual(response['X-Page-Cache'], 'miss')
+                self.assertContains(response, 'bg-light')
+        render_renditions(self.post.image.name)
+        for url in urls:
+            with self.subTest(url=url):
+                self.assertContains(self.guest_client.get(url), '<picture>')
+                self.assertEqual(
+                    self.guest_client.get(url)['X-Page-Cache'], 'hit'
+                )
+
+    def test_placeholder_page_has_no_etag(self):
+        """Страница с заглушкой не получает ETag и не даёт 304."""
+        url = reverse('posts:post_detail', kwargs={'post_id': self.post.pk})
+        response = self.guest_client.get(url)
+        self.assertContains(response, 'bg-light')
+        self.assertFalse(response.has_header('ETag'))
+        render_renditions(self.post.image.name)
+        response = self.guest_client.get(url)
+        self.assertContains(response, '<picture>')
+        self.assertEqual(
+            self.guest_client.get(
+                url, HTTP_IF_NONE_MATCH=response['ETag']
+            ).status_code,
+            304
+        )
+
+    def test_srcset_rendered(self):
+        render_renditions(self.post.image.name)
+        response = self.guest_client.get(reverse('posts:index'))
+        webp = default_storage.url(
+            rendition_name(self.post.image.name, 640, 'webp')
+        )
+        jpeg = default_storage.url(
+            rendition_name(self.post.image.name, 960, 'jpg')
+        )
+        self.assertContains(response, '<source type="image/webp"')
+        self.assertContains(response, f'{webp} 640w')
+        self.assertContains(response, f'src="{jpeg}"')
+        self.assertContains(response, 'sizes="(max-width: 992px)')
+
+    def test_renditions_fetched_in_one_batch(self):
+        """Кадры страницы читаются одним запросом к таблице."""
+        for number in range(3):
+            post = Post.objects.create(
+                author=self.user,
+                text=f'Ещё пост {number}',
+                image=make_image(f'photo{number}.png', size=(400, 300))
+            )
+            render_renditions(post.image.name)
+        render_renditions(self.post.image.name)
+        cache.clear()
+        with CaptureQueriesContext(connection) as queries:
+            response = self.guest_client.get(reverse('posts:index'))
+        rendition_queries = [
+            query for query in queries.captured_queries
+            if 'posts_rendition' in query['sql']
+        ]
+        self.assertEqual(len(rendition_queries), 1)
+        posts = response.context['page_obj']
+        self.assertTrue(all(post.renditions for post in posts))
+
+    def test_missing_is_cached(self):
+        get_renditions([self.post.image.name])
+        with self.assertNumQueries(0):
+            result = get_renditions([self.post.image.name])
+        self.assertIsNone(result[self.post.image.name])
+
+    def test_missing_marker_expires_soon(self):
+        """Отметка «кадров нет» не держится в кэше сутки."""
+        with mock.patch.object(
+            renditions.cache, 'set_many', wraps=renditions.cache.set_many
+        ) as set_many:
+            get_renditions([self.post.image.name])
+        set_many.assert_called_once_with(
+            mock.ANY, renditions.MISSING_TIMEOUT
+        )
+        self.assertLess(renditions.MISSING_TIMEOUT, renditions.CACHE_TIMEOUT)
+
+    def test_backfill_reports_failures(self):
+        """Команда считает готовые и неудачные картинки отдельно."""
+        broken = Post.objects.create(
+            author=self.user, text='Битая картинка',
+            image=SimpleUploadedFile('broken.png', b'not an image'),
+        )
+        out = StringIO()
+        with self.assertLogs('posts.renditions', 'ERROR'):
+            with self.assertRaisesMessage(
+                CommandError, 'Подготовлено картинок: 1; не удалось: 1.'
+            ):
+                call_command('backfill_renditions', stdout=out)
+        self.assertTrue(
+            Rendition.objects.filter(source=self.post.image.name).exists()
+        )
+        self.assertFalse(
+            Rendition.objects.filter(source=broken.image.name).exists()
+        )
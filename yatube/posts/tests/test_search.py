@@ -0,0 +1,119 @@
+from io import StringIO
+
+from django.core.management import call_command
+from django.db import connection
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from posts.models import Group, Post, User
+from posts.search import ensure_triggers, search_posts, search_terms
+
+
+class SearchTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create(username='writer')
+        cls.other = User.objects.create(username='reader')
+        cls.group = Group.objects.create(
+            title='Путешествия', slug='travel', description='Описание'
+        )
+        cls.mountains = Post.objects.create(
+            text='Поход в горы: горы, горы и снова горы',
+            author=cls.author,
+            group=cls.group,
+        )
+        cls.sea = Post.objects.create(
+            text='Отпуск на море, а потом в горы', author=cls.other
+        )
+        cls.city = Post.objects.create(
+            text='Прогулка по городу', author=cls.author
+        )
+
+    def setUp(self):
+        self.client = Client()
+
+    def test_ranked_results(self):
+        """Находятся только совпадения, более релевантные выше."""
+        posts, has_next = search_posts('горы')
+        self.assertEqual(posts, [self.mountains, self.sea])
+        self.assertFalse(has_next)
+
+    def test_prefix_and_all_terms(self):
+        """Слова ищутся по префиксу и должны встретиться все."""
+        self.assertEqual(search_posts('прогул')[0], [self.city])
+        self.assertEqual(search_posts('море горы')[0], [self.sea])
+
+    def test_filters(self):
+        """Фильтры по группе и автору."""
+        self.assertEqual(
+            search_posts('горы', group_id=self.group.pk)[0], [self.mountains]
+        )
+        self.assertEqual(
+            search_posts('горы', author_id=self.other.pk)[0], [self.sea]
+        )
+
+    def test_pagination(self):
+        """Следующая страница определяется без COUNT(*)."""
+        first, has_next = search_posts('горы', per_page=1)
+        second, has_more = search_posts('горы', page=2, per_page=1)
+        self.assertEqual(first + second, [self.mountains, self.sea])
+        self.assertTrue(has_next)
+        self.assertFalse(has_more)
+
+    def test_index_follows_writes(self):
+        """Индекс обновляется при изменении и удалении постов."""
+        city = Post.objects.get(pk=self.city.pk)
+        city.text = 'Горы за городом'
+        city.save()
+        self.assertIn(city, search_posts('горы')[0])
+        Post.objects.filter(pk=self.sea.pk).update(text='Только море')
+        self.assertNotIn(self.sea, search_posts('горы')[0])
+        Post.objects.get(pk=self.mountains.pk).delete()
+        self.assertEqual(search_posts('поход')[0], [])
+
+    def test_query_syntax_is_escaped(self):
+        """Операторы FTS5 в запросе не ломают поиск."""
+        self.assertEqual(
+            search_terms('"горы" OR NEAR(*'), ['горы', 'or', 'near']
+        )
+        response = self.client.get(reverse('posts:search'), {'q': '"горы*'})
+        self.assertEqual(response.status_code, 200)
+
+    def test_view(self):
+        """Страница поиска с фильтром по автору."""
+        response = self.client.get(
+            reverse('posts:search'), {'q': 'горы', 'author': 'writer'}
+        )
+        self.assertEqual(response.context['posts'], [self.mountains])
+        response = self.client.get(
+            reverse('posts:search'), {'q': 'горы', 'group': 'нет-такой'}
+        )
+        self.assertEqual(response.context['posts'], [])
+
+    def test_rebuild_command(self):
+        """Команда восстанавливает индекс после ручной порчи."""
+        if connection.vendor != 'sqlite':
+            self.skipTest('FTS5 есть только в SQLite')
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "INSERT INTO posts_post_fts(posts_post_fts) "
+                "VALUES ('delete-all')"
+            )
+        self.assertEqual(search_posts('горы')[0], [])
+        out = StringIO()
+        call_command('rebuild_search_index', verbosity=0, stdout=out)
+        self.assertEqual(out.getvalue(), '')
+        self.assertEqual(
+            search_posts('горы')[0], [self.mountains, self.sea]
+        )
+
+    def test_lost_triggers_are_restored(self):
+        """После пересоздания posts_post триггеры возвращаются."""
+        if connection.vendor != 'sqlite':
+            self.skipTest('FTS5 есть только в SQLite')
+        with connection.cursor() as cursor:
+            cursor.execute('DROP TRIGGER posts_post_fts_insert')
+        self.assertTrue(ensure_triggers())
+        self.assertFalse(ensure_triggers())
+        post = Post.objects.create(text='Новый поход', author=self.author)
+        self.assertIn(post, search_posts('поход')[0])
@@ -0,0 +1,123 @@
+import io
+import json
+import os
+import shutil
+import tempfile
+
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import CommandError, call_command
+from django.test import TestCase, override_settings
+
+from core.models import StoredFile
+from core.testing import run_commit_hooks
+from posts.models import Comment, Follow, Group, Post, TimelineEntry, User
+from posts.search import search_posts
+
+
+class TransferTests(TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        author = User.objects.create(username='leo')
+        reader = User.objects.create(username='kit')
+        group = Group.objects.create(
+            title='Кошки', slug='cats', description='Описание'
+        )
+        post = Post.objects.create(text='Про котов', author=author,
+                                   group=group)
+        Post.objects.create(text='Без группы', author=reader)
+        Comment.objects.create(post=post, author=reader, text='Мяу')
+        Follow.objects.create(user=reader, author=author)
+        self.created = post.created
+
+    def tearDown(self):
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+    def export(self, name):
+        path = os.path.join(self.directory, name)
+        call_command('export_posts', path, stdout=io.StringIO())
+        return path
+
+    def wipe(self):
+        Post.objects.all().delete()
+        Follow.objects.all().delete()
+        User.objects.all().delete()
+
+    def assert_restored(self):
+        post = Post.objects.get(text='Про котов')
+        self.assertEqual(post.author.username, 'leo')
+        self.assertEqual(post.group.slug, 'cats')
+        self.assertEqual(post.created, self.created)
+        self.assertGreater(post.change_seq, 0)
+        self.assertEqual(post.comments.get().author.username, 'kit')
+        # Производные данные, которые обычно ведут сигналы.
+        self.assertEqual(post.comments_count, 1)
+        self.assertEqual(post.group.posts_count, 1)
+        self.assertEqual(post.author.stats.followers_count, 1)
+        self.assertTrue(TimelineEntry.objects.filter(
+            user__username='kit', post=post
+        ).exists())
+        self.assertEqual(search_posts('котов')[0], [post])
+
+    def test_ndjson_round_trip(self):
+        path = self.export('dump.ndjson')
+        with open(path, encoding='utf-8') as dump:
+            types = [json.loads(line)['type'] for line in dump]
+        self.assertEqual(types, ['post', 'post', 'comment', 'follow'])
+        self.wipe()
+        call_command('import_posts', path, stdout=io.StringIO())
+        self.assert_restored()
+
+    def test_csv_round_trip_in_small_chunks(self):
+        path = self.export('dump.csv')
+        self.wipe()
+        call_command(
+            'import_posts', path, chunk_size=1, stdout=io.StringIO()
+        )
+        self.assert_restored()
+        self.assertEqual(Post.objects.count(), 2)
+
+    def test_bad_record_is_reported(self):
+        path = os.path.join(self.directory, 'bad.ndjson')
+        with open(path, 'w', encoding='utf-8') as dump:
+            dump.write('{"type": "post", "text": "без автора"}\n')
+        with self.assertRaises(CommandError):
+            call_command('import_posts', path, stdout=io.StringIO())
+
+    def test_conflicting_id_reports_chunk(self):
+        """Занятый id — ошибка с номером пачки; прежние пачки целы."""
+        taken = Post.objects.get(text='Про котов').pk
+        path = os.path.join(self.directory, 'conflict.ndjson')
+        with open(path, 'w', encoding='utf-8') as dump:
+            for pk, text in ((100, 'Новый'), (taken, 'Дубль')):
+                dump.write(json.dumps({
+                    'type': 'post', 'id': pk, 'author': 'kit', 'text': text
+                }) + '\n')
+        with self.assertRaisesMessage(CommandError, 'пачка 2 (с записи 2)'):
+            call_command(
+                'import_posts', path, chunk_size=1, stdout=io.StringIO()
+            )
+        self.assertEqual(Post.objects.get(pk=100).text, 'Новый')
+        self.assertEqual(Post.objects.get(pk=taken).text, 'Про котов')
+        # Производные для сохранённой пачки обновлены.
+        self.assertEqual(User.objects.get(username='kit').stats.posts_count, 2)
+
+    def test_imported_image_keeps_shared_file(self):
+        """Импортированный пост держит ссылку на уже загруженный файл."""
+        with override_settings(MEDIA_ROOT=self.directory):
+            original = Post.objects.create(
+                text='С картинкой', author=User.objects.get(username='leo'),
+                image=SimpleUploadedFile('a.gif', b'GIF89a' + b'\x00' * 20),
+            )
+            name = original.image.name
+            path = os.path.join(self.directory, 'images.ndjson')
+            with open(path, 'w', encoding='utf-8') as dump:
+                dump.write(json.dumps({
+                    'type': 'post', 'author': 'kit', 'text': 'Копия',
+                    'image': name,
+                }) + '\n')
+            call_command('import_posts', path, stdout=io.StringIO())
+            self.assertEqual(StoredFile.objects.get(name=name).refs, 2)
+            with run_commit_hooks():
+                original.delete()
+            self.assertEqual(StoredFile.objects.get(name=name).refs, 1)
+            self.assertTrue(Post.image.field.storage.exists(name))
@@ -1,13 +1,25 @@
+import base64
+import hashlib
+import json
 import shutil
 import tempfile
+from importlib import import_module
 
-from django.test import Client, TestCase
+from django.apps import apps
+from django.test import Client, TestCase, override_settings
 from django.urls import reverse
 from django import forms
-from posts.models import Follow, Group, Post, User
+from core.storage import hashed_name
+from posts import feed_cache
+from posts.feed_cache import SHARED_TAGS
+from posts.models import (
+    Comment, Follow, Group, Post, TimelineEntry, User
+)
 from django.conf import settings
 from django.core.cache import cache
 from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
 
 
 class PostURLTests(TestCase):
@@ -28,6 +40,10 @@ class PostURLTests(TestCase):
             content=small_gif,
             content_type='image/gif'
         )
+        # Картинки хранятся под именем по содержимому (core.storage).
+        cls.image_name = hashed_name(
+            'posts/small.gif', hashlib.sha256(small_gif).hexdigest()
+        )
         # Создаем неавторизованный клиент
         cls.guest_client = Client()
         # Создаем авторизованый клиент
@@ -105,7 +121,7 @@ class PostURLTests(TestCase):
         self.assertIn('page_obj', response.context)
         # Изображение передаётся в словаре context
         post_image = Post.objects.first().image
-        self.assertEqual(post_image, 'posts/small.gif')
+        self.assertEqual(post_image, self.image_name)
 
     def test_group_page_show_correct_context(self):
         """Шаблон group_list сформирован с правильным контекстом."""
@@ -119,7 +135,7 @@ class PostURLTests(TestCase):
         self.assertIn('description', response.context)
         # Изображение передаётся в словаре context
         post_image = Post.objects.first().image
-        self.assertEqual(post_image, 'posts/small.gif')
+        self.assertEqual(post_image, self.image_name)
 
     def test_profile_page_show_correct_context(self):
         """Шаблон profile сформирован с правильным контекстом."""
@@ -134,7 +150,7 @@ class PostURLTests(TestCase):
         self.assertEqual(response.context['author'], self.user)
         # Изображение передаётся в словаре context
         post_image = Post.objects.first().image
-        self.assertEqual(post_image, 'posts/small.gif')
+        self.assertEqual(post_image, self.image_name)
 
     def test_post_detail_page_show_correct_context(self):
         """Шаблон post_detail сформирован с правильным контекстом."""
@@ -146,7 +162,7 @@ class PostURLTests(TestCase):
         self.assertIn('title', response.context)
         # Изображение передаётся в словаре context
         post_image = Post.objects.first().image
-        self.assertEqual(post_image, 'posts/small.gif')
+        self.assertEqual(post_image, self.image_name)
 
     def test_post_create_page_show_correct_context(self):
         """Шаблон post_create сформирован с правильным контекстом."""
@@ -202,15 +218,42 @@ class PostURLTests(TestCase):
     def test_cache_index(self):
         """Тест кэширования главной страницы."""
         first = self.authorized_client.get(reverse('posts:index'))
-        post = Post.objects.get(pk=1)
-        post.text = 'Измененный текст'
-        post.save()
+        # Запись в обход модели не поднимает версию ленты: страница
+        # отдаётся из кэша.
+        Post.objects.filter(pk=1).update(text='Измененный текст')
         second = self.authorized_client.get(reverse('posts:index'))
         self.assertEqual(first.content, second.content)
         cache.clear()
         third = self.authorized_client.get(reverse('posts:index'))
         self.assertNotEqual(first.content, third.content)
 
+    def test_cache_invalidated_on_post_write(self):
+        """Сохранение поста сбрасывает кэш лент, где он выводится."""
+        urls = (
+            reverse('posts:index'),
+            reverse('posts:group_list', kwargs={'slug': 'test-slug'}),
+            reverse('posts:profile', kwargs={'username': 'User'}),
+        )
+        for url in urls:
+            self.guest_client.get(url)
+        post = Post.objects.get(pk=1)
+        post.text = 'Текст после правки'
+        post.save()
+        for url in urls:
+            with self.subTest(url=url):
+                response = self.guest_client.get(url)
+                self.assertContains(response, 'Текст после правки')
+
+    def test_group_rename_invalidates_feeds(self):
+        """Переименование группы сбрасывает кэш лент."""
+        self.guest_client.get(reverse('posts:index'))
+        self.group.title = 'Новое название'
+        self.group.save()
+        response = self.guest_client.get(
+            reverse('posts:profile', kwargs={'username': 'User'})
+        )
+        self.assertContains(response, 'Новое название')
+
 
 class FollowTests(TestCase):
     def setUp(self):
@@ -270,3 +313,414 @@ class FollowTests(TestCase):
                                         follow=True)
         response = self.client_auth_following.get(f'/posts/{self.post.pk}/')
         self.assertNotContains(response, 'комментарий от гостя')
+
+
+class CursorPaginatorTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.guest_client = Client()
+        cls.user = User.objects.create(username='Cursor_User')
+        for number in range(15):
+            Post.objects.create(text=f'Пост {number}', author=cls.user)
+
+    def setUp(self):
+        cache.clear()
+
+    def test_cursor_pages_cover_feed_without_count(self):
+        """Курсорные страницы идут подряд и не считают COUNT(*)."""
+        with CaptureQueriesContext(connection) as queries:
+            first = self.guest_client.get(reverse('posts:index'))
+        page = first.context['page_obj']
+        self.assertEqual(len(page), 10)
+        self.assertIsNone(page.previous_cursor)
+        self.assertFalse(
+            any('COUNT' in query['sql'] for query in queries.captured_queries)
+        )
+        second = self.guest_client.get(
+            reverse('posts:index'), {'cursor': page.next_cursor}
+        )
+        second_page = second.context['page_obj']
+        self.assertEqual(len(second_page), 5)
+        self.assertIsNone(second_page.next_cursor)
+        self.assertEqual(
+            [post.pk for post in page] + [post.pk for post in second_page],
+            list(Post.objects.values_list('pk', flat=True))
+        )
+        back = self.guest_client.get(
+            reverse('posts:index'), {'cursor': second_page.previous_cursor}
+        )
+        self.assertEqual(list(back.context['page_obj']), list(page))
+
+    def test_broken_cursor_falls_back_to_first_page(self):
+        """Испорченный курсор отдаёт первую страницу."""
+        response = self.guest_client.get(
+            reverse('posts:profile', kwargs={'username': 'Cursor_User'}),
+            {'cursor': 'мусор'}
+        )
+        self.assertEqual(len(response.context['page_obj']), 10)
+        self.assertIsNone(response.context['page_obj'].previous_cursor)
+
+    def test_cursor_of_wrong_shape_falls_back_to_first_page(self):
+        """Курсор с верным JSON, но чужой формы, не роняет ленту."""
+        for payload in (['n', 5], [5, ['x', 1]], ['n', {'a': 1}], 'n', 7):
+            cursor = base64.urlsafe_b64encode(
+                json.dumps(payload).encode()
+            ).decode()
+            with self.subTest(payload=payload):
+                response = self.guest_client.get(
+                    reverse('posts:index'), {'cursor': cursor}
+                )
+                self.assertEqual(response.status_code, 200)
+                self.assertEqual(len(response.context['page_obj']), 10)
+                comments = self.guest_client.get(
+                    reverse('posts:comments', kwargs={
+                        'post_id': Post.objects.first().pk
+                    }),
+                    {'cursor': cursor}
+                )
+                self.assertEqual(comments.status_code, 404)
+
+    def test_page_number_still_supported(self):
+        """Ссылки ?page=N продолжают работать."""
+        response = self.guest_client.get(reverse('posts:index'), {'page': 2})
+        self.assertEqual(response.context['page_obj'].number, 2)
+        self.assertEqual(len(response.context['page_obj']), 5)
+
+
+class CommentThreadTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.guest_client = Client()
+        cls.user = User.objects.create(username='Commentator')
+        cls.post = Post.objects.create(
+            text='Обсуждаемый пост', author=cls.user
+        )
+        Comment.objects.bulk_create(
+            Comment(post=cls.post, author=cls.user, text=f'Ответ {number}')
+            for number in range(25)
+        )
+
+    def setUp(self):
+        cache.clear()
+
+    def test_post_detail_shows_first_comment_page(self):
+        """На странице поста только первые комментарии и курсор дальше."""
+        response = self.guest_client.get(
+            reverse('posts:post_detail', kwargs={'post_id': self.post.pk})
+        )
+        comments = response.context['comments']
+        self.assertEqual(len(comments), 20)
+        self.assertIsNotNone(comments.next_cursor)
+        self.assertContains(response, 'Показать ещё')
+
+    def test_comments_endpoint_returns_next_page(self):
+        """JSON-адрес отдаёт оставшиеся комментарии по курсору."""
+        first = self.guest_client.get(
+            reverse('posts:post_detail', kwargs={'post_id': self.post.pk})
+        ).context['comments']
+        response = self.guest_client.get(
+            reverse('posts:comments', kwargs={'post_id': self.post.pk}),
+            {'cursor': first.next_cursor}
+        )
+        data = response.json()
+        self.assertEqual(len(data['comments']), 5)
+        self.assertIsNone(data['next'])
+        self.assertEqual(
+            [comment.pk for comment in first]
+            + [comment['id'] for comment in data['comments']],
+            list(self.post.comments.values_list('pk', flat=True))
+        )
+        self.assertEqual(data['comments'][0]['author'], 'Commentator')
+
+    def test_comments_endpoint_rejects_broken_cursor(self):
+        """Испорченный курсор комментариев — 404."""
+        response = self.guest_client.get(
+            reverse('posts:comments', kwargs={'post_id': self.post.pk}),
+            {'cursor': 'мусор'}
+        )
+        self.assertEqual(response.status_code, 404)
+
+
+class TimelineTests(TestCase):
+    def setUp(self):
+        self.follower = User.objects.create(username='reader')
+        self.author = User.objects.create(username='writer')
+        self.client_follower = Client()
+        self.client_follower.force_login(self.follower)
+        self.old_post = Post.objects.create(
+            author=self.author, text='Пост до подписки'
+        )
+
+    def feed_texts(self):
+        response = self.client_follower.get(reverse('posts:follow_index'))
+        return [post.text for post in response.context['page_obj']]
+
+    def test_fan_out_on_write(self):
+        """Лента заполняется при подписке, новом посте и отписке."""
+        Follow.objects.create(user=self.follower, author=self.author)
+        self.assertEqual(
+            TimelineEntry.objects.filter(user=self.follower).count(), 1
+        )
+        Post.objects.create(author=self.author, text='Пост после подписки')
+        self.assertEqual(
+            self.feed_texts(), ['Пост до подписки', 'Пост после подписки']
+        )
+        self.client_follower.get(reverse(
+            'posts:profile_unfollow', kwargs={'username': 'writer'}
+        ))
+        self.assertFalse(TimelineEntry.objects.exists())
+        self.assertEqual(self.feed_texts(), [])
+
+    def test_deleted_post_leaves_timeline(self):
+        """Удалённый пост пропадает из ленты."""
+        Follow.objects.create(user=self.follower, author=self.author)
+        self.old_post.delete()
+        self.assertEqual(self.feed_texts(), [])
+
+    @override_settings(TIMELINE_FANOUT_LIMIT=0)
+    def test_large_author_is_read_on_demand(self):
+        """Посты крупного автора подтягиваются при чтении ленты."""
+        Follow.objects.create(user=self.follower, author=self.author)
+        Post.objects.create(author=self.author, text='Пост после подписки')
+        self.assertFalse(TimelineEntry.objects.exists())
+        self.assertTrue(Follow.objects.get().fanout_on_read)
+        self.assertEqual(
+            self.feed_texts(), ['Пост до подписки', 'Пост после подписки']
+        )
+
+    def test_migration_fills_timelines_of_existing_follows(self):
+        """Подписки, сделанные до лент, заполняются миграцией."""
+        backfill = import_module(
+            'posts.migrations.0020_backfill_timeline'
+        ).backfill_timeline
+        large = User.objects.create(username='large')
+        Post.objects.create(author=large, text='Пост крупного автора')
+        Follow.objects.create(user=self.follower, author=self.author)
+        Follow.objects.create(user=self.follower, author=large)
+        Follow.objects.create(
+            user=User.objects.create(username='other'), author=large
+        )
+        # Так выглядит база сразу после 0011: лент ещё нет.
+        TimelineEntry.objects.all().delete()
+        Follow.objects.update(fanout_on_read=False)
+        with override_settings(TIMELINE_FANOUT_LIMIT=1):
+            backfill(apps, None)
+        self.assertEqual(
+            list(TimelineEntry.objects.values_list('post__text', flat=True)),
+            ['Пост до подписки']
+        )
+        self.assertTrue(Follow.objects.get(
+            user=self.follower, author=large
+        ).fanout_on_read)
+        self.assertEqual(
+            self.feed_texts(), ['Пост до подписки', 'Пост крупного автора']
+        )
+
+    def test_cursor_pages_merge_materialized_and_pulled(self):
+        """Курсорные страницы сливают обе части ленты без повторов."""
+        large = User.objects.create(username='large')
+        Follow.objects.create(user=self.follower, author=self.author)
+        Follow.objects.create(user=self.follower, author=large)
+        for number in range(6):
+            Post.objects.create(author=self.author, text=f'Обычный {number}')
+            Post.objects.create(author=large, text=f'Крупный {number}')
+        # Автор стал крупным: старые посты остались в ленте, новые нет.
+        Follow.objects.filter(author=large).update(fanout_on_read=True)
+        for number in range(6, 9):
+            Post.objects.create(author=large, text=f'Крупный {number}')
+        expected = list(Post.objects.order_by('created', 'id'))
+        url = reverse('posts:follow_index')
+        pages = [self.client_follower.get(url).context['page_obj']]
+        while pages[-1].next_cursor:
+            pages.append(self.client_follower.get(
+                url, {'cursor': pages[-1].next_cursor}
+            ).context['page_obj'])
+        self.assertEqual([len(page) for page in pages], [10, 6])
+        self.assertEqual(
+            [post.pk for page in pages for post in page],
+            [post.pk for post in expected]
+        )
+        back = self.client_follower.get(
+            url, {'cursor': pages[-1].previous_cursor}
+        ).context['page_obj']
+        self.assertEqual(list(back), list(pages[0]))
+
+
+class FeedCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.guest_client = Client()
+        self.user = User.objects.create(username='Feed_User')
+        Post.objects.create(author=self.user, text='Первый пост')
+
+    def test_stale_page_served_while_rebuilding(self):
+        """Пока страницу пересобирает другой запрос, отдаётся прежняя."""
+        url = reverse('posts:index')
+        self.guest_client.get(url)
+        Post.objects.create(author=self.user, text='Второй пост')
+        token = hashlib.md5(b'cursor:').hexdigest()
+        key = f'feed:index:{token}'
+        cache.add(f'{key}:lock', 1)
+        stale = self.guest_client.get(url)
+        self.assertEqual(len(stale.context['page_obj']), 1)
+        cache.delete(f'{key}:lock')
+        fresh = self.guest_client.get(url)
+        self.assertEqual(len(fresh.context['page_obj']), 2)
+
+    def test_follow_feed_tags_do_not_grow_with_follows(self):
+        """Лента подписок зависит от тега подписчика, а не авторов."""
+        reader = User.objects.create(username='Feed_Reader')
+        client = Client()
+        client.force_login(reader)
+        authors = [self.user] + [
+            User.objects.create(username=f'feed_author{number}')
+            for number in range(3)
+        ]
+        for author in authors:
+            Follow.objects.create(user=reader, author=author)
+        self.assertEqual(
+            len(feed_cache.follow_tags(reader)), 1 + len(SHARED_TAGS)
+        )
+        url = reverse('posts:follow_index')
+
+        def texts():
+            return [post.text for post in client.get(url).context['page_obj']]
+
+        self.assertEqual(texts(), ['Первый пост'])
+        self.assertEqual(texts(), ['Первый пост'])
+        post = Post.objects.create(author=authors[1], text='Новый пост')
+        self.assertEqual(texts(), ['Первый пост', 'Новый пост'])
+        post.text = 'Исправленный пост'
+        post.save()
+        self.assertEqual(texts(), ['Первый пост', 'Исправленный пост'])
+        post.delete()
+        self.assertEqual(texts(), ['Первый пост'])
+
+    def test_stale_page_has_no_etag(self):
+        """Устаревшая страница не получает ETag свежей версии."""
+        url = reverse('posts:index')
+        etag = self.guest_client.get(url)['ETag']
+        Post.objects.create(author=self.user, text='Второй пост')
+        token = hashlib.md5(b'cursor:').hexdigest()
+        cache.add(f'feed:index:{token}:lock', 1)
+        stale = self.guest_client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(stale.status_code, 200)
+        self.assertEqual(len(stale.context['page_obj']), 1)
+        self.assertFalse(stale.has_header('ETag'))
+        cache.delete(f'feed:index:{token}:lock')
+        fresh = self.guest_client.get(url)
+        self.assertTrue(fresh.has_header('ETag'))
+        self.assertEqual(
+            self.guest_client.get(
+                url, HTTP_IF_NONE_MATCH=fresh['ETag']
+            ).status_code,
+            304
+        )
+
+
+class ConditionalGetTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.guest_client = Client()
+        self.user = User.objects.create(username='Etag_User')
+        self.reader = User.objects.create(username='Etag_Reader')
+        self.group = Group.objects.create(
+            title='Группа', slug='etag-group', description='Описание'
+        )
+        self.post = Post.objects.create(
+            author=self.user, text='Пост', group=self.group
+        )
+        self.urls = [
+            reverse('posts:index'),
+            reverse('posts:group_list', kwargs={'slug': self.group.slug}),
+            reverse('posts:profile', kwargs={'username': self.user.username}),
+            reverse('posts:post_detail', kwargs={'post_id': self.post.pk}),
+        ]
+
+    def revalidate(self, url, client=None):
+        client = client or self.guest_client
+        etag = client.get(url)['ETag']
+        return client.get(url, HTTP_IF_NONE_MATCH=etag)
+
+    def test_not_modified_without_post_queries(self):
+        """Повторный запрос без изменений — 304 без запросов к постам."""
+        for url in self.urls:
+            with self.subTest(url=url):
+                etag = self.guest_client.get(url)['ETag']
+                with CaptureQueriesContext(connection) as queries:
+                    response = self.guest_client.get(
+                        url, HTTP_IF_NONE_MATCH=etag
+                    )
+                self.assertEqual(response.status_code, 304)
+                self.assertFalse(any(
+                    'posts_post' in query['sql'] for query in queries
+                ))
+
+    def test_writes_change_etag(self):
+        """Новый комментарий, пост и подписка меняют ETag страниц."""
+        detail, profile = self.urls[3], self.urls[2]
+        etag = self.guest_client.get(detail)['ETag']
+        self.post.comments.create(author=self.reader, text='Комментарий')
+        self.assertEqual(
+            self.guest_client.get(detail, HTTP_IF_NONE_MATCH=etag)
+            .status_code, 200
+        )
+        etags = [self.guest_client.get(url)['ETag'] for url in self.urls]
+        Post.objects.create(author=self.user, text='Ещё', group=self.group)
+        for url, etag in zip(self.urls, etags):
+            with self.subTest(url=url):
+                response = self.guest_client.get(
+                    url, HTTP_IF_NONE_MATCH=etag
+                )
+                self.assertEqual(response.status_code, 200)
+        etag = self.guest_client.get(profile)['ETag']
+        Follow.objects.create(user=self.reader, author=self.user)
+        self.assertEqual(
+            self.guest_client.get(profile, HTTP_IF_NONE_MATCH=etag)
+            .status_code, 200
+        )
+
+    def test_etag_depends_on_viewer(self):
+        """Гость и авторизованный пользователь получают разные ETag."""
+        reader_client = Client()
+        reader_client.force_login(self.reader)
+        url = self.urls[0]
+        self.assertNotEqual(
+            self.guest_client.get(url)['ETag'], reader_client.get(url)['ETag']
+        )
+        self.assertEqual(self.revalidate(url, reader_client).status_code, 304)
+
+    def test_missing_objects_still_404(self):
+        """Для несуществующих объектов ETag не считается."""
+        response = self.guest_client.get(
+            reverse('posts:post_detail', kwargs={'post_id': 10 ** 6})
+        )
+        self.assertEqual(response.status_code, 404)
+        self.assertFalse(response.has_header('ETag'))
+
+
+class AnonymousPageCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.guest_client = Client()
+        self.user = User.objects.create(username='Page_User')
+        self.post = Post.objects.create(author=self.user, text='Пост')
+
+    def test_post_page_purged_by_comment(self):
+        """Новый комментарий сбрасывает сохранённую страницу поста."""
+        url = reverse('posts:post_detail', kwargs={'post_id': self.post.pk})
+        self.assertEqual(self.guest_client.get(url)['X-Page-Cache'], 'miss')
+        self.assertEqual(self.guest_client.get(url)['X-Page-Cache'], 'hit')
+        self.post.comments.create(author=self.user, text='Свежий ответ')
+        response = self.guest_client.get(url)
+        self.assertEqual(response['X-Page-Cache'], 'miss')
+        self.assertContains(response, 'Свежий ответ')
+
+    def test_logged_in_users_are_not_cached(self):
+        client = Client()
+        client.force_login(self.user)
+        url = reverse('posts:index')
+        client.get(url)
+        self.assertEqual(client.get(url).get('X-Page-Cache'), None)
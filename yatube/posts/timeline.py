@@ -0,0 +1,169 @@
+"""Материализованные ленты подписок (fan-out-on-write).
+
+Новый пост обычного автора сразу записывается в TimelineEntry каждого
+подписчика вместе с временем поста, поэтому страница ленты читается
+одним проходом по индексу (user, created, post) без сортировки. У
+авторов с числом подписчиков больше TIMELINE_FANOUT_LIMIT раскладка не
+делается: такие подписки помечаются fanout_on_read, и посты этих
+авторов читаются отдельно по индексу (author, created, id) и
+сливаются с материализованной частью (TimelinePaginator).
+
+Кэш ленты (feed_cache.follow_tags) зависит от тега подписчика
+posts:follow:<id>, а не от тегов всех его авторов: раскладка, правка и
+удаление поста поднимают теги тех подписчиков, в чьи ленты он
+разложен.
+
+Ленты подписок, сделанных до появления TimelineEntry, заполняет
+миграция 0020_backfill_timeline по тем же правилам.
+"""
+from django.conf import settings
+from django.db.models import Q
+
+from core.paginator import CursorPaginator
+
+from . import feed_cache
+from .models import Follow, Post, TimelineEntry
+
+
+def _fanout_limit():
+    return settings.TIMELINE_FANOUT_LIMIT
+
+
+def _materialized_followers(author_id):
+    return list(Follow.objects.filter(
+        author_id=author_id, fanout_on_read=False
+    ).values_list('user_id', flat=True))
+
+
+def fan_out_post(post):
+    """Разложить новый пост по лентам подписчиков автора."""
+    followers = Follow.objects.filter(author_id=post.author_id)
+    user_ids = _materialized_followers(post.author_id)
+    if followers.count() > _fanout_limit():
+        followers.filter(fanout_on_read=False).update(fanout_on_read=True)
+        # Теперь их ленты зависят от тега автора, а не от раскладки.
+        feed_cache.invalidate_follow_feeds(user_ids)
+        return
+    TimelineEntry.objects.bulk_create(
+        [
+            TimelineEntry(user_id=user_id, post=post, created=post.created)
+            for user_id in user_ids
+        ],
+        ignore_conflicts=True
+    )
+    feed_cache.invalidate_follow_feeds(user_ids)
+
+
+def post_changed(post):
+    """Сбросить ленты, в которые пост разложен (правка, удаление)."""
+    feed_cache.invalidate_follow_feeds(
+        _materialized_followers(post.author_id)
+    )
+
+
+def follow_added(follow):
+    """Заполнить ленту нового подписчика постами автора."""
+    if Follow.objects.filter(author_id=follow.author_id).count() > (
+        _fanout_limit()
+    ):
+        Follow.objects.filter(pk=follow.pk).update(fanout_on_read=True)
+        feed_cache.invalidate_follow_feeds([follow.user_id])
+        return
+    posts = Post.objects.filter(
+        author_id=follow.author_id
+    ).values_list('id', 'created')
+    TimelineEntry.objects.bulk_create(
+        [
+            TimelineEntry(
+                user_id=follow.user_id, post_id=post_id, created=created
+            )
+            for post_id, created in posts.iterator()
+        ],
+        batch_size=500,
+        ignore_conflicts=True
+    )
+
+
+def follow_removed(follow):
+    """Убрать посты автора из ленты бывшего подписчика."""
+    TimelineEntry.objects.filter(
+        user_id=follow.user_id, post__author_id=follow.author_id
+    ).delete()
+
+
+def backfill_authors(author_ids):
+    """Дозаполнить ленты подписчиков авторов после записи в обход сигналов.
+
+    Например, после импорта постов и подписок через bulk_create.
+    """
+    follows = Follow.objects.filter(author_id__in=list(author_ids))
+    for follow in follows.iterator():
+        follow_added(follow)
+
+
+def home_timeline(user, posts=None):
+    """Посты ленты подписок пользователя одним QuerySet.
+
+    Нужен для старых ссылок ?page=N; курсорные страницы читает
+    TimelinePaginator.
+    """
+    if posts is None:
+        posts = Post.objects.all()
+    materialized = TimelineEntry.objects.filter(user=user).values('post_id')
+    pulled = Follow.objects.filter(
+        user=user, fanout_on_read=True
+    ).values('author_id')
+    return posts.filter(
+        Q(pk__in=materialized) | Q(author_id__in=pulled)
+    )
+
+
+class TimelinePaginator(CursorPaginator):
+    """Курсорные страницы ленты подписок user.
+
+    posts — выборка постов для карточек (например, for_feed()).
+    Материализованная часть берётся из TimelineEntry по индексу
+    (user, created, post), посты авторов с fanout_on_read — отдельным
+    запросом на автора; части сливаются по ключу (created, id).
+    """
+
+    ENTRY_FIELDS = ('created', 'post_id')
+
+    def __init__(self, posts, per_page, user, **kwargs):
+        super().__init__(home_timeline(user, posts), per_page, **kwargs)
+        self.posts = posts
+        self.user = user
+
+    def fetch(self, values, forward, limit):
+        entries = TimelineEntry.objects.filter(user=self.user)
+        if values is not None:
+            entries = entries.filter(
+                self._seek(values, forward, self.ENTRY_FIELDS)
+            )
+        # Подзапрос с LIMIT: отрезок индекса и посты по первичному ключу
+        # одним запросом.
+        post_ids = entries.order_by(
+            *self._order_by(forward, self.ENTRY_FIELDS)
+        ).values('post_id')[:limit]
+        rows = {
+            post.pk: post
+            for post in self.posts.filter(pk__in=post_ids).order_by()
+        }
+        pulled = Follow.objects.filter(
+            user=self.user, fanout_on_read=True
+        ).values_list('author_id', flat=True)
+        for author_id in pulled:
+            authored = self.posts.filter(author_id=author_id)
+            if values is not None:
+                authored = authored.filter(self._seek(values, forward))
+            # Старые посты автора могли остаться в ленте с тех пор, как
+            # он был «обычным», — словарь по pk убирает повторы.
+            rows.update((post.pk, post) for post in authored.order_by(
+                *self._order_by(forward)
+            )[:limit])
+        fields = self._fields()
+        return sorted(
+            rows.values(),
+            key=lambda post: tuple(getattr(post, name) for name in fields),
+            reverse=self.ordering[0].startswith('-') == forward,
+        )[:limit]
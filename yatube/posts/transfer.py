@@ -0,0 +1,338 @@
+"""Потоковый импорт и экспорт постов, комментариев и подписок.
+
+Формат — NDJSON (по объекту на строку) или CSV с колонкой type:
+
+    {"type": "post", "id": 1, "author": "leo", "group": "cats",
+     "text": "...", "created": "2022-05-01T10:00:00+00:00", "image": ""}
+    {"type": "comment", "id": 7, "post": 1, "author": "kit", "text": "..."}
+    {"type": "follow", "user": "kit", "author": "leo"}
+
+Записи читаются генератором и вставляются пачками через bulk_create,
+по транзакции на пачку, поэтому память не растёт с размером дампа, а
+база не заперта на запись всё время импорта. Если пачка не вставилась
+(неверная запись, id уже занят), она откатывается, а предыдущие пачки
+остаются: ошибка называет номер пачки и сколько записей сохранено, и
+производные данные для них всё равно обновляются.
+В памяти держатся только словари username -> id и slug -> id.
+Идентификаторы постов и комментариев сохраняются: комментарии
+ссылаются на пост по его id из дампа, поэтому посты должны идти
+раньше своих комментариев (так их пишет экспорт).
+
+bulk_create не вызывает сигналы, поэтому после импорта счётчики,
+ссылки на файлы картинок (core.storage), ленты подписок и кэш лент
+обновляются разом (Importer.finish()).
+"""
+import csv
+import json
+from collections import Counter
+from contextlib import contextmanager
+from itertools import count, islice
+
+from django.contrib.auth.hashers import make_password
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from core.models import next_change_seq
+from core.storage import count_references, set_references
+
+from . import feed_cache, timeline
+from .counters import rebuild_counters
+from .models import Comment, Follow, Group, Post, User
+
+FORMATS = ('ndjson', 'csv')
+CSV_FIELDS = (
+    'type', 'id', 'post', 'user', 'author', 'group', 'text', 'created',
+    'image',
+)
+# Столько записей читается и вставляется в одной транзакции. Размер
+# отдельного INSERT Django сам ограничивает лимитом SQLite на число
+# параметров запроса.
+CHUNK_SIZE = 2000
+EXPORT_CHUNK_SIZE = 2000
+# Имён картинок в одном запросе пересчёта ссылок (IN (...)).
+IMAGE_BATCH_SIZE = 500
+REQUIRED = {
+    'post': {'author', 'text'},
+    'comment': {'post', 'author', 'text'},
+    'follow': {'user', 'author'},
+}
+
+
+def guess_format(path):
+    return 'csv' if path.endswith('.csv') else 'ndjson'
+
+
+# Чтение и запись
+
+def read_records(stream, fmt):
+    """Записи дампа по одной, без чтения файла целиком."""
+    if fmt == 'csv':
+        for row in csv.DictReader(stream):
+            yield {key: value for key, value in row.items() if value != ''}
+        return
+    for line in stream:
+        line = line.strip()
+        if line:
+            yield json.loads(line)
+
+
+def _isoformat(value):
+    # DjangoJSONEncoder обрезал бы время до миллисекунд.
+    return value.isoformat()
+
+
+def write_records(stream, records, fmt):
+    """Записать записи в stream; вернуть их количество."""
+    written = 0
+    if fmt == 'csv':
+        writer = csv.DictWriter(stream, CSV_FIELDS, extrasaction='ignore')
+        writer.writeheader()
+        for record in records:
+            writer.writerow({
+                key: _isoformat(value) if hasattr(value, 'isoformat')
+                else value
+                for key, value in record.items()
+            })
+            written += 1
+        return written
+    for record in records:
+        stream.write(json.dumps(
+            record, default=_isoformat, ensure_ascii=False,
+            separators=(',', ':')
+        ) + '\n')
+        written += 1
+    return written
+
+
+def export_records(types=('post', 'comment', 'follow')):
+    """Генератор записей дампа: посты, затем комментарии и подписки."""
+    if 'post' in types:
+        rows = Post.objects.order_by('pk').values_list(
+            'pk', 'author__username', 'group__slug', 'text', 'created',
+            'image'
+        )
+        for pk, author, group, text, created, image in rows.iterator(
+            EXPORT_CHUNK_SIZE
+        ):
+            yield {
+                'type': 'post', 'id': pk, 'author': author, 'group': group,
+                'text': text, 'created': created, 'image': image,
+            }
+    if 'comment' in types:
+        rows = Comment.objects.order_by('pk').values_list(
+            'pk', 'post_id', 'author__username', 'text', 'created'
+        )
+        for pk, post_id, author, text, created in rows.iterator(
+            EXPORT_CHUNK_SIZE
+        ):
+            yield {
+                'type': 'comment', 'id': pk, 'post': post_id,
+                'author': author, 'text': text, 'created': created,
+            }
+    if 'follow' in types:
+        rows = Follow.objects.order_by('pk').values_list(
+            'user__username', 'author__username'
+        )
+        for user, author in rows.iterator(EXPORT_CHUNK_SIZE):
+            yield {'type': 'follow', 'user': user, 'author': author}
+
+
+# Импорт
+
+@contextmanager
+def keep_timestamps(*models):
+    """Не подменять created/updated из дампа текущим временем.
+
+    bulk_create вызывает pre_save полей, и auto_now/auto_now_add
+    перезаписали бы даты. На время импорта флаги снимаются.
+    """
+    fields = [
+        (field, field.auto_now, field.auto_now_add)
+        for model in models
+        for field in model._meta.concrete_fields
+        if getattr(field, 'auto_now', False)
+        or getattr(field, 'auto_now_add', False)
+    ]
+    for field, _, _ in fields:
+        field.auto_now = field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field, auto_now, auto_now_add in fields:
+            field.auto_now, field.auto_now_add = auto_now, auto_now_add
+
+
+class DumpError(ValueError):
+    """Запись дампа не удаётся импортировать."""
+
+
+class Importer:
+    """Пакетная вставка записей дампа."""
+
+    def __init__(self, chunk_size=CHUNK_SIZE):
+        self.chunk_size = chunk_size
+        self.users = dict(User.objects.values_list('username', 'pk'))
+        self.groups = dict(Group.objects.values_list('slug', 'pk'))
+        self.touched_authors = set()
+        self.images = set()
+        self.stats = Counter()
+
+    def run(self, records):
+        """Импортировать все записи и привести в порядок производные."""
+        records = iter(records)
+        saved = 0
+        try:
+            with keep_timestamps(Post, Comment):
+                for number in count(1):
+                    try:
+                        chunk = list(islice(records, self.chunk_size))
+                        if not chunk:
+                            break
+                        with transaction.atomic():
+                            self.import_chunk(chunk)
+                    except (
+                        DumpError, IntegrityError, KeyError, ValueError
+                    ) as error:
+                        raise DumpError(
+                            f'пачка {number} (с записи {saved + 1}): '
+                            f'{error}; сохранено записей: {saved}'
+                        ) from error
+                    saved += len(chunk)
+        finally:
+            if saved:
+                self.finish()
+        return self.stats
+
+    def import_chunk(self, chunk):
+        by_type = {'post': [], 'comment': [], 'follow': []}
+        for record in chunk:
+            kind = record.get('type')
+            if kind not in by_type:
+                raise DumpError(f'Неизвестный тип записи: {kind!r}')
+            missing = REQUIRED[kind] - set(record)
+            if missing:
+                raise DumpError(
+                    f'В записи {record!r} нет полей: '
+                    f'{", ".join(sorted(missing))}'
+                )
+            by_type[kind].append(record)
+        self._ensure_users(
+            name
+            for record in chunk
+            for name in (record.get('author'), record.get('user'))
+            if name
+        )
+        self._ensure_groups(
+            record['group'] for record in by_type['post']
+            if record.get('group')
+        )
+        self._insert_posts(by_type['post'])
+        self._insert_comments(by_type['comment'])
+        self._insert_follows(by_type['follow'])
+
+    def _ensure_users(self, usernames):
+        missing = {name for name in usernames if name not in self.users}
+        if not missing:
+            return
+        password = make_password(None)
+        User.objects.bulk_create(
+            [User(username=name, password=password) for name in missing],
+            ignore_conflicts=True
+        )
+        self.users.update(User.objects.filter(
+            username__in=missing
+        ).values_list('username', 'pk'))
+        self.stats['user'] += len(missing)
+
+    def _ensure_groups(self, slugs):
+        missing = {slug for slug in slugs if slug not in self.groups}
+        if not missing:
+            return
+        seqs = next_change_seq(len(missing))
+        Group.objects.bulk_create(
+            [
+                Group(title=slug, slug=slug, description='', change_seq=seq)
+                for slug, seq in zip(sorted(missing), seqs)
+            ],
+            ignore_conflicts=True
+        )
+        self.groups.update(Group.objects.filter(
+            slug__in=missing
+        ).values_list('slug', 'pk'))
+        self.stats['group'] += len(missing)
+
+    @staticmethod
+    def _created(record):
+        value = record.get('created')
+        return (parse_datetime(value) if value else None) or timezone.now()
+
+    def _insert_posts(self, records):
+        if not records:
+            return
+        seqs = next_change_seq(len(records))
+        posts = []
+        for record, seq in zip(records, seqs):
+            created = self._created(record)
+            author_id = self.users[record['author']]
+            self.touched_authors.add(author_id)
+            if record.get('image'):
+                self.images.add(record['image'])
+            posts.append(Post(
+                id=record.get('id'),
+                text=record['text'],
+                author_id=author_id,
+                group_id=self.groups.get(record.get('group')),
+                image=record.get('image') or '',
+                created=created,
+                updated=created,
+                change_seq=seq,
+            ))
+        Post.objects.bulk_create(posts)
+        self.stats['post'] += len(posts)
+
+    def _insert_comments(self, records):
+        if not records:
+            return
+        seqs = next_change_seq(len(records))
+        comments = []
+        for record, seq in zip(records, seqs):
+            created = self._created(record)
+            comments.append(Comment(
+                id=record.get('id'),
+                post_id=int(record['post']),
+                author_id=self.users[record['author']],
+                text=record['text'],
+                created=created,
+                updated=created,
+                change_seq=seq,
+            ))
+        Comment.objects.bulk_create(comments)
+        self.stats['comment'] += len(comments)
+
+    def _insert_follows(self, records):
+        if not records:
+            return
+        follows = []
+        for record in records:
+            author_id = self.users[record['author']]
+            self.touched_authors.add(author_id)
+            follows.append(Follow(
+                user_id=self.users[record['user']], author_id=author_id
+            ))
+        Follow.objects.bulk_create(follows, ignore_conflicts=True)
+        self.stats['follow'] += len(follows)
+
+    def finish(self):
+        """То, что при обычной записи делают сигналы."""
+        rebuild_counters()
+        # Файл мог уже быть у поста, загруженного обычным путём:
+        # пересчитываем ссылки на все имена из дампа.
+        images = sorted(self.images)
+        for start in range(0, len(images), IMAGE_BATCH_SIZE):
+            set_references(count_references(
+                Post.objects.all(), 'image',
+                images[start:start + IMAGE_BATCH_SIZE]
+            ))
+        timeline.backfill_authors(self.touched_authors)
+        feed_cache.invalidate_all()
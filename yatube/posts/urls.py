@@ -1,6 +1,6 @@
 from django.urls import path
 
-from . import views
+from . import api, views
 
 app_name = 'posts'
 
@@ -15,6 +15,24 @@ urlpatterns = [
         views.add_comment,
         name='add_comment'
     ),
+    path(
+        'posts/<int:post_id>/comments/',
+        views.comments,
+        name='comments'
+    ),
+    path('search/', views.search, name='search'),
+    path('changes/', views.changes, name='changes'),
+    path('api/v1/posts/', api.index, name='api_index'),
+    path(
+        'api/v1/groups/<slug:slug>/posts/',
+        api.group_posts,
+        name='api_group_posts'
+    ),
+    path(
+        'api/v1/profiles/<str:username>/posts/',
+        api.profile,
+        name='api_profile'
+    ),
     path('follow/', views.follow_index, name='follow_index'),
     path(
         'profile/<str:username>/follow/',
@@ -1,32 +1,65 @@
+from functools import partial
+
 from django.contrib.auth.decorators import login_required
-from django.core.paginator import Paginator
+from django.db import transaction
+from django.http import Http404, JsonResponse
 from django.shortcuts import get_object_or_404, redirect, render
 from django.views.decorators.csrf import csrf_exempt
-from .models import Follow, Group, Post, User
+from core.changes import changes_since
+from core.conditional import tagged_condition
+from core import page_cache
+from core.page_cache import cache_anonymous_page
+from core.paginator import CursorPaginator, InvalidCursor
+from .models import Comment, Follow, Group, Post, User
+from . import etags, feed_cache
+from .cards import prepare_cards
+from .counters import stats_for
 from .forms import CommentForm, PostForm
+from .renditions import (has_placeholder, prefetch_renditions,
+                         schedule_renditions)
+from .search import search_posts
+from .timeline import TimelinePaginator
 from django.urls import reverse
 
-
-def page_look(post_list, request):
-    paginator = Paginator(post_list, 10)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
-    return page_obj
+COMMENTS_PER_PAGE = 20
+CHANGES_PER_PAGE = 100
+MAX_CHANGES_PER_PAGE = 1000
+# Что отдаёт журнал изменений для каждого типа объектов.
+CHANGE_SOURCES = {
+    'group': (Group.objects.all(), ('title', 'slug', 'description',
+                                    'updated')),
+    'post': (Post.objects.all(), ('text', 'author', 'group', 'image',
+                                  'created', 'updated')),
+    'comment': (Comment.objects.all(), ('post', 'author', 'text',
+                                        'created', 'updated')),
+}
 
 
+@tagged_condition(etags.index_etag)
+@cache_anonymous_page(etags.index_page_tags)
 def index(request):
-    post_list = Post.objects.select_related('author')
-    page_obj = page_look(post_list, request)
+    post_list = Post.objects.for_feed()
+    page_obj = feed_cache.feed_page(
+        request, 'index', feed_cache.index_tags(), post_list
+    )
+    if prepare_cards(page_obj):
+        page_cache.skip(request)
     context = {
         'page_obj': page_obj,
     }
     return render(request, 'posts/index.html', context)
 
 
+@tagged_condition(etags.group_etag)
+@cache_anonymous_page(etags.group_page_tags)
 def group_posts(request, slug):
     group = get_object_or_404(Group, slug=slug)
-    post_list = group.posts.all()
-    page_obj = page_look(post_list, request)
+    post_list = Post.objects.for_feed().filter(group=group)
+    page_obj = feed_cache.feed_page(
+        request, f'group:{group.pk}', feed_cache.group_tags(group), post_list
+    )
+    if prepare_cards(page_obj):
+        page_cache.skip(request)
     title = f'Записи сообщества {group.title}'
     description = group.description
     context = {
@@ -38,11 +71,22 @@ def group_posts(request, slug):
     return render(request, 'posts/group_list.html', context)
 
 
+@tagged_condition(etags.profile_etag)
+@cache_anonymous_page(etags.profile_page_tags)
 def profile(request, username):
-    author = get_object_or_404(User, username=username)
-    author_posts = author.posts.all()
-    posts_count = author.posts.count()
-    page_obj = page_look(author_posts, request)
+    author = get_object_or_404(
+        User.objects.select_related('stats'), username=username
+    )
+    author_posts = Post.objects.for_feed().filter(author=author)
+    stats = stats_for(author)
+    page_obj = feed_cache.feed_page(
+        request,
+        f'author:{author.pk}',
+        feed_cache.author_tags(author),
+        author_posts
+    )
+    if prepare_cards(page_obj):
+        page_cache.skip(request)
     if request.user.is_authenticated:
         following = Follow.objects.filter(
             user=request.user, author=author
@@ -52,7 +96,8 @@ def profile(request, username):
     context = {
         'author': author,
         'posts': author_posts,
-        'posts_count': posts_count,
+        'posts_count': stats.posts_count,
+        'stats': stats,
         'page_obj': page_obj,
         'following': following,
     }
@@ -60,12 +105,16 @@ def profile(request, username):
 
 
 @csrf_exempt
+@tagged_condition(etags.post_etag)
+@cache_anonymous_page(etags.post_page_tags)
 def post_detail(request, post_id):
-    post = get_object_or_404(Post, pk=post_id)
-    posts_count = post.author.posts.count()
+    post = get_object_or_404(Post.objects.for_detail(), pk=post_id)
+    if has_placeholder(prefetch_renditions([post])):
+        page_cache.skip(request)
+    posts_count = stats_for(post.author).posts_count
     title = post.text[0:30]
     form = CommentForm(request.POST or None)
-    comments = post.comments.all()
+    comments = comment_page(post)
     context = {
         'post': post,
         'posts_count': posts_count,
@@ -87,7 +136,9 @@ def post_create(request):
         if form.is_valid():
             post = form.save(commit=False)
             post.author = request.user
-            post.save()
+            with transaction.atomic():
+                post.save()
+                schedule_renditions(post.image)
             return redirect('posts:profile', post.author.username)
     else:
         form = PostForm()
@@ -98,7 +149,7 @@ def post_create(request):
 @csrf_exempt
 def post_edit(request, post_id):
     post = get_object_or_404(Post, pk=post_id)
-    if post.author != request.user:
+    if post.author_id != request.user.pk:
         return redirect('posts:post_detail', post_id=post_id)
     form = PostForm(
         request.POST or None,
@@ -106,7 +157,9 @@ def post_edit(request, post_id):
         instance=post
     )
     if form.is_valid():
-        form.save()
+        with transaction.atomic():
+            post = form.save()
+            schedule_renditions(post.image)
         return redirect('posts:post_detail', post_id=post_id)
     context = {
         'is_edit': True,
@@ -119,20 +172,125 @@ def post_edit(request, post_id):
 @login_required
 @csrf_exempt
 def add_comment(request, post_id):
-    post = get_object_or_404(Post, pk=post_id)
+    post = get_object_or_404(Post.objects.only('id'), pk=post_id)
     form = CommentForm(request.POST or None)
     if form.is_valid():
         comment = form.save(commit=False)
         comment.author = request.user
         comment.post = post
-        comment.save()
+        with transaction.atomic():
+            comment.save()
     return redirect('posts:post_detail', post_id=post_id)
 
 
+def comment_page(post, cursor=None):
+    """Страница обсуждения поста по курсору (created, id)."""
+    paginator = CursorPaginator(
+        post.comments.for_thread(), COMMENTS_PER_PAGE
+    )
+    try:
+        return paginator.cursor_page(cursor)
+    except InvalidCursor:
+        raise Http404('Некорректный курсор')
+
+
+def comments(request, post_id):
+    """Следующие страницы комментариев в JSON для подгрузки."""
+    post = get_object_or_404(Post.objects.only('id'), pk=post_id)
+    page = comment_page(post, request.GET.get('cursor'))
+    profile_url = reverse('posts:profile', args=['__username__'])
+    return JsonResponse({
+        'comments': [
+            {
+                'id': comment.pk,
+                'author': comment.author.username,
+                'author_url': profile_url.replace(
+                    '__username__', comment.author.username
+                ),
+                'text': comment.text,
+                'created': comment.created.isoformat(),
+            }
+            for comment in page
+        ],
+        'next': (
+            f'{request.path}?cursor={page.next_cursor}'
+            if page.next_cursor else None
+        ),
+    })
+
+
+def search(request):
+    query = request.GET.get('q', '').strip()
+    group_slug = request.GET.get('group', '')
+    author_name = request.GET.get('author', '')
+    try:
+        page_number = max(int(request.GET.get('page', 1)), 1)
+    except ValueError:
+        page_number = 1
+    filters = {}
+    if group_slug:
+        filters['group_id'] = Group.objects.filter(
+            slug=group_slug
+        ).values_list('pk', flat=True).first()
+    if author_name:
+        filters['author_id'] = User.objects.filter(
+            username=author_name
+        ).values_list('pk', flat=True).first()
+    if None in filters.values():
+        posts, has_next = [], False
+    else:
+        posts, has_next = search_posts(query, page=page_number, **filters)
+    prepare_cards(posts)
+    params = request.GET.copy()
+    params.pop('page', None)
+    context = {
+        'query': query,
+        'group_slug': group_slug,
+        'author_name': author_name,
+        'posts': posts,
+        'page_number': page_number,
+        'has_next': has_next,
+        'base_query': params.urlencode(),
+    }
+    return render(request, 'posts/search.html', context)
+
+
+def changes(request):
+    """Изменения групп, постов и комментариев после номера since."""
+    try:
+        since = int(request.GET.get('since', 0))
+        limit = min(
+            int(request.GET.get('limit', CHANGES_PER_PAGE)),
+            MAX_CHANGES_PER_PAGE
+        )
+    except ValueError:
+        return JsonResponse(
+            {'error': 'since и limit должны быть целыми числами'},
+            status=400
+        )
+    limit = max(limit, 1)
+    changes = changes_since(CHANGE_SOURCES, since, limit)
+    last_seq = changes[-1]['seq'] if changes else since
+    return JsonResponse({
+        'changes': changes,
+        'last_seq': last_seq,
+        'next': (
+            f'{request.path}?since={last_seq}&limit={limit}'
+            if len(changes) == limit else None
+        ),
+    })
+
+
 @login_required
 def follow_index(request):
-    post_list = Post.objects.filter(author__following__user=request.user)
-    page_obj = page_look(post_list, request)
+    page_obj = feed_cache.feed_page(
+        request,
+        f'follow:{request.user.pk}',
+        feed_cache.follow_tags(request.user),
+        Post.objects.for_feed(),
+        partial(TimelinePaginator, user=request.user)
+    )
+    prepare_cards(page_obj)
     context = {
         'page_obj': page_obj
     }
@@ -146,7 +304,8 @@ def profile_follow(request, username):
     author = User.objects.get(username=username)
     is_follower = Follow.objects.filter(user=user, author=author)
     if user != author and not is_follower.exists():
-        Follow.objects.create(user=user, author=author)
+        with transaction.atomic():
+            Follow.objects.create(user=user, author=author)
     return redirect(reverse('posts:profile', args=[username]))
 
 
@@ -156,5 +315,6 @@ def profile_unfollow(request, username):
     author = get_object_or_404(User, username=username)
     is_follower = Follow.objects.filter(user=request.user, author=author)
     if is_follower.exists():
-        is_follower.delete()
+        with transaction.atomic():
+            is_follower.delete()
     return redirect('posts:profile', username=author)
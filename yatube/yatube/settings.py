@@ -35,7 +35,12 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'core.db_router.ReplicaStickinessMiddleware',
 ]
+# Замеры времени, SQL, шаблонов и кэша по каждому view; смотреть на
+# /metrics (см. core.profiling).
+if os.environ.get('YATUBE_PROFILING') == '1':
+    MIDDLEWARE.insert(0, 'core.profiling.ProfilingMiddleware')
 
 ROOT_URLCONF = 'yatube.urls'
 
@@ -61,11 +66,39 @@ WSGI_APPLICATION = 'yatube.wsgi.application'
 
 DATABASES = {
     'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
+        # SQLite с BEGIN IMMEDIATE для atomic() (см. core.sqlite).
+        'ENGINE': 'core.sqlite',
         'NAME': os.path.join(BASE_DIR, 'db.sqlite3'),
     }
 }
 
+# Реплики только для чтения (см. core.db_router). Локально реплику
+# можно поднять копией базы: YATUBE_REPLICA=/path/replica.sqlite3 и
+# manage.py replicate_sqlite --interval 1.
+DATABASE_REPLICAS = []
+if os.environ.get('YATUBE_REPLICA'):
+    DATABASES['replica'] = {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': os.environ['YATUBE_REPLICA'],
+        'TEST': {'MIRROR': 'default'},
+    }
+    DATABASE_REPLICAS.append('replica')
+DATABASE_ROUTERS = ['core.db_router.PrimaryReplicaRouter']
+# Сколько секунд после записи пользователь читает с основной базы,
+# чтобы увидеть свои изменения, пока реплика догоняет.
+REPLICA_STICKY_SECONDS = 10
+REPLICA_STICKY_COOKIE = 'read_primary_until'
+
+# PRAGMA для каждого нового соединения с SQLite (см. core.db).
+SQLITE_PRAGMAS = {
+    'journal_mode': 'wal',
+    'synchronous': 'normal',
+    'busy_timeout': int(os.environ.get('YATUBE_SQLITE_BUSY_TIMEOUT', 5000)),
+    'cache_size': int(os.environ.get('YATUBE_SQLITE_CACHE_KB', 64000)) * -1,
+    'mmap_size': int(os.environ.get('YATUBE_SQLITE_MMAP', 256 * 1024 ** 2)),
+    'temp_store': 'memory',
+}
+
 
 AUTH_PASSWORD_VALIDATORS = [
     {
@@ -112,8 +145,55 @@ MEDIA_URL = '/media/'
 
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
+# Раздача медиа (см. core.media): каталоги, которые можно отдавать,
+# и передача отдачи веб-серверу: 'x-accel-redirect' (nginx, внутренний
+# location MEDIA_ACCEL_PREFIX с alias на MEDIA_ROOT) или 'x-sendfile'.
+MEDIA_SERVE_DIRS = ('posts', 'renditions')
+MEDIA_SENDFILE = os.environ.get('YATUBE_MEDIA_SENDFILE', '')
+MEDIA_ACCEL_PREFIX = '/protected-media/'
+# Сколько браузер хранит файлы без хэша в имени.
+MEDIA_CACHE_SECONDS = 60 * 60
+
+# При нескольких воркерах кэш должен быть общим, иначе сброс версий лент
+# в одном воркере не виден другим: YATUBE_CACHE=sqlite включает
+# core.cache_backends.SQLiteCache с файлом YATUBE_CACHE_LOCATION.
+CACHE_BACKENDS = {
+    'locmem': 'django.core.cache.backends.locmem.LocMemCache',
+    'sqlite': 'core.cache_backends.SQLiteCache',
+}
+
 CACHES = {
     'default': {
-        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'BACKEND': CACHE_BACKENDS[os.environ.get('YATUBE_CACHE', 'locmem')],
+        'LOCATION': os.environ.get(
+            'YATUBE_CACHE_LOCATION',
+            os.path.join(BASE_DIR, 'cache.sqlite3')
+        ),
     }
 }
+
+# Авторы, у которых подписчиков больше этого порога, не раскладывают
+# новые посты по лентам подписчиков: их посты читаются при запросе ленты.
+TIMELINE_FANOUT_LIMIT = 1000
+
+# Страница ленты считается свежей FEED_CACHE_TIMEOUT секунд; ещё
+# FEED_CACHE_STALE_TIMEOUT секунд её можно отдать, пока она пересобирается.
+FEED_CACHE_TIMEOUT = 60
+FEED_CACHE_STALE_TIMEOUT = 300
+
+# Входит в ETag страниц: после выкладки новых шаблонов браузеры не
+# получат 304 на старую разметку.
+RELEASE = os.environ.get('YATUBE_RELEASE', '')
+
+# Сколько хранится страница, собранная для гостя. Устаревшие страницы
+# отсекаются версиями тегов, так что срок нужен только для уборки.
+PAGE_CACHE_TIMEOUT = 60 * 60
+
+# Обработка загруженных картинок (см. posts.images): длинная сторона,
+# качество JPEG и предел пикселей, после которого файл не декодируется.
+IMAGE_MAX_DIMENSION = 2048
+IMAGE_JPEG_QUALITY = 85
+IMAGE_MAX_PIXELS = 40 * 1000 * 1000
+
+# Сколько потоков рендерят миниатюры картинок постов в фоне.
+THUMBNAIL_WORKERS = 2
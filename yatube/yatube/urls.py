@@ -1,13 +1,21 @@
 from django.conf import settings
 from django.contrib import admin
-from django.conf.urls.static import static
 from django.urls import include, path
 
+from core import media
+from core.views import metrics
+
 urlpatterns = [
     path('about/', include('about.urls', namespace='about')),
     path('admin/', admin.site.urls),
+    path('metrics', metrics, name='metrics'),
     path('auth/', include('users.urls')),
     path('auth/', include('django.contrib.auth.urls')),
+    path(
+        f'{settings.MEDIA_URL.lstrip("/")}<path:path>',
+        media.serve,
+        name='media'
+    ),
     path('', include('posts.urls', namespace='posts')),
 ]
 
@@ -15,9 +23,3 @@ urlpatterns = [
 handler403 = ''
 handler404 = 'core.views.page_not_found'
 handler500 = ''
-
-
-if settings.DEBUG:
-    urlpatterns += static(
-        settings.MEDIA_URL, document_root=settings.MEDIA_ROOT
-    )